@@ -1,10 +1,17 @@
 import streamlit as st
 st.set_page_config(page_title="ThinkVerse LMS", page_icon="🎓", layout="wide")
 
+import os
 import uuid
-from supabase import create_client
+import threading
+from supabase import create_client, ClientOptions
+import httpx
 import time
-from datetime import datetime
+import random
+from concurrent.futures import ThreadPoolExecutor, wait
+from collections import Counter, OrderedDict
+from datetime import datetime, date as date_type, time as time_type
+from decimal import Decimal
 import json
 
 # =========================
@@ -57,9 +64,1388 @@ st.markdown("""
 """, unsafe_allow_html=True)
 
 
-SUPABASE_URL = st.secrets["SUPABASE_URL"]
-SUPABASE_KEY = st.secrets["SUPABASE_KEY"]
-supabase = create_client(SUPABASE_URL, SUPABASE_KEY)
+# ==========================
+# === CONFIG & BACKEND ===
+# ==========================
+def get_config(key, default=None):
+    """Baca konfigurasi dari environment dulu, lalu dari st.secrets."""
+    if key in os.environ:
+        return os.environ[key]
+    try:
+        # tanpa secrets.toml (mis. BACKEND=fake lokal) jangan tampilkan st.error dari st.secrets
+        if not st.secrets.load_if_toml_exists():
+            return default
+        return st.secrets.get(key, default)
+    except Exception:
+        return default
+
+
+# BACKEND=supabase (default) -> project Supabase dari secrets
+# BACKEND=fake -> backend tiruan in-process (fake_backend.py) untuk benchmark/demo lokal,
+#                 diisi data sintetis sebanyak FAKE_STUDENTS siswa
+BACKEND = get_config("BACKEND", "supabase")
+SUPABASE_URL = get_config("SUPABASE_URL", "http://fake.local" if BACKEND == "fake" else None)
+SUPABASE_KEY = get_config("SUPABASE_KEY", "")
+
+
+# --- HTTP client bersama ---
+# Satu client Supabase (dan satu pool koneksi HTTP) untuk semua sesi dalam proses,
+# dibuat sekali lewat st.cache_resource — bukan client baru di setiap rerun.
+SUPABASE_POOL_SIZE = int(get_config("SUPABASE_POOL_SIZE", 20))        # koneksi maksimum
+SUPABASE_KEEPALIVE = int(get_config("SUPABASE_KEEPALIVE", 10))        # koneksi idle yang dipertahankan
+SUPABASE_HTTP2 = str(get_config("SUPABASE_HTTP2", "1")).lower() in ("1", "true", "yes")
+SUPABASE_TIMEOUT = float(get_config("SUPABASE_TIMEOUT", 15))          # detik, baca/tulis per panggilan
+SUPABASE_CONNECT_TIMEOUT = float(get_config("SUPABASE_CONNECT_TIMEOUT", 5))
+SUPABASE_POOL_TIMEOUT = float(get_config("SUPABASE_POOL_TIMEOUT", 5))  # tunggu koneksi bebas dari pool
+READ_RETRIES = int(get_config("READ_RETRIES", 2))                      # retry untuk select saja
+RETRY_BASE_MS = float(get_config("RETRY_BASE_MS", 200))
+
+
+class PoolMetrics:
+    """Statistik pool koneksi & retry (dibagi semua sesi)."""
+
+    def __init__(self, pool_size):
+        self.lock = threading.Lock()
+        self.pool_size = pool_size
+        self.requests = 0
+        self.in_flight = 0
+        self.peak_in_flight = 0
+        self.saturated = 0       # request yang datang saat semua koneksi pool terpakai
+        self.pool_timeouts = 0   # request yang gagal menunggu koneksi bebas
+        self.retries = 0
+        self.retry_giveups = 0
+
+    def snapshot(self):
+        with self.lock:
+            return {k: v for k, v in vars(self).items() if k != "lock"}
+
+
+@st.cache_resource
+def get_pool_metrics():
+    return PoolMetrics(SUPABASE_POOL_SIZE)
+
+
+class CountingTransport(httpx.HTTPTransport):
+    """HTTPTransport yang mencatat request in-flight, saturasi dan pool timeout."""
+
+    def __init__(self, metrics, **kwargs):
+        super().__init__(**kwargs)
+        self.metrics = metrics
+
+    def handle_request(self, request):
+        m = self.metrics
+        with m.lock:
+            m.requests += 1
+            if m.in_flight >= m.pool_size:
+                m.saturated += 1
+            m.in_flight += 1
+            m.peak_in_flight = max(m.peak_in_flight, m.in_flight)
+        try:
+            return super().handle_request(request)
+        except httpx.PoolTimeout:
+            with m.lock:
+                m.pool_timeouts += 1
+            raise
+        finally:
+            with m.lock:
+                m.in_flight -= 1
+
+
+def _http2_available():
+    try:
+        import h2  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+
+@st.cache_resource
+def get_http_client():
+    """httpx.Client bersama (pool keep-alive + CountingTransport): PostgREST, Storage dan upload TUS."""
+    http2 = SUPABASE_HTTP2 and _http2_available()
+    if SUPABASE_HTTP2 and not http2:
+        print("⚠️ SUPABASE_HTTP2 aktif tapi paket h2 belum terpasang, pakai HTTP/1.1")
+    limits = httpx.Limits(
+        max_connections=SUPABASE_POOL_SIZE,
+        max_keepalive_connections=SUPABASE_KEEPALIVE,
+        keepalive_expiry=30,
+    )
+    timeout = httpx.Timeout(SUPABASE_TIMEOUT, connect=SUPABASE_CONNECT_TIMEOUT, pool=SUPABASE_POOL_TIMEOUT)
+    return httpx.Client(
+        transport=CountingTransport(get_pool_metrics(), http2=http2, limits=limits),
+        timeout=timeout,
+        follow_redirects=True,
+    )
+
+
+@st.cache_resource
+def get_supabase_client():
+    """Client Supabase bersama dengan pool koneksi keep-alive dan timeout eksplisit."""
+    http = get_http_client()
+    timeout = http.timeout
+    options = ClientOptions(
+        httpx_client=http,
+        postgrest_client_timeout=timeout,
+        storage_client_timeout=int(SUPABASE_TIMEOUT),
+    )
+    return create_client(SUPABASE_URL, SUPABASE_KEY, options=options)
+
+
+def make_backend():
+    """Client backend sesuai BACKEND."""
+    if BACKEND == "fake":
+        import fake_backend
+        latency_ms = get_config("FAKE_LATENCY_MS")
+        return fake_backend.get_client(
+            students=int(get_config("FAKE_STUDENTS", 100)),
+            latency=float(latency_ms) / 1000 if latency_ms is not None else None,
+        )
+    return get_supabase_client()
+
+
+supabase = make_backend()
+
+
+# ==========================
+# === USER NAME LOADER ===
+# ==========================
+class UserNameLoader:
+    """
+    Loader nama user per-rerun.
+    - want(): daftarkan user id yang dibutuhkan halaman
+    - load(): ambil semua id yang tertunda dalam SATU query in_("id", ...)
+    - name(): baca dari memo (fallback query kalau id belum pernah didaftarkan)
+    Aman dipakai dari thread fan_out (mis. fallback select_authored): memo &
+    antrian dijaga lock. load() memegang lock selama query, jadi thread yang
+    id-nya sedang dimuat thread lain menunggu hasilnya, bukan membaca memo kosong.
+    """
+
+    def __init__(self):
+        self.names = {}
+        self.pending = set()
+        self.lock = threading.RLock()
+        self.lookups = 0   # berapa kali nama diminta
+        self.queries = 0   # berapa query users yang benar-benar dikirim
+
+    def want(self, *user_ids):
+        with self.lock:
+            for uid in user_ids:
+                if uid is not None and uid not in self.names:
+                    self.pending.add(uid)
+
+    def load(self):
+        with self.lock:
+            if not self.pending:
+                return
+            ids = list(self.pending)
+            self.pending = set()
+            try:
+                rows = supabase.table("users").select("id, name").in_("id", ids).execute().data or []
+            except Exception:
+                # jangan dicoba lagi di rerun ini: name() jatuh ke "User #id"
+                for uid in ids:
+                    self.names.setdefault(uid, None)
+                raise
+            self.queries += 1
+            for r in rows:
+                self.names[r["id"]] = r.get("name")
+            for uid in ids:
+                self.names.setdefault(uid, None)
+
+    def prime(self, rows, id_key="user_id", name_key="user_name"):
+        """Isi memo dari baris yang sudah di-join dengan users (tanpa query tambahan)."""
+        with self.lock:
+            for r in rows:
+                uid = r.get(id_key)
+                if uid is not None:
+                    self.names[uid] = r.get(name_key)
+                    self.pending.discard(uid)
+
+    def get(self, uid):
+        """Nama user, atau None kalau user tidak ada."""
+        with self.lock:
+            self.lookups += 1
+        if uid not in self.names:
+            self.want(uid)
+            self.load()
+        return self.names.get(uid)
+
+    def name(self, uid):
+        """Nama user untuk ditampilkan (fallback "User #id")."""
+        return self.get(uid) or f"User #{uid}"
+
+    @property
+    def saved(self):
+        """Jumlah query users yang dihemat dibanding 1 query per baris."""
+        return max(self.lookups - self.queries, 0)
+
+
+def get_user_loader():
+    """Loader milik rerun yang sedang berjalan (dibuat ulang oleh begin_rerun)."""
+    if "_user_loader" not in st.session_state:
+        st.session_state._user_loader = UserNameLoader()
+    return st.session_state._user_loader
+
+
+# ==========================
+# === COLUMN PROJECTIONS ===
+# ==========================
+# Setiap view mendeklarasikan kolom yang benar-benar dipakai, bukan select("*").
+# Kolom teks panjang (isi modul, deskripsi quiz & course, isi topik forum) tidak
+# ikut di view daftar; diambil lewat load_text_column() hanya untuk item yang dibuka.
+# PROJECTED_READS=0 -> semua view kembali ke select("*") (pembanding payload).
+PROJECTED_READS = get_config("PROJECTED_READS", "1") != "0"
+
+PROJECTIONS = {
+    "users.login": ("id", "name", "email", "role", "avatar_url", "password_hash"),
+    "courses.card": ("id", "code", "title", "access_code", "instructor_email"),
+    "modules.list": ("id", "course_id", "title", "order_index", "video_url"),
+    "module_link.list": ("id", "course_id", "module_id", "type", "target_id"),
+    "quizzes.list": ("id", "course_id", "title", "attempt_limit"),
+    "attendance.list": ("id", "session_id", "course_id", "user_id", "status", "timestamp"),
+    "quiz_attempts.list": (
+        "id", "quiz_id", "user_id", "score", "submitted_at",
+        "manual_score", "teacher_feedback", "attempt_number",
+    ),
+    "quiz_answers.list": ("id", "attempt_id", "question_id", "text_answer", "is_correct"),
+    "discussions.list": ("id", "course_id", "user_id", "title", "created_at"),
+    "discussion_replies.list": ("id", "discussion_id", "user_id", "reply", "parent_id", "created_at"),
+    "discussion_replies.count": ("count",),
+    "enrollments.course": ("course_id",),
+    "users.author": ("name", "avatar_url"),
+    "quizzes.link": ("id", "title"),
+    "assignments.link": ("id", "title"),
+}
+
+# relasi embed PostgREST: nama hasil -> (relasi, view kolom baris relasi)
+# quiz / assignment = computed relationship module_link (migrations/004_module_link_targets.sql)
+EMBEDS = {
+    "course": ("courses", "courses.card"),
+    "author": ("users", "users.author"),
+    "reply_count": ("discussion_replies", "discussion_replies.count"),
+    "quiz": ("quiz", "quizzes.link"),
+    "assignment": ("assignment", "assignments.link"),
+}
+
+
+def select_cols(view):
+    """String select PostgREST untuk view "tabel.nama" ("*" kalau view tidak terdaftar)."""
+    if not PROJECTED_READS or view not in PROJECTIONS:
+        return "*"
+    return ", ".join(PROJECTIONS[view])
+
+
+def select_with(view, *embeds):
+    """
+    select_cols(view) + baris relasi dalam query yang sama (embedded join), mis.
+    select_with("discussions.list", "author") -> "..., author:users(name, avatar_url)".
+    Kolom relasi selalu diproyeksikan (juga saat PROJECTED_READS=0).
+    """
+    parts = [select_cols(view)]
+    for name in embeds:
+        rel, rel_view = EMBEDS[name]
+        parts.append(f"{name}:{rel}({', '.join(PROJECTIONS[rel_view])})")
+    return ", ".join(parts)
+
+
+def unnest_embed(rows, name, columns):
+    """Pindahkan kolom relasi embed ke baris induk: unnest_embed(rows, "author", {"name": "user_name"})."""
+    for r in rows:
+        related = r.pop(name, None) or {}
+        for src, dst in columns.items():
+            r[dst] = related.get(src)
+    return rows
+
+
+# kolom penulis (users) di baris forum / absensi, sama untuk jalur REST dan SQL
+AUTHOR_COLUMNS = {"name": "user_name", "avatar_url": "user_avatar_url"}
+
+
+def select_authored(table, view, build, *embeds):
+    """
+    Baris tabel + nama & avatar penulis (embed author) dalam satu query;
+    build(query) menambah filter / urutan / limit. Embed butuh FK ke users
+    (migrations/007_author_foreign_keys.sql). Tanpa FK PostgREST menjawab PGRST200:
+    query diulang tanpa embed apa pun (embeds tambahan ikut hilang, pemanggil
+    melengkapinya) dan nama diambil sekaligus lewat UserNameLoader.
+    """
+    try:
+        rows = build(supabase.table(table).select(select_with(view, "author", *embeds))).execute().data or []
+        return unnest_embed(rows, "author", AUTHOR_COLUMNS)
+    except Exception as e:
+        if getattr(e, "code", None) != "PGRST200":  # PGRST200 = relasi tidak ditemukan (007 belum dijalankan)
+            raise
+    rows = build(supabase.table(table).select(select_cols(view))).execute().data or []
+    loader = get_user_loader()
+    loader.want(*[r["user_id"] for r in rows])
+    try:
+        loader.load()
+    except Exception as e:
+        print(f"⚠️ nama penulis {table} gagal dimuat: {e}")
+    for r in rows:
+        r["user_name"] = loader.names.get(r["user_id"])
+        r["user_avatar_url"] = None
+    return rows
+
+
+def sql_cols(view, alias):
+    """Versi SQL dari select_cols: kolom diberi prefix alias tabel."""
+    if not PROJECTED_READS or view not in PROJECTIONS:
+        return f"{alias}.*"
+    return ", ".join(f"{alias}.{c}" for c in PROJECTIONS[view])
+
+
+# ==========================
+# === READ CACHE (COURSE) ===
+# ==========================
+CACHE_TTL = int(get_config("CACHE_TTL", 60))
+GRADING_PAGE_SIZE = int(get_config("GRADING_PAGE_SIZE", 20))
+# forum: topik per halaman & komentar per halaman thread (pagination keyset)
+FORUM_PAGE_SIZE = int(get_config("FORUM_PAGE_SIZE", 10))
+FORUM_REPLY_PAGE_SIZE = int(get_config("FORUM_REPLY_PAGE_SIZE", 20))
+
+# tabel yang di-cache: nama tabel -> (kolom filter, urutan)
+# key cache = nilai kolom filter (course id, kecuali quiz_questions = quiz id)
+CACHED_TABLES = {
+    "courses": ("id", None),
+    "modules": ("course_id", ("order_index", False)),
+    "module_link": ("course_id", None),
+    "quizzes": ("course_id", None),
+    "assignments": ("course_id", None),
+    "announcements": ("course_id", ("date", True)),
+    "attendance_sessions": ("course_id", None),
+    "quiz_questions": ("quiz_id", ("id", False)),
+}
+
+
+@st.cache_resource
+def _cache_versions():
+    """Nomor versi per (tabel, key) — dibagi semua sesi dalam satu proses."""
+    return {"lock": threading.Lock(), "versions": {}}
+
+
+# tabel yang barisnya ikut di-embed ke tabel cache lain: invalidasi ikut berlaku
+CACHE_DEPENDS = {"module_link": ("quizzes", "assignments")}
+
+
+@st.cache_data(ttl=CACHE_TTL, max_entries=2000, show_spinner=False)
+def _fetch_cached_rows(table, key, version, columns="*"):
+    col, order = CACHED_TABLES[table]
+    query = supabase.table(table).select(columns).eq(col, key)
+    if order:
+        query = query.order(order[0], desc=order[1])
+    return query.execute().data or []
+
+
+def load_cached_rows(table, key, view="list", embeds=()):
+    """
+    Baca baris tabel untuk satu course/quiz lewat cache bersama (TTL = CACHE_TTL detik).
+    Kolom mengikuti PROJECTIONS["<tabel>.<view>"]; view="full" = semua kolom.
+    embeds = nama di EMBEDS yang ikut diambil dalam query yang sama.
+    """
+    key = int(key)
+    versions = _cache_versions()["versions"]
+    version = tuple(versions.get((t, key), 0) for t in (table, *CACHE_DEPENDS.get(table, ())))
+    return _fetch_cached_rows(table, key, version, select_with(f"{table}.{view}", *embeds))
+
+
+@st.cache_data(ttl=CACHE_TTL, max_entries=2000, show_spinner=False)
+def _fetch_text_column(table, column, key, ids, version):
+    rows = supabase.table(table).select(f"id, {column}").in_("id", list(ids)).execute().data or []
+    return {r["id"]: r.get(column) for r in rows}
+
+
+def load_text_column(table, key, ids, column):
+    """
+    Kolom teks panjang {id: teks} untuk baris `ids` saja (item yang sedang dibuka).
+    Ikut versi cache (tabel, key) supaya invalidate_course() juga berlaku di sini.
+    """
+    ids = tuple(sorted(set(ids)))
+    if not ids:
+        return {}
+    key = int(key)
+    version = _cache_versions()["versions"].get((table, key), 0)
+    return _fetch_text_column(table, column, key, ids, version)
+
+
+def load_course(course_id):
+    rows = load_cached_rows("courses", course_id, view="full")
+    return rows[0] if rows else None
+
+
+# --- graph aktivitas per course: modul <-> quiz / assignment (tabel module_link) ---
+ACTIVITY_KINDS = ("quiz", "assignment")
+_ACTIVITY_GRAPH_TABLES = ("modules", "module_link", "quizzes", "assignments")
+
+
+def load_module_links(course_id):
+    """Baris module_link course + quiz/assignment tujuannya (embed, satu query)."""
+    return load_cached_rows("module_link", course_id, embeds=ACTIVITY_KINDS)
+
+
+def build_activity_graph(modules, links, quizzes=None, assignments=None):
+    """
+    Index link modul sekali jalan:
+    - "modules" / "activities"[kind]: id -> baris
+    - "by_module": module_id -> {kind: [target_id, ...]} (urutan link)
+    - "used_in": kind -> {target_id: [module_id, ...]} (urutan modul)
+    Baris quiz/assignment diambil dari embed di link (load_module_links); tanpa
+    embed, dari daftar quizzes/assignments. Link ke modul/target yang sudah
+    dihapus diabaikan, link ganda digabung.
+    """
+    graph = {
+        "modules": {m["id"]: m for m in modules},
+        "activities": {
+            "quiz": {q["id"]: q for q in quizzes or []},
+            "assignment": {a["id"]: a for a in assignments or []},
+        },
+        "by_module": {},
+        "used_in": {kind: {} for kind in ACTIVITY_KINDS},
+    }
+    for link in links:
+        target = link.get(link.get("type"))
+        if target:
+            graph["activities"][link["type"]].setdefault(target["id"], target)
+        kind, mid, tid = link.get("type"), link.get("module_id"), link.get("target_id")
+        if mid not in graph["modules"] or tid not in graph["activities"].get(kind, {}):
+            continue
+        targets = graph["by_module"].setdefault(mid, {k: [] for k in ACTIVITY_KINDS})[kind]
+        if tid not in targets:
+            targets.append(tid)
+    # reverse map mengikuti urutan modul (order_index), bukan urutan link
+    for mid in graph["modules"]:
+        for kind, targets in graph["by_module"].get(mid, {}).items():
+            for tid in targets:
+                graph["used_in"][kind].setdefault(tid, []).append(mid)
+    return graph
+
+
+@st.cache_data(ttl=CACHE_TTL, max_entries=500, show_spinner=False)
+def _fetch_activity_graph(course_id, versions):
+    modules = load_cached_rows("modules", course_id)
+    try:
+        return build_activity_graph(modules, load_module_links(course_id))
+    except Exception as e:
+        if getattr(e, "code", None) != "PGRST200":  # PGRST200 = relasi tidak ditemukan (004 belum dijalankan)
+            raise
+    return build_activity_graph(
+        modules,
+        load_cached_rows("module_link", course_id),
+        load_cached_rows("quizzes", course_id),
+        load_cached_rows("assignments", course_id),
+    )
+
+
+def load_activity_graph(course_id):
+    """Graph aktivitas course; dibangun ulang hanya kalau salah satu tabelnya diinvalidasi."""
+    course_id = int(course_id)
+    versions = _cache_versions()["versions"]
+    return _fetch_activity_graph(
+        course_id, tuple(versions.get((t, course_id), 0) for t in _ACTIVITY_GRAPH_TABLES)
+    )
+
+
+def load_activity_graph_or(course_id, modules=(), links=(), quizzes=None, assignments=None):
+    """
+    load_activity_graph(), atau kalau gagal: graph dari baris yang sudah dimuat
+    halaman pemanggil (build_activity_graph), supaya halaman tetap tampil.
+    """
+    try:
+        return load_activity_graph(course_id)
+    except Exception as e:
+        print(f"⚠️ activity graph gagal: {e}")
+        return build_activity_graph(list(modules), list(links), quizzes, assignments)
+
+
+def linked_activities(graph, module_id, kind):
+    """Baris quiz/assignment yang di-link ke satu modul."""
+    items = graph["activities"][kind]
+    return [items[tid] for tid in graph["by_module"].get(module_id, {}).get(kind, [])]
+
+
+def used_in_modules(graph, kind, target_id):
+    """Baris modul yang memakai quiz/assignment ini."""
+    return [graph["modules"][mid] for mid in graph["used_in"][kind].get(target_id, [])]
+
+
+def render_used_in(graph, kind, target_id):
+    """Caption "Used in" di kartu quiz/assignment (kosong kalau belum di-link)."""
+    mods = used_in_modules(graph, kind, target_id)
+    if mods:
+        st.caption("📦 Used in: " + ", ".join(m.get("title", "Untitled") for m in mods))
+
+
+def invalidate_cached(key, *tables):
+    """Naikkan versi entri (tabel, key) supaya read berikutnya ambil data baru."""
+    state = _cache_versions()
+    with state["lock"]:
+        for table in tables:
+            k = (table, int(key))
+            state["versions"][k] = state["versions"].get(k, 0) + 1
+
+
+def invalidate_course(course_id, *tables):
+    """Invalidasi cache course; tanpa argumen tabel = semua tabel course."""
+    invalidate_cached(course_id, *(tables or [t for t in CACHED_TABLES if t != "quiz_questions"]))
+
+
+# ==========================
+# === COURSE STATE STORE ===
+# ==========================
+# Read cache di atas dibagi semua sesi dan di-invalidasi per tabel, jadi setiap
+# write berarti refetch di rerun berikutnya. CourseStore menyimpan data course
+# milik SATU sesi (progress modul, isi modul, absensi, thread forum, pengumuman)
+# dan hasil write diterapkan langsung ke data lokal itu, jadi rerun setelah write
+# tidak perlu read ulang. Rekonsiliasi dengan backend terjadi saat umur data
+# melewati STORE_TTL detik (read berikutnya mengambil ulang dari backend).
+STORE_TTL = int(get_config("STORE_TTL", 30))
+
+
+class CourseStore:
+    """
+    State lokal satu course untuk satu sesi.
+    - get(): slice utuh (list/dict/set), loader() kalau belum ada atau kedaluwarsa
+    - get_items(): slice ber-key (id -> nilai), key yang kurang diambil sekaligus
+    - peek(): nilai tersimpan walau sudah kedaluwarsa (mis. berapa halaman sudah dimuat)
+    - update()/insert_row()/remove_row()/set_item()/update_item()/drop_item():
+      terapkan hasil write secara lokal
+    - drop(): buang slice yang tidak bisa diperbarui lokal (refetch di read berikutnya)
+    """
+
+    def __init__(self, course_id):
+        self.course_id = course_id
+        self.slices = {}
+        self.items = {}
+        self.lock = threading.RLock()
+        self.hits = 0    # read yang dilayani dari state lokal
+        self.loads = 0   # read yang benar-benar ke backend
+
+    def _fresh(self, loaded_at):
+        return time.monotonic() - loaded_at <= STORE_TTL
+
+    def get(self, name, loader):
+        with self.lock:
+            entry = self.slices.get(name)
+            if entry and self._fresh(entry[0]):
+                self.hits += 1
+                return entry[1]
+        value = loader()
+        with self.lock:
+            self.loads += 1
+            self.slices[name] = (time.monotonic(), value)
+        return value
+
+    def get_items(self, name, keys, loader):
+        """{key: nilai} untuk keys; loader(missing) -> {key: nilai} untuk yang kurang."""
+        with self.lock:
+            bucket = self.items.setdefault(name, {})
+            missing = [k for k in keys if k not in bucket or not self._fresh(bucket[k][0])]
+            self.hits += len(keys) - len(missing)
+        if missing:
+            loaded = loader(missing)
+            now = time.monotonic()
+            with self.lock:
+                self.loads += 1
+                for k in missing:
+                    if k in loaded:
+                        bucket[k] = (now, loaded[k])
+        with self.lock:
+            return {k: bucket[k][1] for k in keys if k in bucket}
+
+    def peek(self, name, key=None):
+        """Nilai slice (atau item key) apa adanya tanpa cek TTL; None kalau belum dimuat."""
+        with self.lock:
+            entry = self.slices.get(name) if key is None else self.items.get(name, {}).get(key)
+            return entry[1] if entry else None
+
+    def update(self, name, fn):
+        """fn(nilai) untuk slice yang sudah dimuat (tidak ada slice = tidak ada yang diubah)."""
+        with self.lock:
+            entry = self.slices.get(name)
+            if entry:
+                fn(entry[1])
+
+    def insert_row(self, name, row, index=0):
+        """Baris baru hasil insert ke slice list (default paling atas)."""
+        self.update(name, lambda rows: rows.insert(index, row))
+
+    def remove_row(self, name, row_id):
+        """Buang baris yang baru dihapus dari slice list."""
+        self.update(name, lambda rows: rows.__setitem__(
+            slice(None), [r for r in rows if r.get("id") != row_id]
+        ))
+
+    def set_item(self, name, key, value):
+        with self.lock:
+            self.items.setdefault(name, {})[key] = (time.monotonic(), value)
+
+    def update_item(self, name, key, fn):
+        with self.lock:
+            entry = self.items.get(name, {}).get(key)
+            if entry:
+                fn(entry[1])
+
+    def drop_item(self, name, key):
+        with self.lock:
+            self.items.get(name, {}).pop(key, None)
+
+    def drop(self, *names):
+        with self.lock:
+            for name in names:
+                self.slices.pop(name, None)
+                self.items.pop(name, None)
+
+
+def get_course_store(course_id):
+    """Store course milik sesi ini (dibuat saat course pertama kali dibuka)."""
+    if "_course_stores" not in st.session_state:
+        st.session_state._course_stores = {}
+    stores = st.session_state._course_stores
+    if int(course_id) not in stores:
+        stores[int(course_id)] = CourseStore(int(course_id))
+    return stores[int(course_id)]
+
+
+# ===============================
+# === CALL INSTRUMENTATION ===
+# ===============================
+# Semua akses ke Supabase lewat client global `supabase`; client itu dibungkus
+# supaya setiap .execute() dan panggilan storage tercatat: tabel, operasi, filter,
+# latency, jumlah baris dan ukuran payload, dikelompokkan per section halaman.
+# - DEBUG_PANEL=1 (atau ?debug=1 di URL) -> panel statistik di sidebar
+# - CALL_LOG_PATH=<file> -> setiap panggilan ditulis sebagai JSON lines
+CALL_LOG_PATH = get_config("CALL_LOG_PATH", "")
+CALL_HISTORY_RERUNS = 50  # jumlah rerun yang disimpan per sesi untuk export
+
+
+class CallRecorder:
+    """Catatan panggilan backend untuk satu rerun."""
+
+    def __init__(self, page=None):
+        self.rerun_id = uuid.uuid4().hex[:8]
+        self.section = page or "unknown"
+        self.calls = []
+        self.started = time.perf_counter()
+        self.stale = {}  # tabel -> waktu snapshot tertua yang ditampilkan (mode offline)
+        self.status_slot = None
+        self.lock = threading.Lock()
+
+    def record(self, table, op, filters=(), ms=0.0, rows=0, nbytes=0, error=None, retries=0):
+        entry = {
+            "ts": datetime.now().isoformat(timespec="milliseconds"),
+            "rerun": self.rerun_id,
+            "section": self.section,
+            "table": table,
+            "op": op,
+            "filters": list(filters),
+            "ms": round(ms, 2),
+            "rows": rows,
+            "bytes": nbytes,
+        }
+        if error:
+            entry["error"] = error
+        if retries:
+            entry["retries"] = retries
+        with self.lock:
+            self.calls.append(entry)
+        if CALL_LOG_PATH:
+            _append_call_log(entry)
+
+    @property
+    def total_ms(self):
+        return sum(c["ms"] for c in self.calls)
+
+    @property
+    def total_bytes(self):
+        return sum(c["bytes"] for c in self.calls)
+
+    def by_section(self):
+        out = {}
+        for c in self.calls:
+            agg = out.setdefault(c["section"], {"calls": 0, "ms": 0.0, "bytes": 0})
+            agg["calls"] += 1
+            agg["ms"] += c["ms"]
+            agg["bytes"] += c["bytes"]
+        return out
+
+    def slowest(self, n=5):
+        return sorted(self.calls, key=lambda c: c["ms"], reverse=True)[:n]
+
+
+@st.cache_resource
+def _call_log_lock():
+    return threading.Lock()
+
+
+def _append_call_log(entry):
+    with _call_log_lock():
+        with open(CALL_LOG_PATH, "a", encoding="utf-8") as f:
+            f.write(json.dumps(entry, default=str) + "\n")
+
+
+def get_call_recorder():
+    """Recorder rerun aktif (None di luar sesi Streamlit)."""
+    try:
+        return st.session_state.get("_call_recorder")
+    except Exception:
+        return None
+
+
+def set_call_section(section):
+    """Panggilan berikutnya dikelompokkan ke section ini (mis. "course:quiz")."""
+    rec = get_call_recorder()
+    if rec:
+        rec.section = section
+
+
+def record_call(table, op, filters=(), ms=0.0, rows=0, nbytes=0, error=None, retries=0):
+    rec = get_call_recorder()
+    if rec:
+        rec.record(table, op, filters, ms, rows, nbytes, error, retries)
+
+
+def _encode_payload(data):
+    """JSON hasil query (dipakai untuk ukuran payload & snapshot); None kalau tidak bisa."""
+    try:
+        return json.dumps(data, default=str)
+    except (TypeError, ValueError):
+        return None
+
+
+def _payload_size(data):
+    if data is None:
+        return 0
+    if isinstance(data, (bytes, bytearray)):
+        return len(data)
+    encoded = _encode_payload(data)
+    return len(encoded) if encoded is not None else 0
+
+
+def _format_filter(name, args):
+    return f"{name}(" + ", ".join(repr(a) if not isinstance(a, (list, tuple)) else f"[{len(a)}]" for a in args) + ")"
+
+
+_QUERY_OPS = {"select", "insert", "update", "upsert", "delete"}
+# PGRST000-003: PostgREST gagal konek / timeout menunggu koneksi ke database
+_TRANSIENT_PGRST = {"PGRST000", "PGRST001", "PGRST002", "PGRST003"}
+
+
+def _is_transient_error(e):
+    """Error jaringan/pool yang layak dicoba ulang."""
+    if isinstance(e, httpx.TransportError):
+        return True
+    return getattr(e, "code", None) in _TRANSIENT_PGRST
+
+
+# ======================
+# === DEGRADED MODE ===
+# ======================
+# Supabase lambat / mati tidak boleh menjatuhkan halaman:
+# - circuit breaker per tabel: setelah BREAKER_THRESHOLD kegagalan transient
+#   berturut-turut, panggilan ke tabel itu langsung ditolak selama BREAKER_COOLDOWN
+#   detik (tidak menunggu timeout), lalu satu panggilan percobaan (half-open)
+# - snapshot last-known-good: hasil terakhir setiap select yang berhasil (per
+#   query, dibagi semua sesi) disajikan ulang kalau select gagal / breaker terbuka;
+#   halaman menampilkan badge "offline" selama ada data stale
+# - antrian write: write siswa (absensi, progress modul, komentar forum) yang gagal
+#   karena backend tidak terjangkau disimpan di sesi dan dikirim ulang di awal
+#   rerun berikutnya (replay_writes)
+BREAKER_THRESHOLD = int(get_config("BREAKER_THRESHOLD", 5))
+BREAKER_COOLDOWN = float(get_config("BREAKER_COOLDOWN", 30))
+SNAPSHOT_MAX_MB = float(get_config("SNAPSHOT_MAX_MB", 64))
+WRITE_QUEUE_MAX = int(get_config("WRITE_QUEUE_MAX", 100))
+
+
+class BackendUnavailable(Exception):
+    """Breaker tabel sedang terbuka: panggilan tidak dikirim ke backend."""
+
+    code = "BREAKER_OPEN"
+
+    def __init__(self, table, retry_in):
+        super().__init__(f"backend untuk '{table}' tidak terjangkau, dicoba lagi dalam {retry_in:.0f} detik")
+        self.table = table
+        self.retry_in = retry_in
+
+
+class CircuitBreaker:
+    """closed -> open (BREAKER_THRESHOLD gagal) -> half-open (1 percobaan) -> closed/open."""
+
+    def __init__(self, name):
+        self.name = name
+        self.failures = 0
+        self.opened_at = None
+        self.probing = False
+        self.lock = threading.Lock()
+
+    @property
+    def state(self):
+        if self.opened_at is None:
+            return "closed"
+        return "half_open" if time.monotonic() - self.opened_at >= BREAKER_COOLDOWN else "open"
+
+    def before_call(self):
+        with self.lock:
+            if self.opened_at is None:
+                return
+            wait = self.opened_at + BREAKER_COOLDOWN - time.monotonic()
+            if wait > 0 or self.probing:
+                raise BackendUnavailable(self.name, max(wait, 0))
+            self.probing = True
+
+    def success(self):
+        with self.lock:
+            self.failures = 0
+            self.opened_at = None
+            self.probing = False
+
+    def failure(self):
+        with self.lock:
+            self.failures += 1
+            self.probing = False
+            if self.failures >= BREAKER_THRESHOLD or self.opened_at is not None:
+                self.opened_at = time.monotonic()
+
+
+class StaleResponse:
+    """Pengganti APIResponse: data dari snapshot terakhir yang berhasil."""
+
+    stale = True
+
+    def __init__(self, data, count, saved_at):
+        self.data = data
+        self.count = count
+        self.saved_at = saved_at
+
+
+@st.cache_resource
+def _resilience_state():
+    """Breaker & snapshot — dibagi semua sesi dalam satu proses."""
+    return {"lock": threading.Lock(), "breakers": {}, "snapshots": OrderedDict(), "snapshot_bytes": 0}
+
+
+def get_breaker(table):
+    state = _resilience_state()
+    with state["lock"]:
+        if table not in state["breakers"]:
+            state["breakers"][table] = CircuitBreaker(table)
+        return state["breakers"][table]
+
+
+def open_breakers():
+    """Nama tabel yang breaker-nya sedang tidak closed."""
+    return sorted(b.name for b in list(_resilience_state()["breakers"].values()) if b.opened_at is not None)
+
+
+def save_snapshot(key, encoded, count):
+    """Simpan hasil select (JSON) sebagai last-known-good; LRU dibatasi SNAPSHOT_MAX_MB."""
+    state = _resilience_state()
+    limit = SNAPSHOT_MAX_MB * 1024 * 1024
+    with state["lock"]:
+        snaps = state["snapshots"]
+        old = snaps.pop(key, None)
+        if old:
+            state["snapshot_bytes"] -= len(old[1])
+        if len(encoded) > limit:
+            return
+        snaps[key] = (time.time(), encoded, count)
+        state["snapshot_bytes"] += len(encoded)
+        while state["snapshot_bytes"] > limit:
+            _, (_, dropped, _) = snaps.popitem(last=False)
+            state["snapshot_bytes"] -= len(dropped)
+
+
+def load_snapshot(key):
+    """StaleResponse dari snapshot query ini, atau None."""
+    state = _resilience_state()
+    with state["lock"]:
+        entry = state["snapshots"].get(key)
+        if entry:
+            state["snapshots"].move_to_end(key)
+    if not entry:
+        return None
+    saved_at, encoded, count = entry
+    return StaleResponse(json.loads(encoded), count, saved_at)
+
+
+def mark_stale(table, saved_at):
+    """Catat bahwa rerun ini menampilkan data stale (untuk badge offline)."""
+    rec = get_call_recorder()
+    if rec:
+        rec.stale[table] = min(saved_at, rec.stale.get(table, saved_at))
+
+
+def is_backend_down(e):
+    # dibandingkan lewat code, bukan isinstance: breaker (cache_resource) bisa
+    # melempar kelas BackendUnavailable dari run script sebelumnya
+    return getattr(e, "code", None) == BackendUnavailable.code or _is_transient_error(e)
+
+
+def _never_sent(e):
+    """
+    Error yang pasti terjadi sebelum request sampai ke database: gagal konek,
+    breaker terbuka, PostgREST tidak dapat koneksi DB. Write seperti ini aman
+    diantrikan & dikirim ulang. Timeout baca / koneksi putus di tengah TIDAK
+    termasuk: insert-nya mungkin sudah ter-commit, kirim ulang = baris ganda.
+    """
+    if isinstance(e, (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout)):
+        return True
+    code = getattr(e, "code", None)
+    return code == BackendUnavailable.code or code in _TRANSIENT_PGRST
+
+
+def get_write_queue():
+    if "_write_queue" not in st.session_state:
+        st.session_state._write_queue = []
+    return st.session_state._write_queue
+
+
+class WriteResult:
+    """Pengganti APIResponse untuk write yang disusun dari beberapa request (fallback upsert)."""
+
+    def __init__(self, data):
+        self.data = data
+        self.count = None
+
+
+def _upsert_without_constraint(table, payload, on_conflict, ignore_duplicates=False):
+    """
+    Upsert saat database belum punya unique constraint untuk on_conflict (42P10,
+    mis. 005 / 003 belum dijalankan atau dilewati karena masih ada duplikat):
+    per baris cari baris lama pada kolom on_conflict -> update (kecuali
+    ignore_duplicates), baris yang belum ada di-insert sekaligus. Tidak atomik
+    seperti upsert asli, tapi kirim ulang dari antrian tetap tidak dobel.
+    """
+    keys = [c.strip() for c in on_conflict.split(",")]
+    rows = payload if isinstance(payload, list) else [payload]
+    out, new = [], []
+    for r in rows:
+        match = {k: r[k] for k in keys}
+        if ignore_duplicates:
+            if not exists(table, **match):
+                new.append(r)
+            continue
+        existing = _eq_filters(supabase.table(table).select("id"), match).limit(1).execute().data
+        if existing:
+            out += supabase.table(table).update(r).eq("id", existing[0]["id"]).execute().data or []
+        else:
+            new.append(r)
+    if new:
+        out += supabase.table(table).insert(new).execute().data or []
+    return WriteResult(out)
+
+
+def _send_write(w):
+    try:
+        return getattr(supabase.table(w["table"]), w["op"])(w["payload"], **w["options"]).execute()
+    except Exception as e:
+        # 42P10 = tidak ada unique constraint yang cocok dengan on_conflict
+        if w["op"] != "upsert" or getattr(e, "code", None) != "42P10":
+            raise
+        return _upsert_without_constraint(w["table"], w["payload"], **w["options"])
+
+
+def buffered_write(table, op, payload, refresh=None, **options):
+    """
+    insert/upsert siswa yang boleh ditunda. Kalau request belum sampai ke backend
+    (_never_sent), write masuk antrian sesi dan None dikembalikan (hasil lain =
+    response biasa); error lain, termasuk timeout setelah request terkirim, dilempar.
+    refresh=(course_id, slice, key): data store yang dibuang setelah replay berhasil
+    supaya baris sementara diganti data asli dari backend.
+    """
+    w = {"table": table, "op": op, "payload": payload, "options": options,
+         "refresh": refresh, "queued_at": time.time()}
+    try:
+        return _send_write(w)
+    except Exception as e:
+        queue = get_write_queue()
+        if not _never_sent(e) or len(queue) >= WRITE_QUEUE_MAX:
+            raise
+        queue.append(w)
+        return None
+
+
+def replay_writes():
+    """
+    Kirim ulang antrian write (urutan dijaga; berhenti di write pertama yang belum
+    terkirim). Write yang statusnya tidak pasti (timeout setelah terkirim) dibuang,
+    tidak dikirim lagi: paling banyak satu kali, data store-nya dimuat ulang.
+    """
+    queue = get_write_queue()
+    while queue:
+        w = queue[0]
+        try:
+            _send_write(w)
+        except Exception as e:
+            if _never_sent(e):
+                return
+            # ditolak backend (mis. duplikat) atau mungkin sudah ter-commit -> jangan diulang
+            print(f"⚠️ write tertunda dibuang ({w['op']} {w['table']}): {e}")
+        queue.pop(0)
+        if w["refresh"]:
+            course_id, name, key = w["refresh"]
+            store = get_course_store(course_id)
+            if key is None:
+                store.drop(name)
+            else:
+                store.drop_item(name, key)
+
+
+def render_backend_status(rec):
+    """Badge offline/stale + jumlah write tertunda (kosong kalau backend sehat)."""
+    lines = []
+    if rec.stale:
+        age = time.time() - min(rec.stale.values())
+        when = f"{age / 60:.0f} menit lalu" if age >= 60 else "kurang dari 1 menit lalu"
+        lines.append(
+            f"🟠 **Offline** — menampilkan data terakhir yang tersimpan ({when}) "
+            f"untuk: {', '.join(sorted(rec.stale))}."
+        )
+    pending = len(st.session_state.get("_write_queue", []))
+    if pending:
+        lines.append(f"📥 {pending} perubahan menunggu dikirim ulang saat koneksi pulih.")
+    if lines:
+        rec.status_slot.warning("  \n".join(lines))
+
+
+def _secret_select(table, args):
+    # snapshot dibagi semua sesi: hash password tidak boleh ikut disimpan / dilayani
+    cols = ",".join(str(a) for a in args)
+    return table == "users" and ("password_hash" in cols or "*" in cols)
+
+
+class _InstrumentedQuery:
+    """
+    Bungkus request builder postgrest; .execute() diukur dan dicatat.
+    .no_snapshot(): select ini tidak disimpan ke / dilayani dari snapshot
+    last-known-good (otomatis untuk select users yang membawa password_hash).
+    """
+
+    def __init__(self, builder, table, op="select", filters=(), key=(), snapshot=True):
+        self._builder = builder
+        self._table = table
+        self._op = op
+        self._filters = list(filters)
+        self._key = key  # semua argumen builder, lengkap -> kunci snapshot
+        self._snapshot = snapshot
+
+    def no_snapshot(self):
+        return _InstrumentedQuery(self._builder, self._table, self._op, self._filters, self._key, snapshot=False)
+
+    def __getattr__(self, name):
+        attr = getattr(self._builder, name)
+        if not callable(attr):
+            return attr
+
+        def call(*args, **kwargs):
+            result = attr(*args, **kwargs)
+            if not hasattr(result, "execute"):
+                return result
+            op = name if name in _QUERY_OPS else self._op
+            filters = self._filters if name in _QUERY_OPS else self._filters + [_format_filter(name, args)]
+            key = self._key + ((name, repr(args), repr(sorted(kwargs.items()))),)
+            snapshot = self._snapshot and not (name == "select" and _secret_select(self._table, args))
+            return _InstrumentedQuery(result, self._table, op, filters, key, snapshot)
+
+        return call
+
+    def execute(self):
+        t0 = time.perf_counter()
+        attempt = 0
+        breaker = get_breaker(self._table)
+        while True:
+            try:
+                breaker.before_call()
+                res = self._builder.execute()
+                break
+            except Exception as e:
+                if _is_transient_error(e):
+                    breaker.failure()
+                elif not is_backend_down(e):
+                    breaker.success()  # backend menjawab (constraint, RLS, dll.)
+                # select aman diulang; insert/update/delete/rpc tidak
+                if self._op == "select" and _is_transient_error(e):
+                    metrics = get_pool_metrics()
+                    if attempt < READ_RETRIES:
+                        attempt += 1
+                        with metrics.lock:
+                            metrics.retries += 1
+                        # exponential backoff dengan full jitter
+                        time.sleep(random.uniform(0, RETRY_BASE_MS * 2 ** (attempt - 1)) / 1000)
+                        continue
+                    with metrics.lock:
+                        metrics.retry_giveups += 1
+                record_call(self._table, self._op, self._filters, (time.perf_counter() - t0) * 1000,
+                            error=getattr(e, "code", None) or type(e).__name__, retries=attempt)
+                # backend tidak terjangkau: select dilayani dari snapshot terakhir kalau ada
+                snapshot_ok = self._op == "select" and self._snapshot and is_backend_down(e)
+                stale = load_snapshot((self._table, self._key)) if snapshot_ok else None
+                if stale is None:
+                    raise
+                mark_stale(self._table, stale.saved_at)
+                return stale
+        breaker.success()
+        ms = (time.perf_counter() - t0) * 1000
+        data = getattr(res, "data", None)
+        rows = len(data) if isinstance(data, list) else (1 if data else 0)
+        encoded = _encode_payload(data) if data is not None else None
+        if self._op == "select" and self._snapshot and encoded is not None:
+            save_snapshot((self._table, self._key), encoded, getattr(res, "count", None))
+        record_call(self._table, self._op, self._filters, ms, rows, len(encoded or ""), retries=attempt)
+        return res
+
+
+class _InstrumentedBucket:
+    def __init__(self, bucket, name):
+        self._bucket = bucket
+        self._name = name
+
+    def __getattr__(self, name):
+        attr = getattr(self._bucket, name)
+        if not callable(attr):
+            return attr
+
+        def call(*args, **kwargs):
+            t0 = time.perf_counter()
+            try:
+                result = attr(*args, **kwargs)
+            except Exception as e:
+                record_call(f"storage:{self._name}", name, [str(a) for a in args[:1]],
+                            (time.perf_counter() - t0) * 1000, error=type(e).__name__)
+                raise
+            nbytes = _payload_size(args[1]) if name in ("upload", "update") and len(args) > 1 else _payload_size(result if isinstance(result, bytes) else None)
+            record_call(f"storage:{self._name}", name, [str(a) for a in args[:1]],
+                        (time.perf_counter() - t0) * 1000, 0, nbytes)
+            return result
+
+        return call
+
+
+class _InstrumentedStorage:
+    def __init__(self, storage):
+        self._storage = storage
+
+    def from_(self, bucket):
+        return _InstrumentedBucket(self._storage.from_(bucket), bucket)
+
+    def __getattr__(self, name):
+        return getattr(self._storage, name)
+
+
+class InstrumentedClient:
+    """Proxy tipis untuk client Supabase: table()/rpc()/storage tercatat, sisanya diteruskan."""
+
+    def __init__(self, client):
+        self._client = client
+        self.storage = _InstrumentedStorage(client.storage)
+
+    def table(self, name):
+        return _InstrumentedQuery(self._client.table(name), name)
+
+    from_ = table
+
+    def rpc(self, fn, params=None, **kwargs):
+        return _InstrumentedQuery(self._client.rpc(fn, params or {}, **kwargs), f"rpc:{fn}", "rpc")
+
+    def __getattr__(self, name):
+        return getattr(self._client, name)
+
+
+# bungkus client global -> semua query di bawah otomatis tercatat
+supabase = InstrumentedClient(supabase)
+
+
+def debug_panel_enabled():
+    if str(get_config("DEBUG_PANEL", "0")).lower() in ("1", "true", "yes"):
+        return True
+    try:
+        return st.query_params.get("debug") == "1"
+    except Exception:
+        return False
+
+
+def render_call_panel(rec):
+    """Sidebar debug: jumlah panggilan, total waktu, query paling lambat, export JSONL."""
+    with st.sidebar.expander(f"🔧 Backend calls: {len(rec.calls)} · {rec.total_ms:.0f} ms", expanded=False):
+        st.caption(f"Rerun {rec.rerun_id} · payload {rec.total_bytes / 1024:.1f} KB")
+        pool = get_pool_metrics().snapshot()
+        st.caption(
+            f"Pool: {pool['in_flight']}/{pool['pool_size']} aktif · puncak {pool['peak_in_flight']} · "
+            f"penuh {pool['saturated']}× · pool timeout {pool['pool_timeouts']} · "
+            f"retry {pool['retries']} (gagal {pool['retry_giveups']})"
+        )
+        broken = open_breakers()
+        if broken:
+            st.caption(f"Breaker terbuka: {', '.join(broken)}")
+        for section, agg in rec.by_section().items():
+            st.markdown(f"- **{section}**: {agg['calls']} call · {agg['ms']:.0f} ms · {agg['bytes'] / 1024:.1f} KB")
+        slow = rec.slowest()
+        if slow:
+            st.markdown("**Paling lambat:**")
+            for c in slow:
+                st.code(f"{c['ms']:.1f} ms  {c['op']} {c['table']} {' '.join(c['filters'])}  ({c['rows']} baris)", language=None)
+        history = st.session_state.get("_call_history", [])
+        if history:
+            st.download_button(
+                "⬇️ Export JSONL",
+                "\n".join(json.dumps(c, default=str) for c in history),
+                file_name="backend_calls.jsonl",
+                mime="application/json",
+                key="_call_export",
+            )
+
+
+def begin_rerun(page=None):
+    """Reset state yang hanya berlaku untuk satu rerun; kirim ulang write yang tertunda."""
+    st.session_state._user_loader = UserNameLoader()
+    st.session_state._call_recorder = CallRecorder(page)
+    st.session_state._call_recorder.status_slot = st.empty()  # badge offline, diisi di end_rerun
+    replay_writes()
+
+
+def end_rerun():
+    """Catat statistik rerun ke log server (dan panel debug kalau aktif)."""
+    loader = st.session_state.get("_user_loader")
+    if loader and loader.lookups:
+        print(f"👥 UserNameLoader: {loader.lookups} lookup, {loader.queries} query, hemat {loader.saved}")
+
+    rec = st.session_state.get("_call_recorder")
+    if not rec:
+        return
+    if rec.status_slot is not None:
+        render_backend_status(rec)
+    if rec.calls:
+        print(f"📡 Backend: {len(rec.calls)} call, {rec.total_ms:.0f} ms, {rec.total_bytes / 1024:.1f} KB ({rec.section})")
+        history = st.session_state.get("_call_history", [])
+        reruns = {c["rerun"] for c in history}
+        if len(reruns) >= CALL_HISTORY_RERUNS:
+            oldest = history[0]["rerun"]
+            history = [c for c in history if c["rerun"] != oldest]
+        st.session_state._call_history = history + rec.calls
+    if debug_panel_enabled():
+        try:
+            render_call_panel(rec)
+        except Exception as e:
+            print(f"debug panel error: {e}")
+
+# ======================
+# === QUERY HELPERS ===
+# ======================
+# Cek keberadaan / jumlah baris tanpa mengunduh isinya:
+# exists() -> maksimal 1 baris kolom id, count_rows() -> HEAD + count="exact" (0 baris dikirim).
+def _eq_filters(query, filters):
+    for col, val in filters.items():
+        query = query.eq(col, val)
+    return query
+
+
+def exists(table, **filters):
+    """True kalau ada baris yang cocok dengan semua filter kolom=nilai."""
+    return bool(_eq_filters(supabase.table(table).select("id"), filters).limit(1).execute().data)
+
+
+def count_rows(table, **filters):
+    """Jumlah baris yang cocok dengan semua filter kolom=nilai."""
+    res = _eq_filters(supabase.table(table).select("id", count="exact", head=True), filters).execute()
+    return res.count or 0
+
+
+def save_module_progress(user_id, course_id, statuses, keep_existing=False):
+    """
+    Tulis progress modul {module_id: status} dalam SATU upsert idempoten
+    (unique key user_id+module_id, migrations/003_module_progress_unique.sql).
+    Tanpa constraint itu (42P10) _send_write menulis per baris: select lalu update / insert.
+    keep_existing=True -> baris yang sudah ada tidak diubah (dipakai untuk
+    "in_progress" supaya tidak menimpa "completed").
+    Backend tidak terjangkau -> upsert masuk antrian write (buffered_write).
+    """
+    if not statuses:
+        return
+    now = datetime.now().isoformat()
+    rows = [
+        {"user_id": user_id, "module_id": mid, "course_id": int(course_id), "status": status, "updated_at": now}
+        for mid, status in statuses.items()
+    ]
+    return buffered_write(
+        "module_progress", "upsert", rows, on_conflict="user_id,module_id", ignore_duplicates=keep_existing
+    )
+
+
+# ==============================
+# === DIRECT SQL READ PATH ===
+# ==============================
+# Read agregat yang berat (gradebook, grading, matriks absensi, forum) bisa langsung
+# ke PostgreSQL lewat psycopg2 ThreadedConnectionPool dengan query join tulisan tangan,
+# bukan lewat PostgREST (HTTP + JSON). Aktif kalau READ_PATH=sql dan DATABASE_URL diisi;
+# kalau pool tidak tersedia atau query gagal, otomatis kembali ke client Supabase.
+READ_PATH = str(get_config("READ_PATH", "rest")).lower()
+DATABASE_URL = get_config("DATABASE_URL", "")
+SQL_POOL_MIN = int(get_config("SQL_POOL_MIN", 1))
+SQL_POOL_MAX = int(get_config("SQL_POOL_MAX", 10))
+SQL_STATEMENT_TIMEOUT_MS = int(get_config("SQL_STATEMENT_TIMEOUT_MS", 10000))
+
+
+@st.cache_resource
+def get_sql_pool():
+    """Pool koneksi PostgreSQL bersama (None kalau tidak dikonfigurasi / gagal konek)."""
+    if not DATABASE_URL:
+        return None
+    try:
+        from psycopg2.pool import ThreadedConnectionPool
+
+        return ThreadedConnectionPool(
+            SQL_POOL_MIN,
+            SQL_POOL_MAX,
+            dsn=DATABASE_URL,
+            connect_timeout=5,
+            application_name="thinkverse-lms",
+            options=f"-c statement_timeout={SQL_STATEMENT_TIMEOUT_MS}",
+        )
+    except Exception as e:
+        print(f"⚠️ Pool PostgreSQL tidak tersedia, pakai REST: {e}")
+        return None
+
+
+def _sql_value(v):
+    # samakan tipe dengan JSON dari PostgREST (timestamp -> string ISO, numeric -> float)
+    if isinstance(v, (datetime, date_type, time_type)):
+        return v.isoformat()
+    if isinstance(v, Decimal):
+        return float(v)
+    return v
+
+
+def sql_query(label, sql, params=None):
+    """Jalankan SELECT di pool, return list of dict; tercatat di instrumentasi sebagai sql:<label>."""
+    from psycopg2.extras import RealDictCursor
+
+    pool = get_sql_pool()
+    t0 = time.perf_counter()
+    conn = pool.getconn()
+    try:
+        if not conn.autocommit:
+            conn.set_session(readonly=True, autocommit=True)
+        with conn.cursor(cursor_factory=RealDictCursor) as cur:
+            cur.execute(sql, params)
+            rows = [{k: _sql_value(v) for k, v in r.items()} for r in cur.fetchall()]
+    except Exception as e:
+        pool.putconn(conn, close=True)
+        record_call(f"sql:{label}", "select", ms=(time.perf_counter() - t0) * 1000, error=type(e).__name__)
+        raise
+    pool.putconn(conn)
+    record_call(f"sql:{label}", "select", ms=(time.perf_counter() - t0) * 1000,
+                rows=len(rows), nbytes=_payload_size(rows))
+    return rows
+
+
+def read_path(label, sql_fn, rest_fn):
+    """sql_fn() kalau READ_PATH=sql dan pool siap, selain itu / kalau gagal -> rest_fn()."""
+    if READ_PATH == "sql" and get_sql_pool() is not None:
+        try:
+            return sql_fn()
+        except Exception as e:
+            print(f"⚠️ SQL read {label} gagal, fallback ke REST: {e}")
+    return rest_fn()
+
 
 # =====================
 # === AUTH FUNCTION ===
@@ -72,13 +1458,15 @@ def hash_sha256(password: str) -> str:
 
 
 def login(email, password):
-    # Ambil data user dari Supabase
-    res = supabase.table("users").select("*").eq("email", email).execute()
+    # Ambil data user dari Supabase; tanpa snapshot -> backend mati = login gagal
+    # (fail closed, password lama tidak bisa dipakai dari data basi)
+    res = supabase.table("users").select(select_cols("users.login")).eq("email", email).no_snapshot().execute()
     if not res.data:
         return None
 
     user = res.data[0]
-    stored_pw = user.get("password_hash")
+    # hash tidak ikut disimpan di session_state
+    stored_pw = user.pop("password_hash", None)
 
     if not stored_pw:
         return None
@@ -111,8 +1499,7 @@ def register_user(name, email, password, role):
     """Registrasi user baru dengan password langsung di-hash SHA256."""
     hashed_pw = hash_sha256(password)
 
-    res = supabase.table("users").select("*").eq("email", email).execute()
-    if res.data:
+    if exists("users", email=email):
         st.error("Email sudah terdaftar.")
         return False
 
@@ -133,9 +1520,7 @@ def reset_password(email, new_password):
     """
     try:
         # Cari user berdasarkan email
-        user = supabase.table("users").select("*").eq("email", email).execute().data
-
-        if not user:
+        if not exists("users", email=email):
             st.error("❌ Email tidak ditemukan di database.")
             return False
 
@@ -172,7 +1557,13 @@ def page_login():
             ok = st.form_submit_button("Login")
 
         if ok:
-            user = login(email, pw)
+            try:
+                user = login(email, pw)
+            except Exception as e:
+                if not is_backend_down(e):
+                    raise
+                st.error("🔴 Server sedang tidak bisa dihubungi, login belum bisa dilakukan. Coba lagi nanti.")
+                st.stop()
             if user:
                 st.session_state.user = user
                 st.session_state.page = "dashboard"  # ⬅ pindah halaman otomatis
@@ -320,17 +1711,16 @@ def page_dashboard():
     
         with col2:
             uploaded = st.file_uploader("Ganti foto profil", type=["png", "jpg", "jpeg"])
-            if uploaded:
+            # file_uploader tetap berisi setelah rerun → jangan upload file yang sama dua kali
+            if uploaded and st.session_state.get("_avatar_file_id") != uploaded.file_id:
                 import uuid
     
-                file_bytes = uploaded.read()
                 file_name = f"{uuid.uuid4()}.png"
     
                 try:
                     # Upload ke Supabase Storage (folder: profile_pics)
-                    supabase.storage.from_("profile_pics").upload(file_name, file_bytes)
-    
-                    public_url = supabase.storage.from_("profile_pics").get_public_url(file_name)
+                    public_url = upload_with_progress(uploaded, "avatar", file_name)
+                    st.session_state._avatar_file_id = uploaded.file_id
     
                     # Simpan ke tabel users
                     supabase.table("users").update({"avatar_url": public_url}).eq("id", u["id"]).execute()
@@ -389,12 +1779,7 @@ def page_courses():
             if not new_code.strip() or not new_title.strip():
                 st.warning("Course code and title cannot be empty.")
             else:
-                existing = supabase.table("courses").select("*") \
-                    .eq("code", new_code.strip()) \
-                    .eq("instructor_email", user["email"]) \
-                    .execute().data
-
-                if existing:
+                if exists("courses", code=new_code.strip(), instructor_email=user["email"]):
                     st.warning("⚠️ You already have a course with this code!")
                 else:
                     if not access_code.strip():
@@ -430,16 +1815,12 @@ def page_courses():
                 st.warning("Please enter a course access code.")
             else:
                 # cek apakah access code valid
-                course = supabase.table("courses").select("*").eq("access_code", join_code.strip()).execute().data
+                course = supabase.table("courses").select("id, title").eq("access_code", join_code.strip()).execute().data
                 if not course:
                     st.error("❌ Invalid access code. Please check with your instructor.")
                 else:
                     course_id = course[0]["id"]
-                    enrolled = supabase.table("enrollments").select("*") \
-                        .eq("user_id", user["id"]) \
-                        .eq("course_id", course_id).execute().data
-
-                    if enrolled:
+                    if exists("enrollments", user_id=user["id"], course_id=course_id):
                         st.info("📚 You are already enrolled in this course.")
                     else:
                         supabase.table("enrollments").insert({
@@ -456,12 +1837,12 @@ def page_courses():
     # === LOAD COURSES ===
     if user["role"] == "instructor":
         # tampilkan semua course yang dibuat instruktur
-        courses = supabase.table("courses").select("*").eq("instructor_email", user["email"]).execute().data
+        courses = supabase.table("courses").select(select_cols("courses.card")).eq("instructor_email", user["email"]).execute().data
     else:
-        # siswa cuma bisa lihat course yang SUDAH dia join
-        enrolled = supabase.table("enrollments").select("course_id").eq("user_id", user["id"]).execute().data
-        course_ids = [c["course_id"] for c in enrolled]
-        courses = supabase.table("courses").select("*").in_("id", course_ids).execute().data if course_ids else []
+        # siswa cuma bisa lihat course yang SUDAH dia join (course ikut ter-embed)
+        enrolled = supabase.table("enrollments").select(select_with("enrollments.course", "course")) \
+            .eq("user_id", user["id"]).execute().data
+        courses = [e["course"] for e in enrolled if e.get("course")]
 
     if not courses:
         if user["role"] == "instructor":
@@ -474,7 +1855,10 @@ def page_courses():
     for c in courses:
         with st.container():
             st.markdown(f"### 🎓 {c['title']}")
-            st.caption(c.get("description", "No description provided."))
+            # deskripsi diambil saat diminta (cache course yang sama dengan halaman course)
+            if st.toggle("ℹ️ Description", key=f"course_desc_{c['id']}"):
+                detail = load_course(c["id"]) or {}
+                st.caption(detail.get("description") or "No description provided.")
             st.markdown(f"**Course Code:** `{c['code']}`")
 
             if user["role"] == "instructor":
@@ -486,6 +1870,7 @@ def page_courses():
             if st.button("📖 Open Course", key=f"open_{c['id']}"):
                 st.session_state.current_course = c["id"]
                 st.session_state.last_course = c["id"]
+                st.session_state.pop("course_section", None)
                 st.session_state.page = "course_detail"
                 st.rerun()
 
@@ -498,16 +1883,845 @@ from io import BytesIO
 import base64
 import re
 from datetime import datetime
+from collections import OrderedDict
+import markdown
+
+# --- render cache ---
+# Konten modul, soal, pilihan jawaban dan deskripsi quiz dirender tiap rerun.
+# Hasil pemrosesan teks (embed -> iframe, perbaikan heading, gambar -> figure,
+# pemisahan baris $$...$$) disimpan per hash konten, jadi teks yang tidak berubah
+# tidak pernah di-parse ulang. Cache dibagi semua sesi (LRU, RENDER_CACHE_SIZE entri).
+RENDER_CACHE_SIZE = int(get_config("RENDER_CACHE_SIZE", 2048))
+
+_EMBED_RE = re.compile(r"<embed\s+src=\"([^\"]+)\"(?:\s+width=\"(\d+)\"|\s*)?(?:\s+height=\"(\d+)\"|\s*)?>")
+_HEADING_FIX_RE = re.compile(r'^(#{1,6})(\S)', re.MULTILINE)
+_MD_IMAGE_RE = re.compile(r'!\[([^\]]*)\]\(([^)]+)\)')
+_LATEX_LINE_RE = re.compile(r'^\s*\$\$(.+?)\$\$\s*$')
+
+
+class RenderCache:
+    """LRU sederhana: hash konten -> hasil render (thread-safe)."""
+
+    def __init__(self, max_entries):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get_or_build(self, kind, text, build):
+        key = hashlib.sha1(f"{kind}\0{text}".encode("utf-8")).hexdigest()
+        with self.lock:
+            if key in self.entries:
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return self.entries[key]
+        value = build(text)
+        with self.lock:
+            self.misses += 1
+            self.entries[key] = value
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+        return value
+
+
+@st.cache_resource
+def get_render_cache():
+    return RenderCache(RENDER_CACHE_SIZE)
+
+
+def _embed_to_iframe(match):
+    src = match.group(1)
+    width = match.group(2) or "560"
+    height = match.group(3) or "315"
+    # ini langsung HTML <iframe> yang nanti dirender lewat st.markdown (unsafe_allow_html=True)
+    return f'<div style="text-align:center; margin:16px 0;"><iframe src="{src}" width="{width}" height="{height}" frameborder="0" allowfullscreen></iframe></div>'
+
+
+def _image_to_figure(match):
+    alt_text = match.group(1) or ""
+    src = match.group(2)
+    caption = alt_text or "Gambar"
+
+    return f"""
+<figure style="text-align:center; margin:20px 0;">
+    <img src="{src}" alt="{caption}"
+         style="max-width:70%; height:auto; border-radius:6px;">
+    <figcaption style="font-size:14px; color:#555; margin-top:8px;">
+        {caption}
+    </figcaption>
+</figure>
+""".strip()
+
+
+def _split_latex(md_text):
+    """Pisahkan teks jadi segmen [("md", teks) | ("latex", ekspresi)]."""
+    segments = []
+    buffer = []
+    for line in md_text.splitlines():
+        m = _LATEX_LINE_RE.match(line)
+        if m:
+            if buffer:
+                segments.append(("md", "\n".join(buffer)))
+                buffer = []
+            segments.append(("latex", m.group(1)))
+        else:
+            buffer.append(line)
+    if buffer:
+        segments.append(("md", "\n".join(buffer)))
+    return tuple(segments)
+
+
+def _build_rich_segments(md_text):
+    # 1) <embed> -> <iframe>
+    md_text = _EMBED_RE.sub(_embed_to_iframe, md_text)
+    # 2) Otomatis tambahkan spasi setelah # kalau belum ada ("#Sejarah..." -> "# Sejarah...")
+    md_text = _HEADING_FIX_RE.sub(r'\1 \2', md_text)
+    # 3) Gambar markdown -> <figure> center + caption
+    md_text = _MD_IMAGE_RE.sub(_image_to_figure, md_text)
+    return _split_latex(md_text)
+
+
+def render_md_with_latex(md_text: str, rich: bool = False):
+    """
+    Render markdown yang mungkin berisi baris latex $$...$$.
+    - Baris penuh $$...$$ -> st.latex, baris lain -> st.markdown
+    - rich=True (konten modul): embed -> iframe, perbaikan heading, gambar -> figure,
+      dan HTML diizinkan
+    """
+    if not md_text:
+        return
+    if rich:
+        segments = get_render_cache().get_or_build("rich", md_text, _build_rich_segments)
+    else:
+        segments = get_render_cache().get_or_build("plain", md_text, _split_latex)
+    for kind, text in segments:
+        if kind == "latex":
+            st.latex(text)
+        else:
+            st.markdown(text, unsafe_allow_html=rich)
+
+
+def markdown_to_html(md_text: str) -> str:
+    """markdown.markdown dengan cache konten yang sama."""
+    return get_render_cache().get_or_build(
+        "html", md_text or "",
+        lambda t: markdown.markdown(t, extensions=["fenced_code", "md_in_html"]),
+    )
+
 
 # --- upload helper ---
-def upload_to_supabase(file):
-    """Upload file ke bucket thinkverse_uploads di Supabase."""
+# Satu pipeline untuk semua upload (foto profil, gambar modul/soal, tugas siswa):
+# - batas ukuran per jenis file (bisa diubah lewat UPLOAD_MAX_MB_<JENIS>)
+# - file kecil: satu request upload biasa
+# - file besar: resumable upload (protokol TUS Supabase), dikirim per chunk 6 MB
+#   sehingga memori tambahan per upload ~1 chunk dan chunk yang gagal bisa dilanjutkan
+# - request TUS memakai client HTTP bersama (get_http_client), breaker
+#   "storage:<bucket>" dan dicatat per chunk di call recorder
+# - upload_with_progress menjalankan transfer di thread upload; thread script
+#   hanya memperbarui progress bar dari session_state
+UPLOAD_CHUNK_SIZE = 6 * 1024 * 1024  # ukuran chunk yang diwajibkan Supabase untuk TUS
+UPLOAD_TIMEOUT = float(get_config("UPLOAD_TIMEOUT", 60))  # detik per request chunk
+UPLOAD_WORKERS = int(get_config("UPLOAD_WORKERS", 4))
+UPLOAD_KINDS = {
+    # jenis: (bucket, batas default MB)
+    "avatar": ("profile_pics", 2),
+    "image": ("thinkverse_uploads", 10),
+    "assignment": ("thinkverse_uploads", 200),
+}
+
+
+class UploadTooLarge(ValueError):
+    pass
+
+
+def upload_limit_bytes(kind):
+    bucket, default_mb = UPLOAD_KINDS[kind]
+    return int(float(get_config(f"UPLOAD_MAX_MB_{kind.upper()}", default_mb)) * 1024 * 1024)
+
+
+def _file_size(file):
+    size = getattr(file, "size", None)
+    if size is None:
+        pos = file.tell()
+        file.seek(0, 2)
+        size = file.tell()
+        file.seek(pos)
+    return size
+
+
+def _tus_request(http, bucket, op, filters, method, url, nbytes=0, retries=0, **kwargs):
+    """Satu request TUS lewat breaker storage, dicatat seperti panggilan PostgREST."""
+    table = f"storage:{bucket}"
+    breaker = get_breaker(table)
+    t0 = time.perf_counter()
+    try:
+        breaker.before_call()
+        resp = http.request(
+            method, url,
+            timeout=httpx.Timeout(UPLOAD_TIMEOUT, connect=SUPABASE_CONNECT_TIMEOUT, pool=SUPABASE_POOL_TIMEOUT),
+            **kwargs,
+        )
+        resp.raise_for_status()
+    except Exception as e:
+        if _is_transient_error(e):
+            breaker.failure()
+        elif not isinstance(e, BackendUnavailable):
+            breaker.success()  # storage menjawab (4xx/5xx)
+        record_call(table, op, filters, (time.perf_counter() - t0) * 1000,
+                    error=getattr(e, "code", None) or type(e).__name__, retries=retries)
+        raise
+    breaker.success()
+    record_call(table, op, filters, (time.perf_counter() - t0) * 1000, 0, nbytes, retries=retries)
+    return resp
+
+
+def _resumable_upload(bucket, path, file, size, content_type, on_progress):
+    """Upload TUS ke /storage/v1/upload/resumable, chunk demi chunk."""
+    http = get_http_client()
+    headers = {
+        "Authorization": f"Bearer {SUPABASE_KEY}",
+        "apikey": SUPABASE_KEY,
+        "Tus-Resumable": "1.0.0",
+    }
+    metadata = {
+        "bucketName": bucket,
+        "objectName": path,
+        "contentType": content_type,
+        "cacheControl": "3600",
+    }
+    encoded = ",".join(f"{k} {base64.b64encode(v.encode()).decode()}" for k, v in metadata.items())
+
+    created = _tus_request(
+        http, bucket, "tus_create", [path], "POST", f"{SUPABASE_URL}/storage/v1/upload/resumable",
+        headers={**headers, "Upload-Length": str(size), "Upload-Metadata": encoded},
+    )
+    location = created.headers["Location"]
+
+    offset = 0
+    retries = 0
+    while offset < size:
+        file.seek(offset)
+        chunk = file.read(UPLOAD_CHUNK_SIZE)
+        try:
+            resp = _tus_request(
+                http, bucket, "tus_chunk", [path, f"offset={offset}"], "PATCH", location,
+                nbytes=len(chunk), retries=retries,
+                headers={
+                    **headers,
+                    "Upload-Offset": str(offset),
+                    "Content-Type": "application/offset+octet-stream",
+                },
+                content=chunk,
+            )
+            offset = int(resp.headers.get("Upload-Offset", offset + len(chunk)))
+            retries = 0
+        except httpx.HTTPError:
+            retries += 1
+            if retries > 3:
+                raise
+            # lanjutkan dari offset terakhir yang diterima server
+            time.sleep(retries)
+            head = _tus_request(http, bucket, "tus_head", [path], "HEAD", location, retries=retries, headers=headers)
+            offset = int(head.headers["Upload-Offset"])
+        on_progress(offset, size)
+
+
+def upload_file(file, kind, path, on_progress=None):
+    """
+    Upload file (UploadedFile / file-like) ke bucket untuk `kind` dan kembalikan public URL.
+    on_progress(uploaded_bytes, total_bytes) dipanggil setiap chunk selesai.
+    """
     if not file:
         return None
-    file_bytes = file.read()
-    file_path = f"uploads/{int(datetime.now().timestamp())}_{file.name}"
-    supabase.storage.from_("thinkverse_uploads").upload(file_path, file_bytes)
-    return f"{SUPABASE_URL}/storage/v1/object/public/thinkverse_uploads/{file_path}"
+    bucket, _ = UPLOAD_KINDS[kind]
+    size = _file_size(file)
+    limit = upload_limit_bytes(kind)
+    if size > limit:
+        raise UploadTooLarge(
+            f"File {getattr(file, 'name', '')} ({size / 1024 / 1024:.1f} MB) melebihi batas {limit / 1024 / 1024:.0f} MB."
+        )
+    on_progress = on_progress or (lambda done, total: None)
+    content_type = getattr(file, "type", None) or "application/octet-stream"
+
+    file.seek(0)
+    if size <= UPLOAD_CHUNK_SIZE:
+        supabase.storage.from_(bucket).upload(path, file.read(), {"content-type": content_type})
+        on_progress(size, size)
+    else:
+        _resumable_upload(bucket, path, file, size, content_type, on_progress)
+    return f"{SUPABASE_URL}/storage/v1/object/public/{bucket}/{path}"
+
+
+@st.cache_resource
+def _upload_executor():
+    # terpisah dari pool fan_out: upload besar tidak boleh menahan worker query halaman
+    return ThreadPoolExecutor(max_workers=UPLOAD_WORKERS, thread_name_prefix="upload")
+
+
+def upload_with_progress(file, kind, path, label="Uploading..."):
+    """
+    upload_file di thread upload + progress bar Streamlit. Worker menulis progres
+    ke session_state, thread script hanya memperbarui bar sampai upload selesai.
+    """
+    from streamlit.runtime.scriptrunner import get_script_run_ctx
+
+    key = f"_upload_progress:{path}"
+    st.session_state[key] = (0, 0)
+
+    def on_progress(done, total):
+        st.session_state[key] = (done, total)
+
+    future = _upload_executor().submit(
+        _run_with_ctx, get_script_run_ctx(), lambda: upload_file(file, kind, path, on_progress=on_progress)
+    )
+    bar = st.progress(0.0, text=label)
+    try:
+        while not wait([future], timeout=0.25).done:
+            done, total = st.session_state.get(key, (0, 0))
+            bar.progress(min(done / total, 1.0) if total else 0.0, text=label)
+        url = future.result()
+    finally:
+        st.session_state.pop(key, None)
+    bar.empty()
+    return url
+
+
+# --- quiz submission helper ---
+def submit_quiz_attempt(quiz_id, user_id, answers_payload):
+    """
+    Simpan attempt + semua jawaban lewat RPC submit_quiz_attempt
+    (migrations/001_submit_quiz_attempt.sql) dalam satu round trip.
+    Kalau fungsi belum di-deploy, fallback: hitung attempt, insert attempt,
+    lalu bulk insert jawaban (3 panggilan, bukan 1 per soal).
+
+    Return dict: ok, attempt_id, attempt_number, score, attempts_made
+    (atau ok=False, reason="attempt_limit").
+    """
+    try:
+        res = supabase.rpc("submit_quiz_attempt", {
+            "p_quiz_id": quiz_id,
+            "p_user_id": user_id,
+            "p_answers": answers_payload,
+        }).execute()
+        return res.data
+    except Exception as e:
+        if getattr(e, "code", None) != "PGRST202":  # PGRST202 = fungsi tidak ditemukan
+            raise
+
+    quiz = supabase.table("quizzes").select("attempt_limit").eq("id", quiz_id).execute().data
+    attempt_limit = int((quiz[0].get("attempt_limit") if quiz else 0) or 0)
+    attempts_made = count_rows("quiz_attempts", quiz_id=quiz_id, user_id=user_id)
+    if attempt_limit and attempts_made >= attempt_limit:
+        return {"ok": False, "reason": "attempt_limit", "attempts_made": attempts_made, "attempt_limit": attempt_limit}
+
+    mcq = [a for a in answers_payload if a["is_correct"] is not None]
+    score = round(sum(1 for a in mcq if a["is_correct"]) / len(mcq) * 100, 2) if mcq else 0
+    attempt_res = supabase.table("quiz_attempts").insert({
+        "quiz_id": quiz_id,
+        "user_id": user_id,
+        "student_id": user_id,
+        "score": score,
+        "total": len(answers_payload),
+        "submitted_at": datetime.now().isoformat(),
+        "manual_score": None,
+        "teacher_feedback": None,
+        "attempt_number": attempts_made + 1,
+    }).execute()
+    attempt_id = attempt_res.data[0]["id"]
+    if answers_payload:
+        supabase.table("quiz_answers").insert(
+            [dict(a, attempt_id=attempt_id) for a in answers_payload]
+        ).execute()
+    return {
+        "ok": True,
+        "attempt_id": attempt_id,
+        "attempt_number": attempts_made + 1,
+        "score": score,
+        "attempts_made": attempts_made + 1,
+    }
+
+
+# --- cascade delete helper ---
+def delete_cascade(entity, entity_id):
+    """
+    Hapus course / quiz / discussion beserta seluruh data turunannya lewat RPC
+    delete_<entity>_cascade (migrations/002_cascade_deletes.sql): satu round trip, atomik.
+    Return dict {tabel: jumlah baris terhapus}.
+    Tanpa fallback delete per tabel: hapus bertahap lewat REST tidak atomik dan bisa
+    meninggalkan pohon data setengah terhapus, jadi fungsi yang belum di-deploy = error jelas.
+    """
+    fn = f"delete_{entity}_cascade"
+    try:
+        res = supabase.rpc(fn, {f"p_{entity}_id": int(entity_id)}).execute()
+    except Exception as e:
+        if getattr(e, "code", None) != "PGRST202":  # PGRST202 = fungsi tidak ditemukan
+            raise
+        raise RuntimeError(
+            f"fungsi {fn} belum ada di database — jalankan migrations/002_cascade_deletes.sql dulu"
+        ) from e
+    return res.data or {}
+
+
+def format_delete_counts(counts):
+    removed = [f"{table}: {n}" for table, n in counts.items() if n]
+    return ", ".join(removed) if removed else "tidak ada baris"
+
+
+# --- fan-out helper ---
+# Query yang tidak saling bergantung dijalankan bersamaan di thread pool bersama,
+# jadi waktu tunggu satu section ~ query paling lambat, bukan jumlah semuanya.
+FANOUT_WORKERS = int(get_config("FANOUT_WORKERS", 16))
+_fanout_local = threading.local()
+
+
+@st.cache_resource
+def _fanout_executor():
+    return ThreadPoolExecutor(max_workers=FANOUT_WORKERS, thread_name_prefix="fanout")
+
+
+def _run_with_ctx(ctx, fn):
+    # thread pool dipakai bergantian oleh semua sesi: pasang ScriptRunContext sesi
+    # pemanggil (session_state, cache, instrumentasi) lalu kembalikan yang lama.
+    # add_script_run_ctx(thread, None) TIDAK melepas context (None = context thread
+    # saat ini), jadi atribut thread dipulihkan / dihapus langsung.
+    from streamlit.runtime.scriptrunner import add_script_run_ctx
+    from streamlit.runtime.scriptrunner_utils.script_run_context import SCRIPT_RUN_CONTEXT_ATTR_NAME
+
+    thread = threading.current_thread()
+    previous = getattr(thread, SCRIPT_RUN_CONTEXT_ATTR_NAME, None)
+    add_script_run_ctx(thread, ctx)
+    _fanout_local.active = True
+    try:
+        return fn()
+    finally:
+        _fanout_local.active = False
+        if previous is None:
+            if hasattr(thread, SCRIPT_RUN_CONTEXT_ATTR_NAME):
+                delattr(thread, SCRIPT_RUN_CONTEXT_ATTR_NAME)
+        else:
+            setattr(thread, SCRIPT_RUN_CONTEXT_ATTR_NAME, previous)
+
+
+def fan_out(fallback=None, **loaders):
+    """
+    Jalankan loader (callable tanpa argumen) bersamaan dan tunggu semuanya.
+    Return dict nama -> hasil. Loader yang gagal memakai fallback[nama] kalau ada,
+    selain itu exception-nya dilempar ulang. Di dalam loader fan-out, berjalan berurutan.
+    """
+    fallback = fallback or {}
+    if getattr(_fanout_local, "active", False) or len(loaders) < 2:
+        futures = None
+    else:
+        from streamlit.runtime.scriptrunner import get_script_run_ctx
+
+        ctx = get_script_run_ctx()
+        executor = _fanout_executor()
+        futures = {name: executor.submit(_run_with_ctx, ctx, fn) for name, fn in loaders.items()}
+
+    results = {}
+    for name, fn in loaders.items():
+        try:
+            results[name] = futures[name].result() if futures else fn()
+        except Exception as e:
+            if name not in fallback:
+                raise
+            print(f"⚠️ fan_out {name} gagal: {e}")
+            results[name] = fallback[name]
+    return results
+
+
+# --- partial rerun (st.fragment) ---
+# Kartu interaktif (absensi, modul, thread forum, soal quiz, grading) dirender
+# sebagai @st.fragment: klik di dalamnya hanya menjalankan ulang kartu itu,
+# bukan seluruh script (routing, CSS, scroll script, semua tab).
+def in_fragment_rerun():
+    """True kalau yang sedang jalan hanya fragment, bukan rerun seluruh script."""
+    from streamlit.runtime.scriptrunner import get_script_run_ctx
+
+    ctx = get_script_run_ctx()
+    return bool(ctx and ctx.fragment_ids_this_run)
+
+
+def rerun_fragment():
+    """
+    st.rerun(scope="fragment") setelah write lokal. Streamlit menolak scope
+    fragment saat fragment jalan sebagai bagian dari rerun penuh -> rerun biasa.
+    """
+    st.rerun(scope="fragment" if in_fragment_rerun() else "app")
+
+
+# --- gradebook helpers ---
+def load_gradebook_data(course_id):
+    """
+    Ambil semua data gradebook satu course lewat query bulk yang difilter course
+    (jumlah query tetap, tidak tergantung jumlah siswa / assignment / quiz).
+    """
+    course_rows = fan_out(
+        assignments=lambda: load_cached_rows("assignments", course_id),
+        quizzes=lambda: load_cached_rows("quizzes", course_id),
+        sessions=lambda: load_cached_rows("attendance_sessions", course_id),
+        modules=lambda: load_cached_rows("modules", course_id),
+    )
+    data = read_path(
+        "gradebook",
+        lambda: _gradebook_rows_sql(course_id),
+        lambda: _gradebook_rows_rest(course_id, course_rows["assignments"], course_rows["quizzes"]),
+    )
+    data.update(course_rows)
+    return data
+
+
+def _gradebook_rows_rest(course_id, assignments, quizzes):
+    def students():
+        enrollments = (
+            supabase.table("enrollments").select("user_id, role").eq("course_id", course_id).execute().data or []
+        )
+        # filter role di Python supaya tidak masalah spasi / kapital
+        student_ids = [
+            e["user_id"] for e in enrollments
+            if str(e.get("role", "")).strip().lower() == "student"
+        ]
+        return (
+            supabase.table("users").select("id, name, email").in_("id", student_ids).execute().data or []
+            if student_ids else []
+        )
+
+    return fan_out(
+        students=students,
+        submissions=lambda: (
+            supabase.table("assignment_submissions")
+            .select("assignment_id, user_id, score, submitted_at")
+            .in_("assignment_id", [a["id"] for a in assignments])
+            .execute().data or []
+            if assignments else []
+        ),
+        attempts=lambda: (
+            supabase.table("quiz_attempts")
+            .select("quiz_id, user_id, score, submitted_at, attempt_number")
+            .in_("quiz_id", [q["id"] for q in quizzes])
+            .execute().data or []
+            if quizzes else []
+        ),
+        attendance=lambda: (
+            supabase.table("attendance")
+            .select("session_id, user_id, status, timestamp")
+            .eq("course_id", course_id)
+            .execute().data or []
+        ),
+        progress=lambda: (
+            supabase.table("module_progress")
+            .select("user_id, module_id, status")
+            .eq("course_id", course_id)
+            .execute().data or []
+        ),
+    )
+
+
+def _gradebook_rows_sql(course_id):
+    params = {"cid": course_id}
+    return fan_out(
+        students=lambda: sql_query("gradebook.students", """
+            select u.id, u.name, u.email
+            from enrollments e
+            join users u on u.id = e.user_id
+            where e.course_id = %(cid)s and lower(trim(e.role)) = 'student'
+        """, params),
+        submissions=lambda: sql_query("gradebook.submissions", """
+            select s.assignment_id, s.user_id, s.score, s.submitted_at
+            from assignment_submissions s
+            join assignments a on a.id = s.assignment_id
+            where a.course_id = %(cid)s
+        """, params),
+        attempts=lambda: sql_query("gradebook.attempts", """
+            select t.quiz_id, t.user_id, t.score, t.submitted_at, t.attempt_number
+            from quiz_attempts t
+            join quizzes q on q.id = t.quiz_id
+            where q.course_id = %(cid)s
+        """, params),
+        attendance=lambda: sql_query("gradebook.attendance", """
+            select session_id, user_id, status, timestamp
+            from attendance
+            where course_id = %(cid)s
+        """, params),
+        progress=lambda: sql_query("gradebook.progress", """
+            select user_id, module_id, status
+            from module_progress
+            where course_id = %(cid)s
+        """, params),
+    )
+
+
+# --- attendance / grading / forum reads ---
+def load_attendance_matrix(session_ids):
+    """
+    Semua record absensi untuk sesi-sesi ini -> {session_id: [record]}.
+    Jalur SQL sekaligus join nama user (kolom user_name) untuk UserNameLoader.prime().
+    """
+    if not session_ids:
+        return {}
+    rows = read_path(
+        "attendance",
+        lambda: sql_query("attendance", f"""
+            select {sql_cols("attendance.list", "a")}, u.name as user_name, u.avatar_url as user_avatar_url
+            from attendance a
+            left join users u on u.id = a.user_id
+            where a.session_id = any(%(ids)s)
+            order by a.id
+        """, {"ids": list(session_ids)}),
+        lambda: select_authored(
+            "attendance", "attendance.list",
+            lambda q: q.in_("session_id", list(session_ids)).order("id", desc=False),
+        ),
+    )
+    by_session = {sid: [] for sid in session_ids}
+    for r in rows:
+        by_session.setdefault(r["session_id"], []).append(r)
+    return by_session
+
+
+def load_quiz_attempts(quiz_id):
+    """Semua attempt satu quiz, terbaru dulu (jalur SQL + user_name)."""
+    return read_path(
+        "grading.attempts",
+        lambda: sql_query("grading.attempts", f"""
+            select {sql_cols("quiz_attempts.list", "t")}, u.name as user_name
+            from quiz_attempts t
+            left join users u on u.id = t.user_id
+            where t.quiz_id = %(qid)s
+            order by t.submitted_at desc
+        """, {"qid": quiz_id}),
+        lambda: supabase.table("quiz_attempts").select(select_cols("quiz_attempts.list")).eq("quiz_id", quiz_id)
+        .order("submitted_at", desc=True).execute().data or [],
+    )
+
+
+def load_attempt_answers(attempt_ids):
+    """Jawaban untuk sekumpulan attempt -> {attempt_id: [jawaban]} (urut id)."""
+    if not attempt_ids:
+        return {}
+    rows = read_path(
+        "grading.answers",
+        lambda: sql_query("grading.answers", f"""
+            select {sql_cols("quiz_answers.list", "a")} from quiz_answers a
+            where attempt_id = any(%(ids)s)
+            order by id
+        """, {"ids": list(attempt_ids)}),
+        lambda: supabase.table("quiz_answers").select(select_cols("quiz_answers.list")).in_("attempt_id", list(attempt_ids))
+        .order("id", desc=False).execute().data or [],
+    )
+    by_attempt = {}
+    for r in rows:
+        by_attempt.setdefault(r["attempt_id"], []).append(r)
+    return by_attempt
+
+
+def keyset_after(row):
+    """Cursor keyset (created_at, id) dari baris terakhir satu halaman."""
+    return (row["created_at"], row["id"])
+
+
+def _keyset_filter(op, cursor):
+    # or_() PostgREST untuk (created_at, id) < / > cursor; id memecah created_at yang sama
+    created_at, row_id = cursor
+    return f'created_at.{op}."{created_at}",and(created_at.eq."{created_at}",id.{op}.{row_id})'
+
+
+def _split_page(rows, limit):
+    """Query mengambil limit + 1 baris: return (halaman, cursor halaman berikutnya / None)."""
+    if len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    return rows, keyset_after(rows[-1])
+
+
+def load_forum_topics(course_id, before=None, limit=None):
+    """
+    Satu halaman topik course (terbaru dulu) tanpa isi, dengan nama & avatar penulis
+    dan jumlah komentar (agregat di query yang sama). before = cursor dari halaman
+    sebelumnya. Return (topics, cursor halaman berikutnya / None).
+    """
+    limit = limit or FORUM_PAGE_SIZE
+
+    def sql():
+        where = "and (d.created_at, d.id) < (%(ts)s::timestamptz, %(tid)s)" if before else ""
+        return sql_query("forum.topics", f"""
+            select {sql_cols("discussions.list", "d")}, u.name as user_name, u.avatar_url as user_avatar_url,
+                   (select count(*) from discussion_replies r where r.discussion_id = d.id) as reply_count
+            from discussions d
+            left join users u on u.id = d.user_id
+            where d.course_id = %(cid)s {where}
+            order by d.created_at desc, d.id desc
+            limit %(n)s
+        """, {"cid": course_id, "ts": before and before[0], "tid": before and before[1], "n": limit + 1})
+
+    def build(q):
+        q = q.eq("course_id", course_id)
+        if before:
+            q = q.or_(_keyset_filter("lt", before))
+        return q.order("created_at", desc=True).order("id", desc=True).limit(limit + 1)
+
+    def rest():
+        rows = select_authored("discussions", "discussions.list", build, "reply_count")
+        for r in rows:
+            embedded = r.pop("reply_count", None)
+            r["reply_count"] = embedded[0]["count"] if embedded else None
+        missing = [r["id"] for r in rows if r["reply_count"] is None]
+        if missing:
+            # fallback PGRST200: hitung dari satu query discussion_id komentar halaman ini
+            counts = Counter(
+                r["discussion_id"] for r in supabase.table("discussion_replies").select("discussion_id")
+                .in_("discussion_id", missing).execute().data or []
+            )
+            for r in rows:
+                if r["reply_count"] is None:
+                    r["reply_count"] = counts.get(r["id"], 0)
+        return rows
+
+    return _split_page(read_path("forum.topics", sql, rest), limit)
+
+
+def _forum_replies_rest(topic_id, after, limit):
+    def build(q):
+        q = q.eq("discussion_id", topic_id)
+        if after:
+            q = q.or_(_keyset_filter("gt", after))
+        return q.order("created_at", desc=False).order("id", desc=False).limit(limit + 1)
+
+    return select_authored("discussion_replies", "discussion_replies.list", build)
+
+
+def load_forum_replies(topic_id, after=None, limit=None):
+    """Satu halaman komentar topik (terlama dulu) setelah cursor after. Return (replies, cursor / None)."""
+    limit = limit or FORUM_REPLY_PAGE_SIZE
+
+    def sql():
+        where = "and (r.created_at, r.id) > (%(ts)s::timestamptz, %(rid)s)" if after else ""
+        return sql_query("forum.replies", f"""
+            select {sql_cols("discussion_replies.list", "r")}, u.name as user_name, u.avatar_url as user_avatar_url
+            from discussion_replies r
+            left join users u on u.id = r.user_id
+            where r.discussion_id = %(tid)s {where}
+            order by r.created_at, r.id
+            limit %(n)s
+        """, {"tid": topic_id, "ts": after and after[0], "rid": after and after[1], "n": limit + 1})
+
+    rows = read_path("forum.replies", sql, lambda: _forum_replies_rest(topic_id, after, limit))
+    return _split_page(rows, limit)
+
+
+def load_forum_bodies(topics, topic_ids, reply_limit=None):
+    """
+    Isi topik + halaman pertama komentar hanya untuk topik yang dibuka.
+    Isi ditulis ke baris topik ("content"); return {discussion_id: (replies, cursor / None)}.
+    """
+    topic_ids = list(topic_ids)
+    if not topic_ids:
+        return {}
+    reply_limit = reply_limit or FORUM_REPLY_PAGE_SIZE
+    need_content = bool(topics) and "content" not in topics[0]
+
+    def sql():
+        contents = sql_query("forum.contents", """
+            select id, content from discussions where id = any(%(ids)s)
+        """, {"ids": topic_ids}) if need_content else []
+        # limit per topik dalam satu query (lateral), bukan satu query per topik
+        replies = sql_query("forum.replies", f"""
+            select r.* from unnest(%(ids)s::bigint[]) as t(id)
+            cross join lateral (
+                select {sql_cols("discussion_replies.list", "r")}, u.name as user_name, u.avatar_url as user_avatar_url
+                from discussion_replies r
+                left join users u on u.id = r.user_id
+                where r.discussion_id = t.id
+                order by r.created_at, r.id
+                limit %(n)s
+            ) r
+        """, {"ids": topic_ids, "n": reply_limit + 1})
+        by_topic = {tid: [] for tid in topic_ids}
+        for r in replies:
+            by_topic.setdefault(r["discussion_id"], []).append(r)
+        return contents, {tid: _split_page(rows, reply_limit) for tid, rows in by_topic.items()}
+
+    def rest():
+        # PostgREST tidak punya limit per induk: satu query per topik yang dibuka, paralel
+        loaders = {
+            f"replies_{tid}": (lambda tid=tid: _forum_replies_rest(tid, None, reply_limit))
+            for tid in topic_ids
+        }
+        if need_content:
+            loaders["contents"] = lambda: supabase.table("discussions").select("id, content") \
+                .in_("id", topic_ids).execute().data or []
+        loaded = fan_out(**loaders)
+        pages = {tid: _split_page(loaded[f"replies_{tid}"], reply_limit) for tid in topic_ids}
+        return loaded.get("contents", []), pages
+
+    contents, pages = read_path("forum.bodies", sql, rest)
+    content_by_id = {r["id"]: r.get("content") for r in contents}
+    for t in topics:
+        if t["id"] in content_by_id:
+            t["content"] = content_by_id[t["id"]]
+    return pages
+
+
+def load_forum_threads(course_id, open_topic_ids=None):
+    """
+    Halaman pertama topik course + isi & halaman pertama komentar untuk topik yang
+    dibuka (None = semua topik di halaman itu). Return (topics, {discussion_id: (replies, cursor)}).
+    """
+    topics, _ = load_forum_topics(course_id)
+    if open_topic_ids is None:
+        open_topic_ids = [t["id"] for t in topics]
+    return topics, load_forum_bodies(topics, open_topic_ids)
+
+
+def build_gradebook_matrix(data):
+    """
+    Matrix siswa × (assignment, quiz, kehadiran, modul) dengan operasi pandas
+    (pivot/groupby), tanpa loop per siswa.
+    - assignment: skor tertinggi (kosong = belum dikumpulkan / belum dinilai)
+    - quiz: skor attempt terbaik
+    - kehadiran / modul: persen
+    """
+    import pandas as pd
+
+    students = pd.DataFrame(data["students"], columns=["id", "name", "email"]).set_index("id")
+    matrix = pd.DataFrame({"Nama": students["name"], "Email": students["email"]}, index=students.index)
+
+    def pivot_scores(rows, item_col, items, prefix):
+        titles = {it["id"]: f"{prefix} {it['title']}" for it in items}
+        if not titles:
+            return None
+        df = pd.DataFrame(rows, columns=[item_col, "user_id", "score"])
+        df["score"] = pd.to_numeric(df["score"], errors="coerce")
+        table = df.pivot_table(index="user_id", columns=item_col, values="score", aggfunc="max")
+        return table.reindex(index=matrix.index, columns=list(titles)).rename(columns=titles)
+
+    for part in (
+        pivot_scores(data["submissions"], "assignment_id", data["assignments"], "📝"),
+        pivot_scores(data["attempts"], "quiz_id", data["quizzes"], "🧠"),
+    ):
+        if part is not None:
+            matrix = matrix.join(part)
+
+    subs = pd.DataFrame(data["submissions"], columns=["assignment_id", "user_id"])
+    matrix["Tugas dikumpulkan"] = (
+        subs.groupby("user_id")["assignment_id"].nunique().reindex(matrix.index).fillna(0).astype(int)
+    )
+
+    att = pd.DataFrame(data["attendance"], columns=["session_id", "user_id", "status"])
+    present = att[att["status"].astype(str).str.lower() == "present"]
+    n_sessions = len(data["sessions"])
+    hadir = present.groupby("user_id")["session_id"].nunique().reindex(matrix.index).fillna(0)
+    matrix["Kehadiran %"] = (hadir / n_sessions * 100).round(1) if n_sessions else 0.0
+
+    prog = pd.DataFrame(data["progress"], columns=["user_id", "module_id", "status"])
+    completed = prog[prog["status"] == "completed"]
+    n_modules = len(data["modules"])
+    selesai = completed.groupby("user_id")["module_id"].nunique().reindex(matrix.index).fillna(0)
+    matrix["Modul selesai %"] = (selesai / n_modules * 100).round(1) if n_modules else 0.0
+
+    return matrix.sort_values("Nama").reset_index(drop=True)
 
 
 # ============================================
@@ -530,7 +2744,9 @@ def page_course_detail():
 
     # --- Load course data ---
     try:
-        c = supabase.table("courses").select("*").eq("id", cid).execute().data[0]
+        c = load_course(cid)
+        if c is None:
+            raise LookupError(f"course {cid} not found")
     except Exception as e:
         st.error(f"Error loading course data: {e}")
         return
@@ -569,100 +2785,53 @@ def page_course_detail():
             st.warning("This will permanently delete the course and all related data (modules, assignments, quizzes, announcements).")
             confirm = st.checkbox("Yes, I understand and want to delete this course")
             if confirm and st.button("🗑️ Delete Course Permanently"):
-                supabase.table("modules").delete().eq("course_id", cid).execute()
-                supabase.table("assignments").delete().eq("course_id", cid).execute()
-                supabase.table("quiz_questions").delete().eq("quiz_id", cid).execute()
-                supabase.table("quizzes").delete().eq("course_id", cid).execute()
-                supabase.table("announcements").delete().eq("course_id", cid).execute()
-                supabase.table("attendance").delete().eq("course_id", cid).execute()
-                supabase.table("enrollments").delete().eq("course_id", cid).execute()
-                supabase.table("courses").delete().eq("id", cid).execute()
+                try:
+                    counts = delete_cascade("course", cid)
+                except Exception as e:
+                    st.error(f"❌ Failed to delete course: {e}")
+                    st.stop()
+                invalidate_course(cid)
                 st.success("✅ Course deleted successfully!")
+                st.toast(f"🗑️ Removed — {format_delete_counts(counts)}")
                 time.sleep(1)
                 st.session_state.page = "dashboard"
                 st.session_state.current_course = None
                 st.rerun()
-
-    # === Deteksi tab aktif (dari session state) ===
-    active_tab = st.session_state.get("active_tab", "overview")
-    
-    # === Buat semua tab ===
-    if user["role"] == "instructor":
-        tabs = st.tabs([
-            "📚 Overview",
-            "🕒 Attendance",
-            "📦 Learning Activity",
-            "📋 Assignments",
-            "🧠 Quiz",
-            "📣 Announcements",
-            "💬 Discussion Forum",
-            "👥 Students"
-        ])
-    else:
-        tabs = st.tabs([
-            "📚 Overview",
-            "🕒 Attendance",
-            "📦 Learning Activity",
-            "📋 Assignments",
-            "🧠 Quiz",
-            "📣 Announcements",
-            "💬 Discussion Forum"
-        ])
-
-    st.write("Jumlah tab:", len(tabs))
-        
-    # === Map nama tab ke indeks ===
-    tab_index = {
-        "overview": 0,
-        "attendance": 1,
-        "module": 2,
-        "assignment": 3,
-        "quiz": 4,
-        "announcement": 5,
-        "discussion": 6     # 🆕 Tambahkan juga ke mapping
+
+    # === Router section course ===
+    # Hanya section yang aktif yang dijalankan (loader + render),
+    # bukan semua tab seperti st.tabs.
+    sections = {
+        "overview": "📚 Overview",
+        "attendance": "🕒 Attendance",
+        "module": "📦 Learning Activity",
+        "assignment": "📋 Assignments",
+        "quiz": "🧠 Quiz",
+        "announcement": "📣 Announcements",
+        "discussion": "💬 Discussion Forum",
     }
+    if user["role"] == "instructor":
+        sections["students"] = "👥 Students"
+
+    # deep link (mis. tombol "Open Quiz" dari modul) -> pindah section
+    target_section = st.session_state.pop("active_tab", None)
+    if target_section in sections:
+        st.session_state.course_section = target_section
+    if st.session_state.get("course_section") not in sections:
+        st.session_state.course_section = "overview"
+
+    section = st.radio(
+        "Course section",
+        list(sections.keys()),
+        format_func=sections.get,
+        horizontal=True,
+        key="course_section",
+        label_visibility="collapsed",
+    )
+    set_call_section(f"course:{section}")
 
-    
-    # === FINAL FIXED AUTO TAB + AUTO SCROLL ===
     import streamlit.components.v1 as components
-    
-    if "tab_triggered" not in st.session_state:
-        st.session_state.tab_triggered = False
-    
-    if active_tab in ["quiz", "assignment"] and not st.session_state.tab_triggered:
-        target_index = tab_index.get(active_tab)
-    
-        js = f"""
-        <script>
-        function goTop() {{
-            const anchor = document.getElementById("course-top-anchor");
-            if(anchor) {{
-                anchor.scrollIntoView({{behavior:"smooth", block:"start"}});
-            }} else {{
-                window.scrollTo({{top:0, behavior:"smooth"}});
-            }}
-        }}
-    
-        setTimeout(() => {{
-            try {{
-                const tabs = window.parent.document.querySelectorAll('button[data-baseweb="tab"]');
-                if (tabs && tabs[{target_index}]) {{
-                    tabs[{target_index}].click();
-                }}
-            }} catch(e) {{ console.log(e); }}
-        }}, 300);
-    
-        setTimeout(goTop, 800);
-        setTimeout(goTop, 1500);
-        </script>
-        """
-    
-        components.html(js, height=1)
-        st.session_state.tab_triggered = True
-    
-    else:
-        st.session_state.active_tab = None
-    
+
     
     # ===== ALWAYS FORCE SCROLL TO TOP WHEN ENTERING COURSE =====
     components.html("""
@@ -684,10 +2853,9 @@ def page_course_detail():
     # =====================================
     # DASHBOARD
     # =====================================
-    with tabs[0]:
+    if section == "overview":
         st.markdown("## 🎯 Course Overview")
 
-        c = supabase.table("courses").select("*").eq("id", cid).execute().data[0]
         st.markdown("### About this Course")
         st.write(c.get("description") or "_No description provided._")
 
@@ -717,17 +2885,19 @@ def page_course_detail():
                     "youtube_url": new_yt,
                     "reference_book": new_book
                 }).eq("id", cid).execute()
+                invalidate_course(cid, "courses")
                 st.success("✅ Course dashboard updated successfully!")
                 st.rerun()
 
     # =====================================
     # ATTENDANCE (Improved)
     # =====================================
-    with tabs[1]:
+    if section == "attendance":
         st.subheader("🕒 Attendance Tracker")
     
         # ambil semua sesi absensi untuk course ini
-        sessions = supabase.table("attendance_sessions").select("*").eq("course_id", cid).execute().data
+        sessions = load_cached_rows("attendance_sessions", cid)
+        store = get_course_store(cid)
     
         if user["role"] == "instructor":
             with st.form("create_attendance_session"):
@@ -755,6 +2925,10 @@ def page_course_detail():
     
                         try:
                             result = supabase.table("attendance_sessions").insert(data_to_insert).execute()
+                            invalidate_course(cid, "attendance_sessions")
+                            if result.data:
+                                # sesi baru belum punya record -> tidak perlu di-load
+                                store.set_item("attendance", result.data[0]["id"], [])
                             st.success("✅ Attendance session created successfully!")
                             st.rerun()
                         except Exception as e:
@@ -762,23 +2936,40 @@ def page_course_detail():
                             st.json(data_to_insert)
     
         if sessions:
-            for s in sessions:
+            user_loader = get_user_loader()
+            if user["role"] == "instructor":
+                # ambil semua record dulu supaya nama siswa bisa di-load sekaligus
+                records_by_session = store.get_items(
+                    "attendance", [s["id"] for s in sessions], load_attendance_matrix
+                )
+                for records in records_by_session.values():
+                    if records and "user_name" in records[0]:
+                        user_loader.prime(records)
+                    else:
+                        user_loader.want(*[r["user_id"] for r in records])
+                user_loader.load()
+            else:
+                # siswa cukup tahu sesi mana yang sudah dia hadiri (satu query)
+                records_by_session = {}
+                present_session_ids = store.get("present", lambda: {
+                    r["session_id"]
+                    for r in supabase.table("attendance").select("session_id")
+                    .eq("user_id", user["id"]).eq("course_id", cid)
+                    .execute().data or []
+                })
+
+            @st.fragment
+            def attendance_card(s, records):
                 st.markdown(f"#### 📅 {s['date']} — {s.get('note', '_No note_') or '_No note_'}")
-    
+
                 # tampilkan deadline
                 if s.get("deadline"):
                     st.caption(f"🕔 Deadline: {s['deadline']}")
-    
-                records = supabase.table("attendance").select("*").eq("session_id", s["id"]).execute().data
-    
+
                 if user["role"] == "instructor":
                     st.write("**Attendance Records:**")
                     if records:
-                        names = []
-                        for r in records:
-                            u = supabase.table("users").select("name").eq("id", r["user_id"]).execute().data
-                            if u:
-                                names.append(u[0]["name"])
+                        names = [n for n in (user_loader.get(r["user_id"]) for r in records) if n]
                         st.markdown(", ".join(names) if names else "_No students marked present yet._")
                     else:
                         st.info("No attendance yet for this session.")
@@ -786,14 +2977,13 @@ def page_course_detail():
                     if st.button(f"❌ Delete Session ({s['date']})", key=f"del_sess_{s['id']}"):
                         supabase.table("attendance").delete().eq("session_id", s["id"]).execute()
                         supabase.table("attendance_sessions").delete().eq("id", s["id"]).execute()
+                        invalidate_course(cid, "attendance_sessions")
+                        store.drop_item("attendance", s["id"])
                         st.success("🗑️ Session deleted successfully!")
                         st.rerun()
     
                 elif user["role"] == "student":
-                    existing = supabase.table("attendance").select("*") \
-                        .eq("session_id", s["id"]).eq("user_id", user["id"]).execute().data
-    
-                    if existing:
+                    if s["id"] in present_session_ids:
                         st.success("✅ You are marked present for this session.")
                     else:
                         now = datetime.now()
@@ -814,12 +3004,24 @@ def page_course_detail():
                                     "status": "present"
                                 }
                                 try:
-                                    supabase.table("attendance").insert(data_att).execute()
-                                    st.success("✅ Your attendance has been recorded!")
-                                    st.rerun()
+                                    # upsert pada (session_id, user_id): kirim ulang dari antrian tidak dobel;
+                                    # tanpa unique constraint (005) -> cek exists lalu insert
+                                    res = buffered_write(
+                                        "attendance", "upsert", data_att,
+                                        on_conflict="session_id,user_id", ignore_duplicates=True,
+                                    )
+                                    present_session_ids.add(s["id"])
+                                    if res is None:
+                                        st.toast("📥 You're offline — your attendance will be sent when the connection is back.")
+                                    else:
+                                        st.toast("✅ Your attendance has been recorded!")
+                                    rerun_fragment()
                                 except Exception as e:
                                     st.error(f"❌ Error saving attendance: {e}")
                                     st.json(data_att)
+
+            for s in sessions:
+                attendance_card(s, records_by_session.get(s["id"], []))
         else:
             st.info("No attendance sessions created yet.")
 
@@ -827,62 +3029,12 @@ def page_course_detail():
     # =====================================
     # MODULES
     # =====================================
-    with tabs[2]:
+    if section == "module":
         from datetime import datetime
-        import markdown, re
         # components sebenernya sudah nggak kepakai kalau kita tidak pakai components.html
         # boleh kamu hapus baris di bawah ini kalau sudah yakin
         # import streamlit.components.v1 as components
     
-        def render_md_with_latex(md_text: str):
-            """
-            - Perbaiki heading markdown yang ditulis tanpa spasi (#Judul -> # Judul)
-            - Ubah gambar markdown ![alt](url) jadi figure di tengah + caption
-            - Baris penuh $$...$$ -> st.latex
-            - Baris lain -> st.markdown (boleh mengandung HTML)
-            """
-            if not md_text:
-                return
-        
-            # 1) Otomatis tambahkan spasi setelah # kalau belum ada
-            #    "#Sejarah..." -> "# Sejarah..."
-            md_text = re.sub(r'^(#{1,6})(\S)', r'\1 \2', md_text, flags=re.MULTILINE)
-        
-            # 2) Ubah sintaks gambar markdown jadi <figure> center + caption
-            def img_repl(m):
-                alt_text = m.group(1) or ""
-                src = m.group(2)
-                caption = alt_text or "Gambar"
-        
-                return f"""
-        <figure style="text-align:center; margin:20px 0;">
-            <img src="{src}" alt="{caption}"
-                 style="max-width:70%; height:auto; border-radius:6px;">
-            <figcaption style="font-size:14px; color:#555; margin-top:8px;">
-                {caption}
-            </figcaption>
-        </figure>
-        """.strip()
-        
-            md_text = re.sub(r'!\[([^\]]*)\]\(([^)]+)\)', img_repl, md_text)
-        
-            # 3) Render latex dan markdown
-            lines = md_text.splitlines()
-            buffer = []
-        
-            for line in lines:
-                m = re.match(r'^\s*\$\$(.+?)\$\$\s*$', line)
-                if m:
-                    if buffer:
-                        st.markdown("\n".join(buffer), unsafe_allow_html=True)
-                        buffer = []
-                    st.latex(m.group(1))
-                else:
-                    buffer.append(line)
-        
-            if buffer:
-                st.markdown("\n".join(buffer), unsafe_allow_html=True)
-        
         st.subheader("📦 Learning Activities")
 
         
@@ -895,45 +3047,46 @@ def page_course_detail():
     
         st.session_state.current_course = cid
     
-        # === Load data utama ===
-        try:
-            mods = (
-                supabase.table("modules")
-                .select("*")
-                .eq("course_id", int(cid))
-                .order("order_index", desc=False)
+        # === Load data utama (modul, link, quiz, assignment, progress) sekaligus ===
+        # quiz/assignment tujuan link ikut ter-embed di module_link; daftar lengkap
+        # quiz/assignment hanya perlu untuk form link instruktur.
+        # progress & isi modul disimpan di store sesi: "Mark as Completed" dan edit
+        # modul langsung mengubah data lokal, rerun sesudahnya tidak read ulang.
+        store = get_course_store(cid)
+        loaders = {
+            "mods": lambda: load_cached_rows("modules", cid),
+            "module_links": lambda: load_module_links(cid),
+        }
+        if user["role"] == "instructor":
+            loaders["all_quizzes"] = lambda: load_cached_rows("quizzes", cid)
+            loaders["all_assignments"] = lambda: load_cached_rows("assignments", cid)
+        if user["role"] == "student":
+            loaders["progress_data"] = lambda: store.get("progress", lambda: {
+                p["module_id"]: p["status"]
+                for p in supabase.table("module_progress")
+                .select("module_id, status")
+                .eq("user_id", user["id"])
+                .eq("course_id", cid)
                 .execute()
-                .data
-                or []
-            )
-        except Exception as e:
-            st.error(f"❌ Failed to load modules: {e}")
+                .data or []
+            })
+        loaded = fan_out(fallback={"mods": None, "module_links": [], "progress_data": None}, **loaders)
+        loaded.setdefault("all_quizzes", [])
+        loaded.setdefault("all_assignments", [])
+        mods = loaded["mods"]
+        if mods is None:
+            st.error("❌ Failed to load modules.")
             mods = []
-    
-        # === Load link module–quiz–assignment ===
-        try:
-            module_links = supabase.table("module_link").select("*").eq("course_id", cid).execute().data or []
-        except Exception:
-            module_links = []
-    
-        # === Load quiz dan assignment ===
-        all_quizzes = supabase.table("quizzes").select("*").eq("course_id", cid).execute().data or []
-        all_assignments = supabase.table("assignments").select("*").eq("course_id", cid).execute().data or []
+        module_links = loaded["module_links"]
+        all_quizzes = loaded["all_quizzes"]
+        all_assignments = loaded["all_assignments"]
+        activity_graph = load_activity_graph_or(cid, mods, module_links, all_quizzes, all_assignments)
     
         # === Load progress siswa ===
+        progress_dict = {}
         if user["role"] == "student":
-            try:
-                progress_data = (
-                    supabase.table("module_progress")
-                    .select("*")
-                    .eq("user_id", user["id"])
-                    .eq("course_id", cid)
-                    .execute()
-                    .data
-                )
-                progress_dict = {p["module_id"]: p["status"] for p in progress_data}
-            except Exception:
-                progress_dict = {}
+            # dict milik store: perubahan status di bawah langsung tersimpan di store
+            progress_dict = loaded["progress_data"] if loaded["progress_data"] is not None else {}
     
             total_modules = len(mods)
             completed_count = sum(1 for s in progress_dict.values() if s == "completed")
@@ -946,12 +3099,32 @@ def page_course_detail():
                 st.success("🎉 Congratulations! You have completed all learning activities.")
     
         # === Tampilkan setiap modul ===
+        # modul yang baru dibuka siswa -> "in_progress", di-upsert sekali per rerun
+        opened_modules = {}
         if mods:
-            previous_completed = True
-            for idx, m in enumerate(mods, start=1):
+            # isi modul hanya diambil untuk modul yang kontennya dibuka; default:
+            # modul aktif siswa (belum selesai pertama) / modul pertama untuk instruktur
+            if user["role"] == "student":
+                current = next((m for m in mods if progress_dict.get(m["id"]) != "completed"), None)
+            else:
+                current = mods[0]
+            if current:
+                st.session_state.setdefault(f"show_mod_{cid}_{current['id']}", True)
+            def load_contents(ids):
+                return store.get_items(
+                    "module_content", ids, lambda missing: load_text_column("modules", cid, missing, "content")
+                )
+
+            module_contents = load_contents(
+                [m["id"] for m in mods if st.session_state.get(f"show_mod_{cid}_{m['id']}")]
+            )
+
+            # satu kartu modul = satu fragment: toggle konten / Mark as Completed
+            # hanya menjalankan ulang kartu ini (progress_dict & module_contents dibagi)
+            @st.fragment
+            def module_card(idx, m, locked):
                 title = f"📘 {idx}. {m['title']}"
                 status = progress_dict.get(m["id"], "not_started") if user["role"] == "student" else None
-                locked = not previous_completed and user["role"] == "student"
     
                 # ikon status
                 status_icon = ""
@@ -965,57 +3138,32 @@ def page_course_detail():
                 with st.expander(f"{status_icon} {title}", expanded=(not locked)):
                     if locked:
                         st.warning("🔒 This module is locked. Complete the previous module first.")
-                        continue
+                        return
     
-                    # === Auto set "in progress" saat dibuka ===
-                    if user["role"] == "student":
-                        existing = (
-                            supabase.table("module_progress")
-                            .select("id")
-                            .eq("user_id", user["id"])
-                            .eq("module_id", m["id"])
-                            .execute()
-                            .data
-                        )
-                        if not existing:
-                            supabase.table("module_progress").insert({
-                                "user_id": user["id"],
-                                "module_id": m["id"],
-                                "course_id": int(cid),
-                                "status": "in_progress",
-                                "updated_at": datetime.now().isoformat(),
-                            }).execute()
+                    # === Auto set "in progress" saat dibuka (ditulis sekaligus setelah loop) ===
+                    if user["role"] == "student" and m["id"] not in progress_dict:
+                        opened_modules[m["id"]] = "in_progress"
     
                     # === Render konten modul ===
-                    raw_content = m.get("content", "No content available.")
-                    embed_pattern = r"<embed\s+src=\"([^\"]+)\"(?:\s+width=\"(\d+)\"|\s*)?(?:\s+height=\"(\d+)\"|\s*)?>"
-
-                    def replace_embed(match):
-                        src = match.group(1)
-                        width = match.group(2) or "560"
-                        height = match.group(3) or "315"
-                        # ini langsung HTML <iframe> yang nanti dirender lewat st.markdown (unsafe_allow_html=True)
-                        return f'<div style="text-align:center; margin:16px 0;"><iframe src="{src}" width="{width}" height="{height}" frameborder="0" allowfullscreen></iframe></div>'
-
-                    # ganti <embed> jadi <iframe> dulu
-                    content_with_embeds = re.sub(embed_pattern, replace_embed, raw_content)
+                    if st.toggle("📖 Show content", key=f"show_mod_{cid}_{m['id']}"):
+                        if m["id"] not in module_contents:
+                            module_contents.update(load_contents([m["id"]]))
+                        raw_content = module_contents.get(m["id"]) or "No content available."
+                        # embed, gambar dan latex diproses sekali per isi konten (render cache)
+                        render_md_with_latex(raw_content, rich=True)
 
-                    # sekarang render markdown + latex
-                    render_md_with_latex(content_with_embeds)
-                    
-                    if m.get("video_url"):
-                        st.video(m["video_url"])
+                        if m.get("video_url"):
+                            st.video(m["video_url"])
     
                     # === Related Activities (Quiz & Assignment) ===
-                    related_quiz = [l for l in module_links if l["module_id"] == m["id"] and l["type"] == "quiz"]
-                    related_asg = [l for l in module_links if l["module_id"] == m["id"] and l["type"] == "assignment"]
+                    related_quiz = linked_activities(activity_graph, m["id"], "quiz")
+                    related_asg = linked_activities(activity_graph, m["id"], "assignment")
                     
                     if related_quiz or related_asg:
                         st.markdown("### 🧩 Related Activities")
                     
                         # === Tampilkan quiz terkait ===
-                        for i, rq in enumerate(related_quiz):
-                            q = next((q for q in all_quizzes if q["id"] == rq["target_id"]), None)
+                        for i, q in enumerate(related_quiz):
                             if q:
                                 stable_key = f"quiz_{cid}_{m['id']}_{q['id']}_{i}"
                                 st.markdown(f"🧠 **Quiz:** {q.get('title', 'Untitled Quiz')}")
@@ -1025,8 +3173,7 @@ def page_course_detail():
                                     st.rerun()
                     
                         # === Tampilkan assignment terkait ===
-                        for j, ra in enumerate(related_asg):
-                            a = next((a for a in all_assignments if a["id"] == ra["target_id"]), None)
+                        for j, a in enumerate(related_asg):
                             if a:
                                 stable_key = f"asg_{cid}_{m['id']}_{a['id']}_{j}"
                                 st.markdown(f"📋 **Assignment:** {a.get('title', 'Untitled Assignment')}")
@@ -1040,7 +3187,6 @@ def page_course_detail():
                                 if st.button("➡️ Open Assignment", key=btn_key):
                                     st.session_state.selected_assignment_id = a["id"]
                                     st.session_state.active_tab = "assignment"
-                                    st.session_state.tab_triggered = False  # <<< WAJIB supaya auto-switch jalan
                                     st.rerun()
                                 
 
@@ -1050,29 +3196,16 @@ def page_course_detail():
                     if user["role"] == "student" and status != "completed":
                         done_key = f"done_{cid}_{m['id']}"
                         if st.button("✅ Mark as Completed", key=done_key):
-                            existing = (
-                                supabase.table("module_progress")
-                                .select("id")
-                                .eq("user_id", user["id"])
-                                .eq("module_id", m["id"])
-                                .execute()
-                                .data
-                            )
-                            if not existing:
-                                supabase.table("module_progress").insert({
-                                    "user_id": user["id"],
-                                    "module_id": m["id"],
-                                    "course_id": int(cid),
-                                    "status": "completed",
-                                    "updated_at": datetime.now().isoformat(),
-                                }).execute()
+                            res = save_module_progress(user["id"], cid, {m["id"]: "completed"})
+                            progress_dict[m["id"]] = "completed"
+                            if res is None:
+                                st.toast("📥 You're offline — your progress will be saved when the connection is back.")
                             else:
-                                supabase.table("module_progress").update({
-                                    "status": "completed",
-                                    "updated_at": datetime.now().isoformat(),
-                                }).eq("user_id", user["id"]).eq("module_id", m["id"]).execute()
-                            st.success("🎯 learning activity marked as completed!")
-                            st.rerun()
+                                st.toast("🎯 learning activity marked as completed!")
+                            # modul berikutnya baru terbuka (dan progress bar naik) lewat rerun penuh
+                            if idx < len(mods):
+                                st.rerun()
+                            rerun_fragment()
 
                     # === Guru ===
                     if user["role"] == "instructor":
@@ -1083,7 +3216,8 @@ def page_course_detail():
                             edit_key = f"edit_{cid}_{m['id']}"
                             if st.button(f"📝 Edit", key=edit_key):
                                 st.session_state.edit_module_id = m["id"]
-                                st.session_state.edit_module_data = m
+                                content = load_contents([m["id"]]).get(m["id"])
+                                st.session_state.edit_module_data = dict(m, content=content or "")
                                 st.session_state.show_edit_form = True
                                 st.rerun()
                     
@@ -1091,6 +3225,7 @@ def page_course_detail():
                             del_key = f"del_{cid}_{m['id']}"
                             if st.button(f"🗑️ Delete", key=del_key):
                                 supabase.table("modules").delete().eq("id", m["id"]).execute()
+                                invalidate_course(cid, "modules")
                                 st.success(f"✅ Module '{m['title']}' deleted successfully!")
                                 st.rerun()
                     
@@ -1102,6 +3237,7 @@ def page_course_detail():
                                     prev_module = mods[idx - 2]  # modul sebelumnya
                                     supabase.table("modules").update({"order_index": prev_module["order_index"]}).eq("id", m["id"]).execute()
                                     supabase.table("modules").update({"order_index": m["order_index"]}).eq("id", prev_module["id"]).execute()
+                                    invalidate_course(cid, "modules")
                                     st.rerun()
                     
                         with col4:
@@ -1111,6 +3247,7 @@ def page_course_detail():
                                     next_module = mods[idx]
                                     supabase.table("modules").update({"order_index": next_module["order_index"]}).eq("id", m["id"]).execute()
                                     supabase.table("modules").update({"order_index": m["order_index"]}).eq("id", next_module["id"]).execute()
+                                    invalidate_course(cid, "modules")
                                     st.rerun()
                     
                         with col5:
@@ -1126,17 +3263,27 @@ def page_course_detail():
                                             "type": link_type,
                                             "target_id": available[target],
                                         }).execute()
+                                        invalidate_course(cid, "module_link")
                                         st.success(f"✅ {link_type.title()} linked successfully!")
                                         st.rerun()
                                 else:
                                     st.info(f"No available {link_type}s to link.")
 
-                    previous_completed = (
-                        progress_dict.get(m["id"]) == "completed" if user["role"] == "student" else True
-                    )
+            previous_completed = True
+            for idx, m in enumerate(mods, start=1):
+                locked = not previous_completed and user["role"] == "student"
+                module_card(idx, m, locked)
+                previous_completed = (
+                    progress_dict.get(m["id"]) == "completed" if user["role"] == "student" else True
+                )
     
         else:
             st.info("No modules yet for this course.")
+
+        # on conflict do nothing: status "completed" tidak pernah turun ke "in_progress"
+        if opened_modules:
+            save_module_progress(user["id"], cid, opened_modules, keep_existing=True)
+            progress_dict.update(opened_modules)
     
         # === FORM EDIT MODUL ===
         if st.session_state.get("show_edit_form"):
@@ -1153,6 +3300,8 @@ def page_course_detail():
                         "content": new_content,
                         "video_url": new_video,
                     }).eq("id", m["id"]).execute()
+                    invalidate_course(cid, "modules")
+                    store.set_item("module_content", m["id"], new_content)
                     st.success("✅ Module updated successfully!")
                     st.session_state.show_edit_form = False
                     st.rerun()
@@ -1176,11 +3325,12 @@ def page_course_detail():
                     else:
                         img_markdown = ""
                         if uploaded_image:
-                            img_bytes = uploaded_image.read()
                             file_path = f"uploads/{int(datetime.now().timestamp())}_{uploaded_image.name}"
-                            supabase.storage.from_("thinkverse_uploads").upload(file_path, img_bytes)
-                            img_url = f"{SUPABASE_URL}/storage/v1/object/public/thinkverse_uploads/{file_path}"
-                            img_markdown = f"\n\n![Uploaded Image]({img_url})"
+                            try:
+                                img_url = upload_with_progress(uploaded_image, "image", file_path)
+                                img_markdown = f"\n\n![Uploaded Image]({img_url})"
+                            except Exception as e:
+                                st.warning(f"❌ Failed to upload image: {e}")
     
                         final_content = (content or "") + (img_markdown or "")
                         supabase.table("modules").insert({
@@ -1190,6 +3340,7 @@ def page_course_detail():
                             "content": final_content.strip(),
                             "video_url": video_url.strip() if video_url else None,
                         }).execute()
+                        invalidate_course(cid, "modules")
                         st.success(f"✅ Learning Acttivity '{title}' added successfully!")
                         st.rerun()
 
@@ -1203,7 +3354,7 @@ def page_course_detail():
     # =====================================
     # ASSIGNMENTS
     # =====================================
-    with tabs[3]:
+    if section == "assignment":
         import re
         import streamlit.components.v1 as components
         from datetime import datetime
@@ -1212,18 +3363,20 @@ def page_course_detail():
     
         # === Load assignments ===
         try:
-            assignments = (
-                supabase.table("assignments").select("*").eq("course_id", cid).execute().data or []
-            )
+            assignments = load_cached_rows("assignments", cid)
             assignments = [a for a in assignments if a.get("id")]
         except Exception as e:
             st.error(f"❌ Failed to load assignments: {e}")
             assignments = []
     
+        activity_graph = load_activity_graph_or(cid, assignments=assignments)
+
         # === Display all assignments ===
+        selected_assignment_id = st.session_state.pop("selected_assignment_id", None)
         if assignments:
             for a in assignments:
-                with st.expander(f"📄 {a['title']}"):
+                with st.expander(f"📄 {a['title']}", expanded=(a["id"] == selected_assignment_id)):
+                    render_used_in(activity_graph, "assignment", a["id"])
                     st.markdown(f"**Description:**\n\n{a.get('description', '_No description provided._')}")
     
                     # === EMBEDDED RESOURCES ===
@@ -1328,10 +3481,8 @@ def page_course_detail():
                         file = st.file_uploader("Upload your work (PDF, DOCX, ZIP, etc.)", key=f"up_{a['id']}")
                         if file and st.button("📤 Submit", key=f"submit_{a['id']}"):
                             try:
-                                file_bytes = file.read()
                                 file_path = f"assignments/{user['id']}_{int(datetime.now().timestamp())}_{file.name}"
-                                supabase.storage.from_("thinkverse_uploads").upload(file_path, file_bytes)
-                                file_url = f"{SUPABASE_URL}/storage/v1/object/public/thinkverse_uploads/{file_path}"
+                                file_url = upload_with_progress(file, "assignment", file_path, label=f"📤 Uploading {file.name}...")
     
                                 supabase.table("assignment_submissions").insert({
                                     "assignment_id": a["id"],
@@ -1365,6 +3516,7 @@ def page_course_detail():
                                             "embed_url_1": new_url1.strip() if new_url1 else None,
                                             "embed_url_2": new_url2.strip() if new_url2 else None,
                                         }).eq("id", a["id"]).execute()
+                                        invalidate_course(cid, "assignments")
                                         st.success("✅ Assignment updated successfully!")
                                         st.rerun()
                                     except Exception as e:
@@ -1378,6 +3530,7 @@ def page_course_detail():
                             ):
                                 try:
                                     supabase.table("assignments").delete().eq("id", a["id"]).execute()
+                                    invalidate_course(cid, "assignments")
                                     st.success("✅ Assignment deleted!")
                                     st.rerun()
                                 except Exception as e:
@@ -1413,6 +3566,7 @@ def page_course_detail():
                                 "embed_url_1": embed_url_1.strip() if embed_url_1 else None,
                                 "embed_url_2": embed_url_2.strip() if embed_url_2 else None,
                             }).execute()
+                            invalidate_course(cid, "assignments")
                             st.success(f"✅ Assignment '{title}' added successfully!")
                             st.session_state.saving_assignment = False
                             st.rerun()
@@ -1425,47 +3579,18 @@ def page_course_detail():
     # =====================================
     # QUIZZES (FULL INTERACTIVE)
     # =====================================
-    with tabs[4]:
+    if section == "quiz":
         import streamlit.components.v1 as components
         import re, markdown, json
         from datetime import datetime
         from PIL import Image
         import io, base64
 
-        def render_md_with_latex(md_text: str):
-            """
-            Render markdown yang mungkin berisi baris latex dengan $$...$$
-            Baris yang full $$...$$ -> st.latex
-            Baris lain -> st.markdown
-            """
-            if not md_text:
-                return
-        
-            lines = md_text.splitlines()
-            buffer = []
-        
-            for line in lines:
-                m = re.match(r'^\s*\$\$(.+?)\$\$\s*$', line)
-                if m:
-                    # kalau ada teks biasa yang sudah dikumpulkan, render dulu
-                    if buffer:
-                        st.markdown("\n".join(buffer))
-                        buffer = []
-                    # render latex tanpa $$-nya
-                    st.latex(m.group(1))
-                else:
-                    buffer.append(line)
-        
-            # sisa teks biasa
-            if buffer:
-                st.markdown("\n".join(buffer))
-        
-            
         st.subheader("🧠 Quiz")
 
         # --- Helper: safe fetch quizzes for course ---
         def load_quizzes_for_course(course_id):
-            return supabase.table("quizzes").select("*").eq("course_id", course_id).execute().data or []
+            return load_cached_rows("quizzes", course_id)
     
         # --- Helper: normalize instructor-provided correct answer to a single letter A-E if possible
         def normalize_correct_answer(raw_correct, choices_str):
@@ -1514,15 +3639,28 @@ def page_course_detail():
             
         quizzes = load_quizzes_for_course(cid)
         selected_quiz_id = st.session_state.get("selected_quiz_id")
+        activity_graph = load_activity_graph_or(cid, quizzes=quizzes)
     
         if not quizzes:
             st.info("No quizzes yet.")
         else:
+            # deskripsi & soal hanya diambil untuk quiz yang dibuka
+            if selected_quiz_id:
+                st.session_state[f"open_quiz_body_{selected_quiz_id}"] = True
+            quiz_descriptions = load_text_column(
+                "quizzes", cid,
+                [q["id"] for q in quizzes if st.session_state.get(f"open_quiz_body_{q['id']}")],
+                "description",
+            )
             for q in quizzes:
                 expanded = selected_quiz_id == q["id"]
                 with st.expander(f"📝 {q['title']}", expanded=expanded):
                     if expanded:
                         st.session_state.selected_quiz_id = None
+                    render_used_in(activity_graph, "quiz", q["id"])
+                    if not st.toggle("📂 Open quiz", key=f"open_quiz_body_{q['id']}") or q["id"] not in quiz_descriptions:
+                        continue
+                    q = dict(q, description=quiz_descriptions[q["id"]])
     
                     # --- Render quiz description ---
                     desc = q.get("description","") or ""
@@ -1562,26 +3700,25 @@ def page_course_detail():
                                             "description": new_desc,
                                             "attempt_limit": int(attempt_limit)
                                         }).eq("id", q["id"]).execute()
+                                        invalidate_course(cid, "quizzes")
                                         st.success("✅ Quiz updated successfully!")
                                         st.rerun()
                                     except Exception as e:
                                         st.error(f"❌ Failed to update quiz: {e}")
     
                     # --- Load questions ---
-                    try:
-                        questions = supabase.table("quiz_questions").select("*").eq("quiz_id", q["id"]).order("id", desc=False).execute().data or []
-                    except Exception:
-                        questions = supabase.table("quiz_questions").select("*").eq("quiz_id", q["id"]).execute().data or []
+                    questions = load_cached_rows("quiz_questions", q["id"])
     
                     if questions:
                         st.markdown("### ✏️ Questions:")
-                        answers = {}
-                        q_rubrics = {}
-    
-                        # prepare normalized correct answers for display / use
-                        normalized_correct_map = {}
-    
-                        for i, qs in enumerate(questions, 1):
+
+                        # satu soal = satu fragment: ganti jawaban / simpan soal hanya
+                        # menjalankan ulang blok soal itu (jawaban dibaca dari session_state saat submit)
+                        @st.fragment
+                        def question_block(q, i, qs):
+                            if in_fragment_rerun():
+                                qs = next((x for x in load_cached_rows("quiz_questions", q["id"]) if x["id"] == qs["id"]), qs)
+                            q_rubrics = {}
                             st.markdown(f"**{i}.**")
 
                             q_text = qs.get("question", "") or ""
@@ -1613,22 +3750,14 @@ def page_course_detail():
                                     render_md_with_latex(choice)
                                 
                                 # Dropdown tetap huruf A-E
-                                ans = st.selectbox(
+                                st.selectbox(
                                     "Pilih jawaban:",
                                     ["-- pilih jawaban --"] + [chr(65+idx) for idx in range(len(choices))],
                                     key=f"ans_{qs['id']}"
                                 )
-                                
-                                # Store selected letter
-                                answers[qs["id"]] = "" if ans.startswith("--") else ans.strip().upper()
-
-    
-                                # store normalized correct answer for later (ensure single letter A-E if possible)
-                                normalized_correct_map[qs["id"]] = normalize_correct_answer(qs.get("correct_answer",""), qs.get("choices",""))
     
                             else:
-                                ans = st.text_area("Jawaban singkat / esai:", key=f"ans_{qs['id']}", height=120)
-                                answers[qs["id"]] = ans
+                                st.text_area("Jawaban singkat / esai:", key=f"ans_{qs['id']}", height=120)
     
                             if rubric_data:
                                 st.caption(f"Rubrik: max {rubric_data.get('max_score')} — {rubric_data.get('note','')}")
@@ -1667,34 +3796,39 @@ def page_course_detail():
                                         if rubric_store is not None:
                                             update_payload["rubric"] = rubric_store
                                         supabase.table("quiz_questions").update(update_payload).eq("id", qs["id"]).execute()
-                                        st.success("✅ Question updated!")
-                                        st.rerun()
+                                        invalidate_cached(q["id"], "quiz_questions")
+                                        st.toast("✅ Question updated!")
+                                        rerun_fragment()
     
                                 # Delete question
                                 if st.button(f"🗑️ Delete Question {i}", key=f"del_q_{qs['id']}"):
                                     supabase.table("quiz_questions").delete().eq("id", qs['id']).execute()
+                                    invalidate_cached(q["id"], "quiz_questions")
                                     st.success("Question deleted.")
                                     st.rerun()
+
+                        for i, qs in enumerate(questions, 1):
+                            question_block(q, i, qs)
     
                         # --- Student submit ---
                         if user["role"] == "student":
                             attempt_limit = int(q.get("attempt_limit",0) or 0)
-                            attempts = supabase.table("quiz_attempts").select("*").eq("quiz_id", q["id"]).eq("user_id", user["id"]).execute().data or []
-                            attempts_made = len(attempts)
+                            attempts_made = count_rows("quiz_attempts", quiz_id=q["id"], user_id=user["id"])
                             can_attempt = (attempt_limit == 0) or (attempts_made < attempt_limit)
     
                             if not can_attempt:
                                 st.warning(f"⚠️ Kamu sudah melakukan {attempts_made} percobaan. Batas percobaan = {attempt_limit}.")
                             else:
                                 if st.button("✅ Kumpulkan Jawaban", key=f"submit_quiz_{q['id']}"):
-                                    total_questions = len(questions)
                                     auto_score = 0
                                     total_auto_possible = 0
                                     answers_payload = []
     
-                                    # process each question
+                                    # process each question (jawaban = nilai widget di tiap blok soal)
                                     for qs in questions:
-                                        user_ans_raw = answers.get(qs["id"]) or ""
+                                        user_ans_raw = st.session_state.get(f"ans_{qs['id']}") or ""
+                                        if qs.get("type") == "multiple_choice":
+                                            user_ans_raw = "" if user_ans_raw.startswith("--") else user_ans_raw.strip().upper()
                                         # treat MCQ answers as single letter uppercase A-E (we stored it that way above)
                                         correct_letter = normalize_correct_answer(qs.get("correct_answer",""), qs.get("choices",""))
     
@@ -1743,44 +3877,18 @@ def page_course_detail():
                                                 "is_correct": None
                                             })
     
-                                    # compute MCQ percent
-                                    mcq_percent = (auto_score / total_auto_possible * 100) if total_auto_possible > 0 else 0
-    
-                                    # Insert attempt record
-                                    attempt_number = attempts_made + 1
+                                    # Simpan attempt + semua jawaban dalam satu panggilan (RPC)
                                     try:
-                                        attempt_res = supabase.table("quiz_attempts").insert({
-                                            "quiz_id": q["id"],
-                                            "user_id": user["id"],
-                                            "student_id": user["id"],
-                                            "score": round(mcq_percent,2),  # percent for MCQ part
-                                            "total": total_questions,
-                                            "submitted_at": datetime.now().isoformat(),
-                                            "manual_score": None,
-                                            "teacher_feedback": None,
-                                            "attempt_number": attempt_number
-                                        }).execute()
-                                        attempt_id = attempt_res.data[0]["id"] if attempt_res.data else None
+                                        result = submit_quiz_attempt(q["id"], user["id"], answers_payload)
                                     except Exception as e:
                                         st.error(f"❌ Failed to create attempt record: {e}")
-                                        attempt_id = None
-    
-                                    # Insert answers
-                                    if attempt_id:
-                                        for a_payload in answers_payload:
-                                            try:
-                                                supabase.table("quiz_answers").insert({
-                                                    "attempt_id": attempt_id,
-                                                    "question_id": a_payload["question_id"],
-                                                    "choice_id": a_payload["choice_id"],
-                                                    "text_answer": a_payload["text_answer"],
-                                                    "is_correct": a_payload["is_correct"]
-                                                }).execute()
-                                            except Exception as e:
-                                                st.warning(f"Warning saving one answer: {e}")
-    
-                                        st.success(f"✅ Jawaban terkirim! (Attempt #{attempt_number}) — Skor MCQ: {round(mcq_percent,2)}%")
+                                        result = None
+
+                                    if result and result.get("ok"):
+                                        st.success(f"✅ Jawaban terkirim! (Attempt #{result['attempt_number']}) — Skor MCQ: {result['score']}%")
                                         st.rerun()
+                                    elif result and result.get("reason") == "attempt_limit":
+                                        st.warning(f"⚠️ Kamu sudah melakukan {result['attempts_made']} percobaan. Batas percobaan = {result['attempt_limit']}.")
                                     else:
                                         st.error("❌ Gagal menyimpan attempt. Coba ulang.")
     
@@ -1788,123 +3896,141 @@ def page_course_detail():
                         st.info("No questions yet for this quiz.")
     
                     # --- Instructor Submissions & Grading ---
+                    # Query tetap per halaman: attempts (1) + nama user (1) + jawaban halaman ini (1);
+                    # soal sudah ada di `questions` (cache). Join dilakukan di memori.
                     if user["role"] == "instructor":
                         st.divider()
                         st.markdown("### 🧾 Submissions & Grading")
-                        attempts_all = supabase.table("quiz_attempts").select("*").eq("quiz_id", q["id"]).order("submitted_at", desc=True).execute().data or []
+                        attempts_all = load_quiz_attempts(q["id"])
                         if not attempts_all:
                             st.info("Belum ada submission untuk quiz ini.")
                         else:
-                            users_attempts = {}
-                            for at in attempts_all:
-                                users_attempts.setdefault(at["user_id"],[]).append(at)
-                            for uid, at_list in users_attempts.items():
-                                for at in at_list:
-                                    st.markdown(f"**User #{uid} — Attempt #{at.get('attempt_number','?')} — submitted {at.get('submitted_at','')}**")
-                                    answers_for_attempt = supabase.table("quiz_answers").select("*").eq("attempt_id", at['id']).order("id", desc=False).execute().data or []
-                                    manual_scores = {}
-                                    total_manual_max = 0.0
-                                    total_manual_obtained = 0.0
-                                    for idx_q, ans_row in enumerate(answers_for_attempt,1):
-                                    # Ambil data soal dengan aman (kalau error, jangan bikin app crash)
-                                        try:
-                                            qrec_resp = (
-                                                supabase.table("quiz_questions")
-                                                .select("*")
-                                                .eq("id", ans_row["question_id"])
-                                                .execute()
-                                            )
-                                            qrec_list = qrec_resp.data or []
-                                            qrec = qrec_list[0] if qrec_list else {}
-                                        except Exception as e:
-                                            st.warning(
-                                                f"Gagal memuat data soal (question_id={ans_row.get('question_id')}): {e}"
-                                            )
-                                            qrec = {}
-                                        
-                                        qtext_html = markdown.markdown(
-                                            qrec.get("question", ""),
-                                            extensions=["fenced_code", "md_in_html"]
-                                        )
-
-                                        st.markdown(f"**Soal {idx_q}:**")
-                                        st.components.v1.html(f"<div style='font-size:14px;'>{qtext_html}</div>", height=110, scrolling=False)
-    
-                                        if qrec.get("type") == "multiple_choice":
-                                            # ans_row.text_answer probably stores a letter (A-E) or fallback text
-                                            saved_ans = str(ans_row.get('text_answer','') or "")
-                                            # try to show both letter and choice text
-                                            choice_text = letter_to_choice_text(saved_ans, qrec.get("choices",""))
-                                            display_student = f"{saved_ans}" + (f" — {choice_text}" if choice_text else "")
-                                            st.markdown(f"- **Jawaban siswa:** {display_student}")
-                                            is_corr = ans_row.get("is_correct")
-                                            st.markdown(f"- **Auto-correct:** {'Benar' if is_corr else 'Salah'}")
-                                        else:
-                                            st.markdown(f"- **Jawaban siswa (esai):**")
-                                            st.markdown(ans_row.get("text_answer",""))
-                                            rubric = {}
-                                            raw = qrec.get("rubric","")
-                                            if raw:
+                            questions_by_id = {qs["id"]: qs for qs in questions}
+                            user_loader = get_user_loader()
+                            if "user_name" in attempts_all[0]:
+                                user_loader.prime(attempts_all)
+                            else:
+                                user_loader.want(*[at["user_id"] for at in attempts_all])
+                                user_loader.load()
+
+                            # --- filter + paginasi ---
+                            fcol1, fcol2, fcol3 = st.columns([0.3, 0.45, 0.25])
+                            with fcol1:
+                                grade_filter = st.selectbox("Status", ["Semua", "Belum dinilai"], key=f"grade_filter_{q['id']}")
+                            with fcol2:
+                                student_options = {"Semua siswa": None}
+                                for uid in dict.fromkeys(at["user_id"] for at in attempts_all):
+                                    student_options[f"{user_loader.name(uid)} (#{uid})"] = uid
+                                student_label = st.selectbox("Siswa", list(student_options.keys()), key=f"grade_student_{q['id']}")
+                            filtered = attempts_all
+                            if grade_filter == "Belum dinilai":
+                                filtered = [at for at in filtered if at.get("manual_score") is None and not at.get("teacher_feedback")]
+                            if student_options[student_label] is not None:
+                                filtered = [at for at in filtered if at["user_id"] == student_options[student_label]]
+                            total_pages = max(1, -(-len(filtered) // GRADING_PAGE_SIZE))
+                            with fcol3:
+                                page_no = st.number_input("Halaman", min_value=1, max_value=total_pages, value=1, step=1, key=f"grade_page_{q['id']}")
+                            page_attempts = filtered[(page_no - 1) * GRADING_PAGE_SIZE: page_no * GRADING_PAGE_SIZE]
+                            st.caption(f"{len(filtered)} submission — halaman {page_no}/{total_pages}")
+
+                            answers_by_attempt = load_attempt_answers([at["id"] for at in page_attempts])
+
+                            # satu attempt = satu fragment: Save Grade hanya menjalankan ulang kartu ini
+                            @st.fragment
+                            def grading_card(at, answers_for_attempt, questions_by_id):
+                                st.markdown(f"**{user_loader.name(at['user_id'])} — Attempt #{at.get('attempt_number','?')} — submitted {at.get('submitted_at','')}**")
+                                manual_scores = {}
+                                total_manual_max = 0.0
+                                total_manual_obtained = 0.0
+                                for idx_q, ans_row in enumerate(answers_for_attempt,1):
+                                    qrec = questions_by_id.get(ans_row["question_id"], {})
+                                    
+                                    qtext_html = markdown_to_html(qrec.get("question", ""))
+
+                                    st.markdown(f"**Soal {idx_q}:**")
+                                    st.components.v1.html(f"<div style='font-size:14px;'>{qtext_html}</div>", height=110, scrolling=False)
+    
+                                    if qrec.get("type") == "multiple_choice":
+                                        # ans_row.text_answer probably stores a letter (A-E) or fallback text
+                                        saved_ans = str(ans_row.get('text_answer','') or "")
+                                        # try to show both letter and choice text
+                                        choice_text = letter_to_choice_text(saved_ans, qrec.get("choices",""))
+                                        display_student = f"{saved_ans}" + (f" — {choice_text}" if choice_text else "")
+                                        st.markdown(f"- **Jawaban siswa:** {display_student}")
+                                        is_corr = ans_row.get("is_correct")
+                                        st.markdown(f"- **Auto-correct:** {'Benar' if is_corr else 'Salah'}")
+                                    else:
+                                        st.markdown(f"- **Jawaban siswa (esai):**")
+                                        st.markdown(ans_row.get("text_answer",""))
+                                        rubric = {}
+                                        raw = qrec.get("rubric","")
+                                        if raw:
+                                            try:
+                                                rubric = json.loads(raw)
+                                            except:
                                                 try:
-                                                    rubric = json.loads(raw)
+                                                    parts = raw.split("|",1)
+                                                    rubric = {"max_score": float(parts[0]), "note": parts[1] if len(parts)>1 else ""}
                                                 except:
-                                                    try:
-                                                        parts = raw.split("|",1)
-                                                        rubric = {"max_score": float(parts[0]), "note": parts[1] if len(parts)>1 else ""}
-                                                    except:
-                                                        rubric = {}
-                                            max_score = rubric.get("max_score",0.0)
-                                            if max_score:
-                                                total_manual_max += float(max_score)
-                                            ms_key = f"manual_{at['id']}_{ans_row['id']}"
-                                            manual_scores[ans_row['id']] = st.number_input(f"Nilai Soal {idx_q} (max {max_score})", min_value=0.0, max_value=float(max_score or 9999), value=0.0, step=0.5, key=ms_key)
-    
-                                    st.markdown("---")
-                                    st.markdown(f"**Auto-score (MCQ percent):** {at.get('score')}%")
-                                    teacher_feedback = st.text_area(f"Teacher feedback (attempt {at['id']})", value=at.get("teacher_feedback") or "", key=f"tf_{at['id']}")
-                                    manual_total_key = f"manual_total_{at['id']}"
-                                    manual_total = st.number_input("Manual total (sum of essay scores)", min_value=0.0, value=float(at.get("manual_score") or 0.0), key=manual_total_key)
-                                    if st.button("💾 Save Grade & Feedback", key=f"save_grade_{at['id']}"):
-                                        try:
-                                            q_answers = supabase.table("quiz_answers").select("*").eq("attempt_id", at['id']).execute().data or []
-                                            num_mcq = 0
-                                            mcq_correct = 0
-                                            for a_r in q_answers:
-                                                qrec = supabase.table("quiz_questions").select("type").eq("id", a_r["question_id"]).execute().data
-                                                qtype = qrec[0]["type"] if qrec else None
-                                                if qtype == "multiple_choice":
-                                                    num_mcq += 1
-                                                    if a_r.get("is_correct"):
-                                                        mcq_correct += 1
-                                            mcq_percent = (mcq_correct / num_mcq * 100) if num_mcq>0 else None
-                                            essay_percent = (manual_total / total_manual_max * 100) if total_manual_max>0 else None
-                                            if mcq_percent is None and essay_percent is None:
-                                                final_percent = 0.0
-                                            elif mcq_percent is None:
-                                                final_percent = essay_percent
-                                            elif essay_percent is None:
-                                                final_percent = mcq_percent
-                                            else:
-                                                final_percent = (mcq_percent + essay_percent)/2.0
-                                            final_score = round(final_percent,2)
-                                            supabase.table("quiz_attempts").update({
-                                                "manual_score": float(manual_total),
-                                                "teacher_feedback": teacher_feedback,
-                                                "score": final_score
-                                            }).eq("id", at['id']).execute()
-                                            st.success("✅ Grade saved.")
-                                            st.rerun()
-                                        except Exception as e:
-                                            st.error(f"❌ Failed to save grade: {e}")
+                                                    rubric = {}
+                                        max_score = rubric.get("max_score",0.0)
+                                        if max_score:
+                                            total_manual_max += float(max_score)
+                                        ms_key = f"manual_{at['id']}_{ans_row['id']}"
+                                        manual_scores[ans_row['id']] = st.number_input(f"Nilai Soal {idx_q} (max {max_score})", min_value=0.0, max_value=float(max_score or 9999), value=0.0, step=0.5, key=ms_key)
+    
+                                st.markdown("---")
+                                st.markdown(f"**Auto-score (MCQ percent):** {at.get('score')}%")
+                                teacher_feedback = st.text_area(f"Teacher feedback (attempt {at['id']})", value=at.get("teacher_feedback") or "", key=f"tf_{at['id']}")
+                                manual_total_key = f"manual_total_{at['id']}"
+                                manual_total = st.number_input("Manual total (sum of essay scores)", min_value=0.0, value=float(at.get("manual_score") or 0.0), key=manual_total_key)
+                                if st.button("💾 Save Grade & Feedback", key=f"save_grade_{at['id']}"):
+                                    try:
+                                        # jawaban & tipe soal sudah ada di memori — tidak perlu query ulang
+                                        mcq_rows = [
+                                            a_r for a_r in answers_for_attempt
+                                            if questions_by_id.get(a_r["question_id"], {}).get("type") == "multiple_choice"
+                                        ]
+                                        num_mcq = len(mcq_rows)
+                                        mcq_correct = sum(1 for a_r in mcq_rows if a_r.get("is_correct"))
+                                        mcq_percent = (mcq_correct / num_mcq * 100) if num_mcq>0 else None
+                                        essay_percent = (manual_total / total_manual_max * 100) if total_manual_max>0 else None
+                                        if mcq_percent is None and essay_percent is None:
+                                            final_percent = 0.0
+                                        elif mcq_percent is None:
+                                            final_percent = essay_percent
+                                        elif essay_percent is None:
+                                            final_percent = mcq_percent
+                                        else:
+                                            final_percent = (mcq_percent + essay_percent)/2.0
+                                        final_score = round(final_percent,2)
+                                        graded = {
+                                            "manual_score": float(manual_total),
+                                            "teacher_feedback": teacher_feedback,
+                                            "score": final_score
+                                        }
+                                        supabase.table("quiz_attempts").update(graded).eq("id", at['id']).execute()
+                                        at.update(graded)
+                                        st.toast("✅ Grade saved.")
+                                        rerun_fragment()
+                                    except Exception as e:
+                                        st.error(f"❌ Failed to save grade: {e}")
+
+                            for at in page_attempts:
+                                grading_card(at, answers_by_attempt.get(at["id"], []), questions_by_id)
     
                     # --- Instructor: Delete Quiz ---
                     if user["role"] == "instructor":
                         st.divider()
                         if st.button(f"🗑️ Delete Quiz '{q['title']}'", key=f"del_quiz_{q['id']}"):
-                            supabase.table("quiz_questions").delete().eq("quiz_id", q["id"]).execute()
-                            supabase.table("quizzes").delete().eq("id", q["id"]).execute()
-                            st.success("🗑️ Quiz deleted!")
-                            st.rerun()
+                            try:
+                                counts = delete_cascade("quiz", q["id"])
+                                invalidate_cached(q["id"], "quiz_questions")
+                                invalidate_course(cid, "quizzes", "module_link")
+                                st.toast(f"🗑️ Quiz deleted — {format_delete_counts(counts)}")
+                                st.rerun()
+                            except Exception as e:
+                                st.error(f"❌ Failed to delete quiz: {e}")
     
         # --- Create new quiz (instructor) ---
         if user["role"] == "instructor":
@@ -1922,6 +4048,7 @@ def page_course_detail():
                             "description": desc,
                             "attempt_limit": int(attempt_limit)
                         }).execute()
+                        invalidate_course(cid, "quizzes")
                         st.success("✅ Quiz created successfully!")
                         st.rerun()
                     except Exception as e:
@@ -1939,17 +4066,6 @@ def page_course_detail():
                 q_type = st.selectbox("Type", ["multiple_choice","short_answer"])
                 rubric_max = st.text_input("Rubric max score (leave empty for none)")
                 rubric_note = st.text_input("Rubric note (optional)")
-                img_markdown = ""
-                if question_image:
-                    try:
-                        img_bytes = question_image.read()
-                        file_path = f"uploads/{int(datetime.now().timestamp())}_{question_image.name}"
-                        supabase.storage.from_("thinkverse_uploads").upload(file_path, img_bytes)
-                        public_url = supabase.storage.from_("thinkverse_uploads").get_public_url(file_path).get("publicUrl")
-                        img_markdown = f"![image]({public_url})"
-                        question_text += "\n" + img_markdown
-                    except Exception as e:
-                        st.warning(f"❌ Failed to upload image: {e}")
                 choices = ""
                 correct = ""
                 if q_type == "multiple_choice":
@@ -1959,6 +4075,14 @@ def page_course_detail():
                     correct = st.text_input("Correct answer (letter or full text)")
                 submit_q = st.form_submit_button("➕ Add Question")
                 if submit_q and question_text:
+                    # upload gambar hanya saat submit (bukan setiap rerun form)
+                    if question_image:
+                        try:
+                            file_path = f"uploads/{int(datetime.now().timestamp())}_{question_image.name}"
+                            public_url = upload_with_progress(question_image, "image", file_path)
+                            question_text += "\n" + f"![image]({public_url})"
+                        except Exception as e:
+                            st.warning(f"❌ Failed to upload image: {e}")
                     rubric_data = None
                     if rubric_max:
                         try:
@@ -1983,6 +4107,7 @@ def page_course_detail():
                     }
                     try:
                         supabase.table("quiz_questions").insert(insert_data).execute()
+                        invalidate_cached(qid, "quiz_questions")
                         st.success("✅ Question added successfully!")
                         st.rerun()
                     except Exception as e:
@@ -1992,15 +4117,18 @@ def page_course_detail():
     # =====================================
     # ANNOUNCEMENTS
     # =====================================
-    with tabs[5]:
+    if section == "announcement":
         from datetime import date
         import streamlit.components.v1 as components
 
         st.subheader("📣 Course Announcements")
 
         # === Load announcements ===
+        # post/hapus diterapkan ke list milik store; cache bersama tetap di-invalidasi
+        # supaya sesi lain ikut melihat perubahannya
+        store = get_course_store(cid)
         try:
-            ann = supabase.table("announcements").select("*").eq("course_id", cid).order("date", desc=True).execute().data
+            ann = store.get("announcements", lambda: list(load_cached_rows("announcements", cid)))
         except Exception as e:
             st.error(f"❌ Failed to load announcements: {e}")
             ann = []
@@ -2026,6 +4154,8 @@ def page_course_detail():
                     if st.button(f"🗑️ Delete '{a['title']}'", key=f"del_ann_{a['id']}"):
                         try:
                             supabase.table("announcements").delete().eq("id", a["id"]).execute()
+                            invalidate_course(cid, "announcements")
+                            store.remove_row("announcements", a["id"])
                             st.success("🗑️ Announcement deleted successfully!")
                             st.rerun()
                         except Exception as e:
@@ -2048,19 +4178,24 @@ def page_course_detail():
                         st.warning("Please enter a title before posting.")
                     else:
                         try:
-                            supabase.table("announcements").insert({
+                            res = supabase.table("announcements").insert({
                                 "course_id": cid,
                                 "title": title.strip(),
                                 "content": content.strip(),
                                 "date": str(date.today())
                             }).execute()
+                            invalidate_course(cid, "announcements")
+                            if res.data:
+                                store.insert_row("announcements", res.data[0])
+                            else:
+                                store.drop("announcements")
                             st.success("✅ Announcement posted successfully!")
                             st.rerun()
                         except Exception as e:
                             st.error(f"❌ Failed to post announcement: {e}")
 
     # === DASHBOARD — ANNOUNCEMENTS FOR STUDENTS ===
-    if user["role"] == "student":
+    if section == "announcement" and user["role"] == "student":
         st.subheader("📣 Latest Announcements from Your Courses")
 
         try:
@@ -2100,7 +4235,7 @@ def page_course_detail():
     # =====================================
     # FORUM DISKUSI (REVISI: includes delete + safe insert)
     # =====================================
-    with tabs[6]:
+    if section == "discussion":
         from datetime import datetime
         import random
         import traceback
@@ -2114,6 +4249,97 @@ def page_course_detail():
             random.seed(uid)
             colors = ["#3B82F6", "#10B981", "#F59E0B", "#EF4444", "#8B5CF6", "#EC4899"]
             return colors[uid % len(colors)]
+
+        def avatar_inner(row):
+            # foto profil (users.avatar_url, ikut ter-embed) kalau ada, selain itu nomor user
+            if row.get("user_avatar_url"):
+                return f"<img src='{row['user_avatar_url']}' style='width:100%;height:100%;border-radius:50%;object-fit:cover;'>"
+            return str(row["user_id"] % 100)
+
+        # ---------------------------------------
+        #  STATE FORUM DI STORE SESI
+        #  topik = slice {"rows", "cursor"} (halaman yang sudah dimuat),
+        #  thread (isi + komentar + cursor) = item per topik;
+        #  posting/hapus langsung mengubah data lokal tanpa read ulang
+        # ---------------------------------------
+        store = get_course_store(cid)
+
+        def load_topics():
+            # refresh setelah STORE_TTL: muat ulang sebanyak topik yang sudah tampil
+            shown = len((store.peek("topics") or {}).get("rows", []))
+            rows, cursor = load_forum_topics(cid, limit=max(FORUM_PAGE_SIZE, shown))
+            return {"rows": rows, "cursor": cursor}
+
+        def load_threads(topic_ids):
+            stubs = [{"id": tid} for tid in topic_ids]
+            shown = max(len((store.peek("threads", tid) or {}).get("replies", [])) for tid in topic_ids)
+            pages = load_forum_bodies(stubs, topic_ids, reply_limit=max(FORUM_REPLY_PAGE_SIZE, shown))
+            return {
+                s["id"]: {"content": s.get("content"), "replies": pages[s["id"]][0], "cursor": pages[s["id"]][1]}
+                for s in stubs
+            }
+
+        def more_topics(cursor):
+            rows, next_cursor = load_forum_topics(cid, before=cursor)
+
+            def extend(page):
+                known = {t["id"] for t in page["rows"]}
+                page["rows"].extend(t for t in rows if t["id"] not in known)
+                page["cursor"] = next_cursor
+            store.update("topics", extend)
+
+        def more_replies(topic_id, cursor):
+            rows, next_cursor = load_forum_replies(topic_id, after=cursor)
+            get_user_loader().prime(rows)
+
+            def extend(th):
+                # halaman lama masuk sebelum komentar yang baru diposting sesi ini
+                fetched = {r["id"] for r in rows}
+                posted = [r for r in th["replies"] if r.get("local") and r["id"] not in fetched]
+                th["replies"][:] = [r for r in th["replies"] if not r.get("local")] + rows + posted
+                th["cursor"] = next_cursor
+            store.update_item("threads", topic_id, extend)
+
+        def bump_reply_count(topic_id, delta):
+            def bump(page):
+                for t in page["rows"]:
+                    if t["id"] == topic_id:
+                        t["reply_count"] = max(0, (t.get("reply_count") or 0) + delta)
+            store.update("topics", bump)
+
+        def as_authored(row):
+            # baris hasil insert + nama/avatar penulis (= user yang login)
+            return dict(row, user_name=user.get("name"), user_avatar_url=user.get("avatar_url"))
+
+        def post_reply(topic_id, payload):
+            # offline: komentar masuk antrian write dan tampil sebagai baris sementara
+            res = buffered_write("discussion_replies", "insert", payload, refresh=(cid, "threads", topic_id))
+            if res is None:
+                row = as_authored(dict(payload, id=f"pending-{uuid.uuid4().hex[:8]}", pending=True))
+            elif res.data:
+                row = as_authored(res.data[0])
+            else:
+                store.drop_item("threads", topic_id)
+                return res
+            row["local"] = True
+            store.update_item("threads", topic_id, lambda th: th["replies"].append(row))
+            bump_reply_count(topic_id, 1)
+            get_user_loader().prime([row])
+            return res
+
+        def remove_reply(topic_id, reply_id):
+            # balasan level 2 dari komentar yang dihapus ikut hilang dari tampilan
+            def remove(th):
+                kept = [r for r in th["replies"] if r["id"] != reply_id and r.get("parent_id") != reply_id]
+                bump_reply_count(topic_id, len(kept) - len(th["replies"]))
+                th["replies"][:] = kept
+            store.update_item("threads", topic_id, remove)
+
+        def remove_topic(topic_id):
+            store.update("topics", lambda page: page["rows"].__setitem__(
+                slice(None), [t for t in page["rows"] if t["id"] != topic_id]
+            ))
+            store.drop_item("threads", topic_id)
     
         # ---------------------------------------
         #  FORM BUAT TOPIK DISKUSI (KHUSUS INSTRUCTOR)
@@ -2129,40 +4355,71 @@ def page_course_detail():
                         if not title.strip() or not content.strip():
                             st.warning("Judul dan isi tidak boleh kosong.")
                         else:
-                            supabase.table("discussions").insert({
+                            res = supabase.table("discussions").insert({
                                 "course_id": cid,
                                 "user_id": user["id"],
                                 "title": title.strip(),
                                 "content": content.strip(),
                                 "created_at": datetime.now().isoformat()
                             }).execute()
+                            if res.data:
+                                row = as_authored(dict(res.data[0], reply_count=0))
+                                store.update("topics", lambda page: page["rows"].insert(0, row))
+                                store.set_item("threads", row["id"], {
+                                    "content": row.get("content"), "replies": [], "cursor": None,
+                                })
+                            else:
+                                store.drop("topics")
                             st.success("Topik diskusi berhasil dibuat!")
                             st.rerun()
     
         # ---------------------------------------
-        #  AMBIL SEMUA TOPIK
+        #  AMBIL HALAMAN TOPIK (keyset created_at), LALU ISI + HALAMAN
+        #  PERTAMA KOMENTAR UNTUK TOPIK YANG DIBUKA SAJA
         # ---------------------------------------
-        topics = (
-            supabase.table("discussions")
-            .select("*")
-            .eq("course_id", cid)
-            .order("created_at", desc=True)
-            .execute()
-            .data
-        )
+        topic_page = store.get("topics", load_topics)
+        topics = topic_page["rows"]
     
         if not topics:
             st.info("📭 Belum ada topik diskusi.")
             st.stop()
-    
+
+        # topik terbaru terbuka secara default
+        st.session_state.setdefault(f"open_topic_{topics[0]['id']}", True)
+        open_ids = [t["id"] for t in topics if st.session_state.get(f"open_topic_{t['id']}")]
+        threads = store.get_items("threads", open_ids, load_threads)
+
+        user_loader = get_user_loader()
+        for rows in [topics, *(th["replies"] for th in threads.values())]:
+            if rows and "user_name" in rows[0]:
+                user_loader.prime(rows)
+            else:
+                user_loader.want(*[r["user_id"] for r in rows])
+        try:
+            user_loader.load()
+        except Exception as e:
+            # forum tetap tampil, nama yang belum termuat ditulis "User #id"
+            print(f"⚠️ nama user forum gagal dimuat: {e}")
+            st.caption("⚠️ Sebagian nama pengguna belum bisa dimuat.")
+
         # ---------------------------------------
-        #  LOOP SEMUA TOPIK
+        #  SATU THREAD = SATU FRAGMENT (buka, balas, hapus komentar
+        #  hanya menjalankan ulang thread itu)
         # ---------------------------------------
-        for t in topics:
-    
-            # — Ambil nama pembuat topik
-            nq = supabase.table("users").select("name").eq("id", t["user_id"]).execute()
-            topic_owner = nq.data[0]["name"] if nq.data else f"User #{t['user_id']}"
+        @st.fragment
+        def forum_thread(t):
+            # thread baru dibuka / sudah lewat STORE_TTL: ambil isi + komentar thread ini saja
+            if st.session_state.get(f"open_topic_{t['id']}"):
+                fresh = store.get_items("threads", [t["id"]], load_threads)
+                for thread in fresh.values():
+                    user_loader.prime(thread["replies"])
+                threads.update(fresh)
+    
+            # — Nama pembuat topik
+            topic_owner = user_loader.name(t["user_id"])
+            thread = threads.get(t["id"])
+            is_open = thread is not None
+            body = f"<p style='margin-top:6px;color:#334155;'>{thread['content']}</p>" if is_open else ""
     
             # — TAMPILKAN TOPIK
             st.markdown(
@@ -2171,9 +4428,10 @@ def page_course_detail():
                             margin-bottom:8px; border-left:6px solid #3B82F6;'>
                     <h3 style='margin:0;'>💭 {t['title']}</h3>
                     <small><b>{topic_owner}</b></small><br>
-                    <p style='margin-top:6px;color:#334155;'>{t['content']}</p>
+                    {body}
                     <small style='color:#64748B;'>
                         🕒 {datetime.fromisoformat(t['created_at']).strftime('%d %b %Y, %H:%M')}
+                        &nbsp;·&nbsp; 💬 {t.get('reply_count') or 0} komentar
                     </small>
                 </div>
                 """,
@@ -2183,24 +4441,20 @@ def page_course_detail():
             # — BUTTON HAPUS TOPIK
             if user["role"] == "instructor":
                 if st.button(f"🗑️ Hapus Topik '{t['title']}'", key=f"del_topic_{t['id']}"):
-                    supabase.table("discussion_replies").delete().eq("discussion_id", t["id"]).execute()
-                    supabase.table("discussions").delete().eq("id", t["id"]).execute()
-                    st.success("Topik & semua komentarnya terhapus.")
-                    st.rerun()
+                    try:
+                        counts = delete_cascade("discussion", t["id"])
+                        remove_topic(t["id"])
+                        st.toast(f"Topik & semua komentarnya terhapus — {format_delete_counts(counts)}")
+                        st.rerun()
+                    except Exception as e:
+                        st.error(f"❌ Gagal menghapus topik: {e}")
+
+            if not st.toggle("💬 Buka diskusi", key=f"open_topic_{t['id']}") or not is_open:
+                return
     
             st.markdown("### 💬 Komentar")
     
-            # ---------------------------------------
-            #  AMBIL SEMUA KOMENTAR
-            # ---------------------------------------
-            replies = (
-                supabase.table("discussion_replies")
-                .select("*")
-                .eq("discussion_id", t["id"])
-                .order("created_at", desc=False)
-                .execute()
-                .data
-            )
+            replies = thread["replies"]
     
             # Map parent → children
             reply_map = {}
@@ -2214,15 +4468,7 @@ def page_course_detail():
             # ---------------------------------------
             for r in top_level:
             
-                # Ambil nama user
-                try:
-                    qname = supabase.table("users").select("name").eq("id", r["user_id"]).execute()
-                    name = qname.data[0]["name"] if qname.data else f"User #{r['user_id']}"
-                except Exception as e:
-                    st.error("❌ SUPABASE ERROR SAAT AMBIL NAMA USER:")
-                    st.error(str(e))
-                    st.error(f"user_id yang dicari = {r['user_id']}")
-                    st.stop()
+                name = user_loader.name(r["user_id"])
             
                 avatar_color = user_avatar(r["user_id"])
             
@@ -2234,7 +4480,7 @@ def page_course_detail():
                                     background:{avatar_color};
                                     color:white;display:flex;align-items:center;
                                     justify-content:center;font-weight:bold;">
-                            {r['user_id'] % 100}
+                            {avatar_inner(r)}
                         </div>
                         <div style="flex:1;">
                             <b>{name}</b><br>
@@ -2249,10 +4495,14 @@ def page_course_detail():
                 st.markdown(html, unsafe_allow_html=True)
             
                 # DELETE KOMENTAR
+                if r.get("pending"):
+                    st.caption("⏳ Menunggu koneksi, belum terkirim.")
+                    continue
                 if user["role"] == "instructor" or user["id"] == r["user_id"]:
                     if st.button("🗑️ Hapus Komentar", key=f"del_reply_{r['id']}"):
                         supabase.table("discussion_replies").delete().eq("id", r["id"]).execute()
-                        st.rerun()
+                        remove_reply(t["id"], r["id"])
+                        rerun_fragment()
 
     
                 # ---------------------------------------
@@ -2260,8 +4510,7 @@ def page_course_detail():
                 # ---------------------------------------
                 children = reply_map.get(r["id"], [])
                 for child in children:
-                    uq2 = supabase.table("users").select("name").eq("id", child["user_id"]).execute()
-                    child_name = uq2.data[0]["name"] if uq2.data else f"User #{child['user_id']}"
+                    child_name = user_loader.name(child["user_id"])
                     child_color = user_avatar(child["user_id"])
     
                     st.markdown(
@@ -2273,7 +4522,7 @@ def page_course_detail():
                                             background:{child_color};
                                             color:white;display:flex;
                                             align-items:center;justify-content:center;'>
-                                    {child['user_id'] % 100}
+                                    {avatar_inner(child)}
                                 </div>
                                 <div style='flex:1;'>
                                     <b>{child_name}</b><br>
@@ -2288,29 +4537,48 @@ def page_course_detail():
                         unsafe_allow_html=True,
                     )
     
-                    if user["role"] == "instructor" or user["id"] == child["user_id"]:
+                    if child.get("pending"):
+                        st.caption("⏳ Menunggu koneksi, belum terkirim.")
+                    elif user["role"] == "instructor" or user["id"] == child["user_id"]:
                         if st.button("🗑️ Hapus Balasan", key=f"del_child_{child['id']}"):
                             supabase.table("discussion_replies").delete().eq("id", child["id"]).execute()
-                            st.rerun()
+                            remove_reply(t["id"], child["id"])
+                            rerun_fragment()
     
                 # ---------------------------------------
-                #  FORM BALAS (LEVEL 2)
+                #  FORM BALAS (LEVEL 2) — hanya untuk komentar yang dipilih
                 # ---------------------------------------
+                if st.session_state.get(f"reply_to_{t['id']}") != r["id"]:
+                    if st.button("↪ Balas", key=f"reply_btn_{r['id']}"):
+                        st.session_state[f"reply_to_{t['id']}"] = r["id"]
+                        rerun_fragment()
+                    continue
+
                 with st.form(f"reply_child_form_{r['id']}", clear_on_submit=True):
                     reply2 = st.text_input("Balas komentar ini:", key=f"child_input_{r['id']}")
                     send2 = st.form_submit_button("↪ Balas")
     
                     if send2:
                         if reply2.strip():
-                            supabase.table("discussion_replies").insert({
+                            res = post_reply(t["id"], {
                                 "discussion_id": t["id"],
                                 "user_id": user["id"],
                                 "reply": reply2.strip(),
                                 "parent_id": r["id"],
                                 "created_at": datetime.now().isoformat()
-                            }).execute()
-                            st.success("Balasan terkirim!")
-                            st.rerun()
+                            })
+                            st.session_state.pop(f"reply_to_{t['id']}", None)
+                            st.toast("Balasan terkirim!" if res is not None else "📥 Offline — balasan dikirim saat koneksi pulih.")
+                            rerun_fragment()
+
+            # ---------------------------------------
+            #  HALAMAN KOMENTAR BERIKUTNYA (cursor keyset)
+            # ---------------------------------------
+            if thread["cursor"]:
+                st.caption(f"Menampilkan {len(replies)} dari {t.get('reply_count') or len(replies)} komentar.")
+                if st.button("⬇️ Muat komentar lainnya", key=f"more_replies_{t['id']}"):
+                    more_replies(t["id"], thread["cursor"])
+                    rerun_fragment()
     
             # ---------------------------------------
             #  FORM KOMENTAR LEVEL 1
@@ -2322,231 +4590,157 @@ def page_course_detail():
     
                 if send_comment:
                     if new_comment.strip():
-                        supabase.table("discussion_replies").insert({
+                        res = post_reply(t["id"], {
                             "discussion_id": t["id"],
                             "user_id": user["id"],
                             "reply": new_comment.strip(),
                             "parent_id": None,
                             "created_at": datetime.now().isoformat()
-                        }).execute()
-                        st.success("Komentar ditambahkan!")
-                        st.rerun()
-
-    # =============================
-    # TAB 7 — STUDENT PROGRESS + KICK STUDENT (GURU)
-    # =============================
-    if user["role"] == "instructor":
-        with tabs[7]:
-            st.subheader("👥 Daftar Siswa di Kursus Ini (Klik → lihat progress)")
-
-            # Pastikan course_id integer
-            try:
-                cid_int = int(cid)
-            except Exception:
-                cid_int = cid
-
-            # 🔍 DEBUG OPSIONAL: cek course_id (boleh dihapus kalau sudah yakin)
-            # st.write("DEBUG course_id di tab Students:", cid_int, type(cid_int))
-
-            # 1️⃣ Ambil SEMUA enrollments student untuk course ini
-            try:
-                enroll_resp = (
-                    supabase.table("enrollments")
-                    .select("user_id, role, course_id")
-                    .execute()
-                )
-                all_enroll = enroll_resp.data or []
-            except Exception as e:
-                st.error("❌ Gagal memuat daftar enrollments:")
-                st.error(str(e))
-                all_enroll = []
-
-            # 🔍 DEBUG (boleh dimatikan kalau sudah beres)
-            # st.write("DEBUG ALL enrollments:", all_enroll)
-            # st.write("DEBUG cid:", cid, type(cid))
-
-            # Filter hanya enroll untuk course ini
-            raw_enroll = [
-                e for e in all_enroll
-                if str(e.get("course_id")) == str(cid_int)
-            ]
-
-
-            # 🔍 DEBUG OPSIONAL: lihat isi enrollments course ini
-            # st.write("DEBUG enrollments utk course ini:", raw_enroll)
-
-            # Filter hanya yang role-nya student (di-Python supaya tidak masalah spasi / kapital)
-            enroll = [
-                e for e in raw_enroll
-                if str(e.get("role", "")).strip().lower() == "student"
-            ]
-
-            if not enroll:
-                st.info("Belum ada siswa yang bergabung di kursus ini.")
-                # jangan st.stop() supaya tetap kelihatan tab-nya
-                return
-
-            student_ids = [e["user_id"] for e in enroll]
-
-            # 2️⃣ Ambil data siswa (tabel users)
-            try:
-                users_resp = (
-                    supabase.table("users")
-                    .select("id, name, email")
-                    .in_("id", student_ids)
-                    .execute()
-                )
-                students = users_resp.data or []
-            except Exception as e:
-                st.error("❌ Gagal memuat data users:")
-                st.error(str(e))
-                return
+                        })
+                        st.toast("Komentar ditambahkan!" if res is not None else "📥 Offline — komentar dikirim saat koneksi pulih.")
+                        rerun_fragment()
 
-            # Simpan pilihan siswa di session_state
-            selected_student = st.session_state.get("selected_student", None)
+        for t in topics:
+            forum_thread(t)
 
-            # 3️⃣ Tampilkan kartu setiap siswa + tombol
-            for s in students:
-                col1, col2, col3 = st.columns([0.6, 0.25, 0.15])
+        if topic_page["cursor"]:
+            if st.button("⬇️ Muat topik lainnya", key="more_topics"):
+                more_topics(topic_page["cursor"])
+                st.rerun()
 
-                with col1:
-                    st.markdown(
-                        f"""
-                        <div style='padding:10px; margin-bottom:8px; background:#F8FAFC;
-                                    border-radius:8px; border-left:4px solid #10B981;'>
-                            <b>{s.get('name','-')}</b><br>
-                            <small>{s.get('email','-')}</small><br>
-                            <small>User ID: {s.get('id')}</small>
-                        </div>
-                        """,
-                        unsafe_allow_html=True,
-                    )
+    # =============================
+    # TAB 7 — GRADEBOOK + STUDENT PROGRESS + KICK STUDENT (GURU)
+    # =============================
+    if section == "students" and user["role"] == "instructor":
+        st.subheader("👥 Siswa & Gradebook")
 
-                with col2:
-                    if st.button("Lihat Progress", key=f"progress_{s['id']}"):
-                        st.session_state["selected_student"] = s["id"]
-                        st.rerun()
+        # Pastikan course_id integer
+        try:
+            cid_int = int(cid)
+        except Exception:
+            cid_int = cid
 
-                with col3:
-                    if st.button("❌ Kick", key=f"kick_{s['id']}"):
-                        try:
-                            supabase.table("enrollments").delete()\
-                                .eq("user_id", s["id"])\
-                                .eq("course_id", cid_int)\
-                                .execute()
-                            st.success(f"🚪 {s.get('name','Siswa')} berhasil dikeluarkan dari course.")
-                            st.rerun()
-                        except Exception as e:
-                            st.error("❌ Gagal mengeluarkan siswa:")
-                            st.error(str(e))
+        # 1️⃣ Ambil semua data course dalam beberapa query bulk
+        try:
+            gb = load_gradebook_data(cid_int)
+        except Exception as e:
+            st.error("❌ Gagal memuat data gradebook:")
+            st.error(str(e))
+            return
+
+        if not gb["students"]:
+            st.info("Belum ada siswa yang bergabung di kursus ini.")
+            # jangan st.stop() supaya tetap kelihatan tab-nya
+            return
+
+        # 2️⃣ Matrix siswa × (assignment, quiz, kehadiran, modul)
+        matrix = build_gradebook_matrix(gb)
+        st.markdown(f"### 📊 Gradebook — {len(matrix)} siswa")
+        st.dataframe(matrix, use_container_width=True, hide_index=True)
+        st.download_button(
+            "⬇️ Download CSV",
+            matrix.to_csv(index=False).encode("utf-8"),
+            file_name=f"gradebook_course_{cid_int}.csv",
+            mime="text/csv",
+        )
 
-            # Kalau belum memilih siswa → berhenti di sini
-            selected_student = st.session_state.get("selected_student")
-            if not selected_student:
-                st.info("Klik tombol **Lihat Progress** untuk melihat perkembangan siswa.")
-                return
+        # 3️⃣ Pilih siswa → lihat progress / kick
+        st.markdown("---")
+        students_by_id = {s["id"]: s for s in gb["students"]}
+        student_ids = list(students_by_id.keys())
+        if st.session_state.get("selected_student") not in students_by_id:
+            st.session_state.selected_student = None
+        selected_student = st.selectbox(
+            "Lihat progress siswa",
+            [None] + student_ids,
+            format_func=lambda sid: "— pilih siswa —" if sid is None
+            else f"{students_by_id[sid].get('name','-')} ({students_by_id[sid].get('email','-')})",
+            key="selected_student",
+        )
 
-            st.markdown("---")
-            st.markdown(f"## 📊 Progress Siswa — ID {selected_student}")
+        # Kalau belum memilih siswa → berhenti di sini
+        if not selected_student:
+            st.info("Pilih siswa untuk melihat perkembangan detailnya.")
+            return
 
-            # ---------- Helper fetch table sederhana ----------
-            def safe_fetch(table_name, select="*", filters=None):
+        s = students_by_id[selected_student]
+        col1, col2 = st.columns([0.8, 0.2])
+        with col1:
+            st.markdown(f"## 📊 Progress Siswa — {s.get('name','-')} (ID {selected_student})")
+        with col2:
+            if st.button("❌ Kick", key=f"kick_{selected_student}"):
                 try:
-                    rb = supabase.table(table_name).select(select)
-                    if filters:
-                        for col, op, val in filters:
-                            if op == "eq":
-                                rb = rb.eq(col, val)
-                            elif op == "in":
-                                rb = rb.in_(col, val)
-                            elif op == "neq":
-                                rb = rb.neq(col, val)
-                    resp = rb.execute()
-                    return (resp.data or [], None)
+                    supabase.table("enrollments").delete()\
+                        .eq("user_id", selected_student)\
+                        .eq("course_id", cid_int)\
+                        .execute()
+                    st.session_state.pop("selected_student", None)
+                    st.success(f"🚪 {s.get('name','Siswa')} berhasil dikeluarkan dari course.")
+                    st.rerun()
                 except Exception as e:
-                    return (None, str(e))
-
-            # === 1) Kehadiran ===
-            st.markdown("### 🕒 Kehadiran")
-            att_data, err = safe_fetch(
-                "attendance",
-                select="id,session_id,user_id,status,timestamp",
-                filters=[("course_id", "eq", cid_int), ("user_id", "eq", selected_student)],
-            )
-            if err:
-                st.error("❌ Gagal memuat data attendance:")
-                st.error(err)
-            else:
-                total = len(att_data)
-                hadir = sum(
-                    1 for a in att_data if str(a.get("status", "")).lower() == "present"
-                )
-                percent = round((hadir / total) * 100, 2) if total > 0 else 0
-                st.write(f"Hadir **{hadir}/{total}** — **{percent}%**")
-                for a in att_data:
-                    st.markdown(
-                        f"- Sesi {a.get('session_id')} — {a.get('status')} — {a.get('timestamp')}"
-                    )
+                    st.error("❌ Gagal mengeluarkan siswa:")
+                    st.error(str(e))
 
-            # === 2) Assignments ===
-            st.markdown("### 📝 Tugas / Assignment")
-            assigns, err = safe_fetch(
-                "assignments", select="id,title", filters=[("course_id", "eq", cid_int)]
+        # === 1) Kehadiran ===
+        st.markdown("### 🕒 Kehadiran")
+        att_data = [a for a in gb["attendance"] if a["user_id"] == selected_student]
+        total = len(att_data)
+        hadir = sum(
+            1 for a in att_data if str(a.get("status", "")).lower() == "present"
+        )
+        percent = round((hadir / total) * 100, 2) if total > 0 else 0
+        st.write(f"Hadir **{hadir}/{total}** — **{percent}%**")
+        for a in att_data:
+            st.markdown(
+                f"- Sesi {a.get('session_id')} — {a.get('status')} — {a.get('timestamp')}"
             )
-            if not err and assigns:
-                for a in assigns:
-                    subs, e2 = safe_fetch(
-                        "assignment_submissions",
-                        select="id,assignment_id,user_id,score,file_url,submitted_at",
-                        filters=[
-                            ("assignment_id", "eq", a["id"]),
-                            ("user_id", "eq", selected_student),
-                        ],
-                    )
-                    if subs:
-                        s0 = subs[0]
-                        score = s0.get("score")
-                        if score is None:
-                            st.markdown(
-                                f"- **{a['title']}** — ⏳ Menunggu penilaian (submitted: {s0.get('submitted_at')})"
-                            )
-                        else:
-                            st.markdown(
-                                f"- **{a['title']}** — ✅ Dinilai — Skor: {score}"
-                            )
-                    else:
-                        st.markdown(f"- **{a['title']}** — ❌ Belum mengumpulkan")
-            else:
-                st.info("Belum ada assignment untuk course ini.")
 
-            # === 3) Quiz ===
-            st.markdown("### 🧠 Quiz")
-            quizzes, errq = safe_fetch(
-                "quizzes", select="id,title", filters=[("course_id", "eq", cid_int)]
-            )
-            if not errq and quizzes:
-                for q in quizzes:
-                    attempts, aerr = safe_fetch(
-                        "quiz_attempts",
-                        select="id,quiz_id,user_id,score,submitted_at,attempt_number",
-                        filters=[
-                            ("quiz_id", "eq", q["id"]),
-                            ("user_id", "eq", selected_student),
-                        ],
-                    )
-                    if attempts:
-                        st.markdown(f"**{q['title']}** — Total percobaan: {len(attempts)}")
-                        for at in attempts:
-                            submitted_time = at.get("submitted_at")
-                            status = "✅ Selesai" if submitted_time else "❌ Belum mengerjakan"
-                            time_str = f"waktu: {submitted_time}" if submitted_time else ""
-                            st.markdown(
-                                f"- Skor: {at.get('score','-')} — {status} {time_str} — Attempt #{at.get('attempt_number','-')}"
-                            )
+        # === 2) Assignments ===
+        st.markdown("### 📝 Tugas / Assignment")
+        if gb["assignments"]:
+            subs_by_asg = {}
+            for sub in gb["submissions"]:
+                if sub["user_id"] == selected_student:
+                    subs_by_asg.setdefault(sub["assignment_id"], sub)
+            for a in gb["assignments"]:
+                s0 = subs_by_asg.get(a["id"])
+                if s0:
+                    score = s0.get("score")
+                    if score is None:
+                        st.markdown(
+                            f"- **{a['title']}** — ⏳ Menunggu penilaian (submitted: {s0.get('submitted_at')})"
+                        )
                     else:
-                        st.markdown(f"- **{q['title']}** — ❌ Belum mengerjakan")
-            else:
-                st.info("Belum ada quiz pada course ini.")
+                        st.markdown(
+                            f"- **{a['title']}** — ✅ Dinilai — Skor: {score}"
+                        )
+                else:
+                    st.markdown(f"- **{a['title']}** — ❌ Belum mengumpulkan")
+        else:
+            st.info("Belum ada assignment untuk course ini.")
+
+        # === 3) Quiz ===
+        st.markdown("### 🧠 Quiz")
+        if gb["quizzes"]:
+            attempts_by_quiz = {}
+            for at in gb["attempts"]:
+                if at["user_id"] == selected_student:
+                    attempts_by_quiz.setdefault(at["quiz_id"], []).append(at)
+            for q in gb["quizzes"]:
+                attempts = attempts_by_quiz.get(q["id"], [])
+                if attempts:
+                    st.markdown(f"**{q['title']}** — Total percobaan: {len(attempts)}")
+                    for at in attempts:
+                        submitted_time = at.get("submitted_at")
+                        status = "✅ Selesai" if submitted_time else "❌ Belum mengerjakan"
+                        time_str = f"waktu: {submitted_time}" if submitted_time else ""
+                        st.markdown(
+                            f"- Skor: {at.get('score','-')} — {status} {time_str} — Attempt #{at.get('attempt_number','-')}"
+                        )
+                else:
+                    st.markdown(f"- **{q['title']}** — ❌ Belum mengerjakan")
+        else:
+            st.info("Belum ada quiz pada course ini.")
 
 
 
@@ -2588,35 +4782,45 @@ def main():
         st.session_state.last_course = None
 
     page = st.session_state.page
+    begin_rerun(page)
 
     # === ROUTING LOGIC ===
-    if page == "login":
-        page_login()
+    try:
+        if page == "login":
+            page_login()
 
-    elif page == "dashboard":
-        page_dashboard()
+        elif page == "dashboard":
+            page_dashboard()
 
-    elif page == "courses":
-        page_courses()
+        elif page == "courses":
+            page_courses()
 
-    elif page == "course_detail":
-        if st.session_state.get("current_course"):
-            page_course_detail()
-        elif st.session_state.get("last_course"):
-            st.session_state.current_course = st.session_state.last_course
-            st.rerun()
-        else:
-            st.warning("⚠️ No course selected.")
-            st.session_state.page = "courses"
-            st.rerun()
+        elif page == "course_detail":
+            if st.session_state.get("current_course"):
+                page_course_detail()
+            elif st.session_state.get("last_course"):
+                st.session_state.current_course = st.session_state.last_course
+                st.rerun()
+            else:
+                st.warning("⚠️ No course selected.")
+                st.session_state.page = "courses"
+                st.rerun()
 
-    elif page == "account":
-        page_account()
+        elif page == "account":
+            page_account()
 
-    else:
-        # === FALLBACK KE LOGIN ===
-        st.session_state.page = "login"
-        st.rerun()
+        else:
+            # === FALLBACK KE LOGIN ===
+            st.session_state.page = "login"
+            st.rerun()
+    except Exception as e:
+        # backend tidak terjangkau & belum ada snapshot untuk data halaman ini
+        if not is_backend_down(e):
+            raise
+        print(f"⚠️ backend tidak terjangkau: {e}")
+        st.error("🔴 Server sedang tidak bisa dihubungi dan data halaman ini belum pernah dimuat. Coba lagi sebentar lagi.")
+    finally:
+        end_rerun()
 
 
 # === Panggil fungsi utama ===
@@ -0,0 +1,192 @@
+"""
+Benchmark halaman ThinkVerse LMS dengan backend tiruan (BACKEND=fake).
+
+Setiap skenario dijalankan lewat streamlit.testing AppTest dan dicatat:
+waktu rerun (cold = run pertama, warm = median run berikutnya), jumlah
+panggilan backend dan payload (KB) rerun terakhir dari instrumentasi app.
+
+Contoh:
+    python bench/bench_pages.py                       # 10, 100, 1000 siswa
+    python bench/bench_pages.py --students 100 --repeat 5 --out bench.json
+    python bench/bench_pages.py --latency-ms 20       # tiru latency jaringan
+    python bench/bench_pages.py --compare-projection  # payload select("*") vs proyeksi kolom
+
+Setiap skala jalan di proses terpisah supaya cache Streamlit dan data
+tiruan tidak tercampur antar skala.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+APP = os.path.join(ROOT, "app.py")
+
+COURSE_SECTIONS = [
+    "overview", "attendance", "module", "assignment",
+    "quiz", "announcement", "discussion", "students",
+]
+ROLES = {
+    "instructor": "instructor@example.com",
+    "student": "student1@example.com",
+}
+
+
+def scenarios():
+    """(nama, role, page, section) untuk setiap halaman yang diukur."""
+    yield "login", "student", "login", None
+    for role in ROLES:
+        yield f"dashboard[{role}]", role, "dashboard", None
+        for section in COURSE_SECTIONS:
+            if section == "students" and role != "instructor":
+                continue
+            yield f"course:{section}[{role}]", role, "course_detail", section
+
+
+def _make_app(client, role, page, section):
+    from streamlit.testing.v1 import AppTest
+
+    at = AppTest.from_file(APP, default_timeout=120)
+    if page != "login":
+        user = next(u for u in client.tables["users"] if u["email"] == ROLES[role])
+        at.session_state["user"] = dict(user)
+        at.session_state["current_course"] = 1
+        at.session_state["last_course"] = 1
+    at.session_state["page"] = page
+    if section:
+        at.session_state["course_section"] = section
+    return at
+
+
+def _run_once(client, role, page, section):
+    at = _make_app(client, role, page, section)
+    calls0 = client.calls
+    t0 = time.perf_counter()
+    at.run()
+    if page == "login":
+        # isi form login lalu submit -> login() + redirect ke dashboard
+        at.text_input[0].input(ROLES[role])
+        at.text_input[1].input("password")
+        at.button[0].click()
+        at.run()
+    elapsed = time.perf_counter() - t0
+    rec = at.session_state["_call_recorder"] if "_call_recorder" in at.session_state else None
+    nbytes = rec.total_bytes if rec is not None else 0
+    error = None
+    if at.exception:
+        error = str(at.exception[0].value)
+    elif page == "login" and at.session_state["page"] != "dashboard":
+        error = "login gagal"
+    return elapsed, client.calls - calls0, nbytes, error
+
+
+def run_worker(students, repeat, projection=True):
+    """Jalankan semua skenario untuk satu skala (di proses ini)."""
+    os.environ["BACKEND"] = "fake"
+    os.environ["FAKE_STUDENTS"] = str(students)
+    os.environ["PROJECTED_READS"] = "1" if projection else "0"
+    sys.path.insert(0, ROOT)
+    import fake_backend
+
+    client = fake_backend.get_client(students=students)
+    results = []
+    for name, role, page, section in scenarios():
+        times, calls, sizes, errors = [], [], [], []
+        for _ in range(repeat):
+            elapsed, n_calls, nbytes, error = _run_once(client, role, page, section)
+            times.append(elapsed)
+            calls.append(n_calls)
+            sizes.append(nbytes)
+            if error:
+                errors.append(error)
+        warm = times[1:] or times
+        results.append({
+            "students": students,
+            "scenario": name,
+            "cold_ms": round(times[0] * 1000, 1),
+            "warm_ms": round(statistics.median(warm) * 1000, 1),
+            "cold_calls": calls[0],
+            "warm_calls": int(statistics.median(calls[1:] or calls)),
+            "cold_kb": round(sizes[0] / 1024, 1),
+            "projection": projection,
+            "errors": sorted(set(errors)),
+        })
+    return results
+
+
+def print_table(results):
+    header = (f"{'students':>8}  {'scenario':<32} {'cold ms':>9} {'warm ms':>9} "
+              f"{'cold calls':>10} {'warm calls':>10} {'cold KB':>9}")
+    print(header)
+    print("-" * len(header))
+    for r in results:
+        flag = "  ⚠️ " + "; ".join(r["errors"]) if r["errors"] else ""
+        print(f"{r['students']:>8}  {r['scenario']:<32} {r['cold_ms']:>9} {r['warm_ms']:>9} "
+              f"{r['cold_calls']:>10} {r['warm_calls']:>10} {r['cold_kb']:>9}{flag}")
+
+
+def print_payload_comparison(results):
+    """Payload cold per skenario: select("*") (sebelum) vs proyeksi kolom (sesudah)."""
+    before = {(r["students"], r["scenario"]): r for r in results if not r["projection"]}
+    header = f"{'students':>8}  {'scenario':<32} {'KB select *':>12} {'KB proyeksi':>12} {'hemat':>7}"
+    print(header)
+    print("-" * len(header))
+    for r in results:
+        b = before.get((r["students"], r["scenario"]))
+        if not r["projection"] or b is None:
+            continue
+        saved = f"{(1 - r['cold_kb'] / b['cold_kb']) * 100:.0f}%" if b["cold_kb"] else "-"
+        print(f"{r['students']:>8}  {r['scenario']:<32} {b['cold_kb']:>12} {r['cold_kb']:>12} {saved:>7}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--students", type=int, nargs="+", default=[10, 100, 1000])
+    parser.add_argument("--repeat", type=int, default=3, help="run per skenario (run pertama = cold)")
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="latency tiruan per panggilan backend")
+    parser.add_argument("--out", help="simpan hasil sebagai JSON")
+    parser.add_argument("--no-projection", action="store_true", help='PROJECTED_READS=0 (select("*"))')
+    parser.add_argument("--compare-projection", action="store_true",
+                        help='jalankan dengan dan tanpa proyeksi kolom, bandingkan payload')
+    parser.add_argument("--worker", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        os.environ["FAKE_LATENCY_MS"] = str(args.latency_ms)
+        json.dump(run_worker(args.students[0], args.repeat, not args.no_projection), sys.stdout)
+        return
+
+    if args.compare_projection:
+        modes = [False, True]
+    else:
+        modes = [not args.no_projection]
+
+    results = []
+    for students in args.students:
+        for projection in modes:
+            print(f"▶ {students} siswa{'' if projection else ' (select *)'} ...", file=sys.stderr)
+            cmd = [sys.executable, __file__, "--worker", "--students", str(students),
+                   "--repeat", str(args.repeat), "--latency-ms", str(args.latency_ms)]
+            if not projection:
+                cmd.append("--no-projection")
+            proc = subprocess.run(cmd, capture_output=True, text=True, cwd=ROOT)
+            if proc.returncode != 0:
+                print(proc.stderr, file=sys.stderr)
+                sys.exit(proc.returncode)
+            # stdout worker juga berisi log print() dari app; JSON ada di baris terakhir
+            results.extend(json.loads(proc.stdout.strip().splitlines()[-1]))
+
+    if args.compare_projection:
+        print_payload_comparison(results)
+    else:
+        print_table(results)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+"""
+Bandingkan jalur read REST (PostgREST) dan SQL langsung (psycopg2 pool) untuk
+read agregat yang berat: gradebook, grading (attempts + jawaban), matriks
+absensi, thread forum dan halaman forum berikutnya (cursor keyset) — pada
+data yang sama.
+
+Butuh konfigurasi yang sama dengan app (env atau .streamlit/secrets.toml):
+SUPABASE_URL, SUPABASE_KEY dan DATABASE_URL (database di belakang project
+tersebut). Dengan BACKEND=fake, jalur REST memakai backend tiruan; DATABASE_URL
+harus berisi data hasil seed yang sama, mis. hasil
+`python bench/explain_queries.py --seed 100` untuk FAKE_STUDENTS=100.
+
+Contoh:
+    DATABASE_URL=postgresql://... python bench/bench_read_paths.py --course 1 --repeat 20
+"""
+import argparse
+import json
+import os
+import re
+import statistics
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# "2026-01-05 08:00:00" (ditulis app / backend tiruan) == "2026-01-05T08:00:00+00:00"
+# (timestamptz Postgres, migrations/000_base_schema.sql)
+_TIMESTAMP_RE = re.compile(r"^(\d{4}-\d{2}-\d{2}) (\d{2}:\d{2})")
+_UTC_SUFFIX_RE = re.compile(r"(T\d{2}:\d{2}:\d{2}(?:\.\d+)?)\+00:00$")
+
+
+def _normalize(value):
+    """Hilangkan kolom tambahan jalur SQL & urutan baris supaya hasil bisa dibandingkan."""
+    if isinstance(value, dict):
+        return {str(k): _normalize(v) for k, v in value.items() if k != "user_name"}
+    if isinstance(value, (list, tuple)):
+        items = [_normalize(v) for v in value]
+        return sorted(items, key=lambda v: json.dumps(v, sort_keys=True, default=str))
+    if isinstance(value, str):
+        return _UTC_SUFFIX_RE.sub(r"\1", _TIMESTAMP_RE.sub(r"\1T\2", value))
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return float(value)  # numeric Postgres (70.0) == angka backend tiruan (70)
+    return value
+
+
+def _timed(fn, repeat):
+    times = []
+    result = None
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        result = fn()
+        times.append((time.perf_counter() - t0) * 1000)
+    return result, times
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--course", type=int, default=1)
+    parser.add_argument("--repeat", type=int, default=10)
+    parser.add_argument("--out", help="simpan hasil sebagai JSON")
+    args = parser.parse_args()
+
+    sys.path.insert(0, ROOT)
+    import app
+
+    if app.get_sql_pool() is None:
+        sys.exit("DATABASE_URL belum diisi atau database tidak bisa dihubungi.")
+
+    cid = args.course
+    quizzes = app.load_cached_rows("quizzes", cid)
+    sessions = app.load_cached_rows("attendance_sessions", cid)
+    quiz_id = quizzes[0]["id"] if quizzes else None
+
+    def grading():
+        attempts = app.load_quiz_attempts(quiz_id) if quiz_id else []
+        page = attempts[:app.GRADING_PAGE_SIZE]
+        return attempts, app.load_attempt_answers([a["id"] for a in page])
+
+    def forum_next():
+        # halaman ke-2 topik & komentar topik terbaru lewat cursor halaman pertama
+        topics, cursor = app.load_forum_topics(cid)
+        replies, after = app.load_forum_replies(topics[0]["id"]) if topics else ([], None)
+        return (
+            app.load_forum_topics(cid, before=cursor) if cursor else ([], None),
+            app.load_forum_replies(topics[0]["id"], after=after) if after else ([], None),
+        )
+
+    cases = {
+        "gradebook": lambda: app.load_gradebook_data(cid),
+        "grading": grading,
+        "attendance": lambda: app.load_attendance_matrix([s["id"] for s in sessions]),
+        "forum": lambda: app.load_forum_threads(cid),
+        "forum+1": forum_next,
+    }
+
+    results = []
+    for name, fn in cases.items():
+        row = {"read": name}
+        outputs = {}
+        for path in ("rest", "sql"):
+            app.READ_PATH = path
+            fn()  # pemanasan (koneksi pool, cache tabel course)
+            out, times = _timed(fn, args.repeat)
+            outputs[path] = out
+            row[f"{path}_ms_p50"] = round(statistics.median(times), 2)
+            row[f"{path}_ms_max"] = round(max(times), 2)
+            row[f"{path}_kb"] = round(len(json.dumps(out, default=str)) / 1024, 1)
+        row["speedup"] = round(row["rest_ms_p50"] / row["sql_ms_p50"], 2) if row["sql_ms_p50"] else None
+        row["same_data"] = _normalize(outputs["rest"]) == _normalize(outputs["sql"])
+        results.append(row)
+
+    print(f"{'read':<12} {'REST p50':>10} {'SQL p50':>10} {'REST max':>10} {'SQL max':>10} {'speedup':>8}  data sama")
+    for r in results:
+        print(f"{r['read']:<12} {r['rest_ms_p50']:>10} {r['sql_ms_p50']:>10} {r['rest_ms_max']:>10} "
+              f"{r['sql_ms_max']:>10} {r['speedup']:>8}  {'ya' if r['same_data'] else 'TIDAK'}")
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
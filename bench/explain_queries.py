@@ -0,0 +1,303 @@
+"""
+EXPLAIN untuk setiap bentuk query yang dikirim app.py (filter & urutan yang
+sama dengan query PostgREST / jalur SQL), terhadap Postgres lokal yang berisi
+data. Node "Seq Scan" ditandai: artinya tidak ada index yang bisa melayani
+filter tersebut (lihat migrations/005_hot_path_indexes.sql).
+
+Secara default planner dipaksa memakai index kalau ada (enable_seqscan=off),
+supaya hasilnya tidak bergantung pada ukuran data: seq scan yang tetap muncul
+berarti index-nya memang tidak ada.
+
+--seed N membuat ulang SEMUA tabel app (migrations/*.sql, urut nomor) lalu
+mengisinya dengan data tiruan fake_backend (N siswa). Hanya untuk database
+lokal; host lain ditolak kecuali --force.
+
+Contoh:
+    DATABASE_URL=postgresql://postgres@localhost/lms python bench/explain_queries.py --seed 100
+    python bench/explain_queries.py --database-url postgresql://... --analyze --out explain.json
+
+Exit code 1 kalau ada bentuk query yang masih seq scan.
+"""
+import argparse
+import glob
+import json
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MIGRATIONS = os.path.join(ROOT, "migrations")
+
+# urutan insert seed (parent dulu, mengikuti foreign key)
+SEED_TABLES = [
+    "users", "courses", "enrollments", "modules", "quizzes", "quiz_questions", "assignments",
+    "module_link", "module_progress", "quiz_attempts", "quiz_answers", "assignment_submissions",
+    "attendance_sessions", "attendance", "announcements", "discussions", "discussion_replies",
+]
+LOCAL_HOSTS = {"localhost", "127.0.0.1", "::1"}
+
+# (nama, asal di app.py, sql) — parameter diisi dari sample_params()
+QUERY_SHAPES = [
+    ("login", "login()",
+     "select id, name, email, role, avatar_url, password_hash from users where email = %(email)s"),
+    ("user names", "UserNameLoader.load()",
+     "select id, name from users where id = any(%(user_ids)s)"),
+    ("join by access code", "page_dashboard (join course)",
+     "select id, title from courses where access_code = %(access_code)s"),
+    ("instructor courses", "page_dashboard (instruktur)",
+     "select id, code, title, access_code, instructor_email from courses where instructor_email = %(instructor_email)s"),
+    ("student courses", "page_dashboard (siswa, embed course)",
+     "select e.course_id, c.id, c.title from enrollments e join courses c on c.id = e.course_id "
+     "where e.user_id = %(user_id)s"),
+    ("enrolled check", "page_dashboard (join course)",
+     "select id from enrollments where user_id = %(user_id)s and course_id = %(course_id)s"),
+    ("course students", "gradebook",
+     "select user_id, role from enrollments where course_id = %(course_id)s"),
+    ("modules", "load_cached_rows('modules')",
+     "select id, course_id, title, order_index, video_url from modules where course_id = %(course_id)s "
+     "order by order_index"),
+    ("module links", "load_module_links()",
+     "select id, course_id, module_id, type, target_id from module_link where course_id = %(course_id)s"),
+    ("student progress", "section module (siswa)",
+     "select module_id, status from module_progress where user_id = %(user_id)s and course_id = %(course_id)s"),
+    ("course progress", "gradebook",
+     "select user_id, module_id, status from module_progress where course_id = %(course_id)s"),
+    ("quizzes", "load_cached_rows('quizzes')",
+     "select id, course_id, title, attempt_limit from quizzes where course_id = %(course_id)s"),
+    ("quiz questions", "load_cached_rows('quiz_questions')",
+     "select * from quiz_questions where quiz_id = %(quiz_id)s order by id"),
+    ("attempt count", "count_rows('quiz_attempts')",
+     "select count(*) from quiz_attempts where quiz_id = %(quiz_id)s and user_id = %(user_id)s"),
+    ("grading attempts", "load_quiz_attempts()",
+     "select id, quiz_id, user_id, score, submitted_at from quiz_attempts where quiz_id = %(quiz_id)s "
+     "order by submitted_at desc"),
+    ("gradebook attempts", "gradebook",
+     "select quiz_id, user_id, score, submitted_at from quiz_attempts where quiz_id = any(%(quiz_ids)s)"),
+    ("grading answers", "load_attempt_answers()",
+     "select id, attempt_id, question_id, text_answer, is_correct from quiz_answers "
+     "where attempt_id = any(%(attempt_ids)s) order by id"),
+    ("assignments", "load_cached_rows('assignments')",
+     "select id, course_id, title from assignments where course_id = %(course_id)s"),
+    ("gradebook submissions", "gradebook",
+     "select assignment_id, user_id, score, submitted_at from assignment_submissions "
+     "where assignment_id = any(%(assignment_ids)s)"),
+    ("attendance sessions", "load_cached_rows('attendance_sessions')",
+     "select * from attendance_sessions where course_id = %(course_id)s"),
+    ("attendance matrix", "load_attendance_matrix()",
+     "select id, session_id, user_id, status from attendance where session_id = any(%(session_ids)s) order by id"),
+    ("student attendance", "section attendance (siswa)",
+     "select session_id from attendance where user_id = %(user_id)s and course_id = %(course_id)s"),
+    ("course attendance", "gradebook",
+     "select session_id, user_id, status from attendance where course_id = %(course_id)s"),
+    ("announcements", "load_cached_rows('announcements')",
+     "select * from announcements where course_id = %(course_id)s order by date desc"),
+    ("latest announcement", "page_dashboard (siswa)",
+     "select a.*, c.title from announcements a join courses c on c.id = a.course_id "
+     "where a.course_id = any(%(course_ids)s) order by a.date desc limit 1"),
+    ("forum topics", "load_forum_topics()",
+     "select d.id, d.course_id, d.user_id, d.title, d.created_at, "
+     "(select count(*) from discussion_replies r where r.discussion_id = d.id) as reply_count "
+     "from discussions d where d.course_id = %(course_id)s "
+     "order by d.created_at desc, d.id desc limit %(page_size)s"),
+    ("forum topics next", "load_forum_topics(before=...)",
+     "select id, course_id, user_id, title, created_at from discussions where course_id = %(course_id)s "
+     "and (created_at, id) < (%(topic_created_at)s::timestamptz, %(topic_id)s) "
+     "order by created_at desc, id desc limit %(page_size)s"),
+    ("forum contents", "load_forum_bodies()",
+     "select id, content from discussions where id = any(%(discussion_ids)s)"),
+    ("forum replies", "load_forum_bodies()",
+     "select r.* from unnest(%(discussion_ids)s::bigint[]) as t(id) cross join lateral ("
+     "select id, discussion_id, user_id, reply, parent_id, created_at from discussion_replies "
+     "where discussion_id = t.id order by created_at, id limit %(page_size)s) r"),
+    ("forum replies next", "load_forum_replies(after=...)",
+     "select id, discussion_id, user_id, reply, parent_id, created_at from discussion_replies "
+     "where discussion_id = %(discussion_id)s "
+     "and (created_at, id) > (%(reply_created_at)s::timestamptz, %(reply_id)s) "
+     "order by created_at, id limit %(page_size)s"),
+]
+
+
+def _connect(url):
+    import psycopg2
+
+    conn = psycopg2.connect(url)
+    conn.autocommit = True
+    return conn
+
+
+def _is_local(conn):
+    host = conn.info.host or ""
+    return host.startswith("/") or host in LOCAL_HOSTS
+
+
+def seed_database(conn, students):
+    """Buat ulang tabel dari migrations/*.sql lalu isi dengan data fake_backend."""
+    sys.path.insert(0, ROOT)
+    import fake_backend
+
+    cur = conn.cursor()
+    cur.execute("drop table if exists " + ", ".join(f"public.{t}" for t in reversed(SEED_TABLES)) + " cascade")
+    # grant di migrasi butuh role Supabase; di Postgres lokal dibuat kosong
+    cur.execute("""
+        do $$ begin
+            if not exists (select 1 from pg_roles where rolname = 'anon') then create role anon nologin; end if;
+            if not exists (select 1 from pg_roles where rolname = 'authenticated') then create role authenticated nologin; end if;
+        end $$
+    """)
+    cur.execute(_read(os.path.join(MIGRATIONS, "000_base_schema.sql")))
+
+    client = fake_backend.seed(fake_backend.FakeClient(), students=students)
+    for table in SEED_TABLES:
+        rows = client.tables.get(table, [])
+        if not rows:
+            continue
+        cur.execute("select column_name from information_schema.columns "
+                    "where table_schema = 'public' and table_name = %s", (table,))
+        existing = {r[0] for r in cur.fetchall()}
+        columns = [c for c in rows[0] if c in existing]
+        values = ", ".join(["%s"] * len(columns))
+        cur.executemany(
+            f"insert into public.{table} ({', '.join(columns)}) values ({values})",
+            [[r.get(c) for c in columns] for r in rows],
+        )
+        cur.execute(f"select setval(pg_get_serial_sequence('public.{table}', 'id'), "
+                    f"(select max(id) from public.{table}))")
+
+    for path in sorted(glob.glob(os.path.join(MIGRATIONS, "*.sql"))):
+        if os.path.basename(path).startswith("000_"):
+            continue
+        cur.execute(_read(path))
+    print(f"✅ seed: {students} siswa, {len(glob.glob(os.path.join(MIGRATIONS, '*.sql')))} migrasi", file=sys.stderr)
+
+
+def _read(path):
+    with open(path, encoding="utf-8") as f:
+        return f.read()
+
+
+def sample_params(conn):
+    """Nilai parameter nyata dari data (course pertama yang punya siswa)."""
+    cur = conn.cursor()
+
+    def one(sql, *args):
+        cur.execute(sql, args)
+        row = cur.fetchone()
+        return row[0] if row else None
+
+    def many(sql, *args):
+        cur.execute(sql, args)
+        return [r[0] for r in cur.fetchall()]
+
+    course_id = one("select course_id from enrollments order by id limit 1")
+    if course_id is None:
+        return None
+    user_id = one("select user_id from enrollments where course_id = %s order by id limit 1", course_id)
+    quiz_ids = many("select id from quizzes where course_id = %s order by id", course_id)
+    # cursor keyset forum: topik / komentar kedua sebagai "baris terakhir halaman sebelumnya"
+    cur.execute("select created_at, id from discussions where course_id = %s "
+                "order by created_at desc, id desc offset 1 limit 1", (course_id,))
+    topic_cursor = cur.fetchone() or (None, 0)
+    cur.execute("select discussion_id, created_at, id from discussion_replies "
+                "where discussion_id = (select max(id) from discussions where course_id = %s) "
+                "order by created_at, id offset 1 limit 1", (course_id,))
+    reply_cursor = cur.fetchone() or (0, None, 0)
+    return {
+        "course_id": course_id,
+        "course_ids": [course_id],
+        "user_id": user_id,
+        "user_ids": many("select user_id from enrollments where course_id = %s order by id limit 50", course_id),
+        "email": one("select email from users where id = %s", user_id),
+        "access_code": one("select access_code from courses where id = %s", course_id),
+        "instructor_email": one("select instructor_email from courses where id = %s", course_id),
+        "quiz_id": quiz_ids[0] if quiz_ids else 0,
+        "quiz_ids": quiz_ids,
+        "attempt_ids": many("select id from quiz_attempts where quiz_id = any(%s) order by id limit 20", quiz_ids),
+        "assignment_ids": many("select id from assignments where course_id = %s", course_id),
+        "session_ids": many("select id from attendance_sessions where course_id = %s", course_id),
+        "discussion_ids": many("select id from discussions where course_id = %s order by created_at desc limit 5",
+                               course_id),
+        "page_size": 11,  # FORUM_PAGE_SIZE + 1 baris penanda halaman berikutnya
+        "topic_created_at": topic_cursor[0],
+        "topic_id": topic_cursor[1],
+        "discussion_id": reply_cursor[0],
+        "reply_created_at": reply_cursor[1],
+        "reply_id": reply_cursor[2],
+    }
+
+
+def _walk(node):
+    yield node
+    for child in node.get("Plans", []):
+        yield from _walk(child)
+
+
+def explain(conn, sql, params, analyze=False):
+    cur = conn.cursor()
+    cur.execute(f"explain ({'analyze, ' if analyze else ''}format json) {sql}", params)
+    plan = cur.fetchone()[0][0]
+    scans = []
+    for node in _walk(plan["Plan"]):
+        if "Relation Name" in node:
+            # Bitmap Heap Scan: nama index ada di node Bitmap Index Scan di bawahnya
+            indexes = [n["Index Name"] for n in _walk(node) if "Index Name" in n]
+            scans.append({
+                "type": node["Node Type"],
+                "table": node["Relation Name"],
+                "index": ", ".join(indexes) or None,
+            })
+    return {
+        "cost": plan["Plan"]["Total Cost"],
+        "ms": plan.get("Execution Time"),
+        "scans": scans,
+        "seq_scan": sorted({s["table"] for s in scans if s["type"] == "Seq Scan"}),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--database-url", default=os.environ.get("DATABASE_URL"))
+    parser.add_argument("--seed", type=int, metavar="N", help="buat ulang tabel & isi data tiruan (N siswa)")
+    parser.add_argument("--force", action="store_true", help="izinkan --seed ke host non-lokal")
+    parser.add_argument("--planner-default", action="store_true",
+                        help="jangan paksa index (enable_seqscan tetap on)")
+    parser.add_argument("--analyze", action="store_true", help="EXPLAIN ANALYZE (jalankan query, catat waktu)")
+    parser.add_argument("--out", help="simpan hasil sebagai JSON")
+    args = parser.parse_args()
+
+    if not args.database_url:
+        sys.exit("DATABASE_URL / --database-url belum diisi.")
+    conn = _connect(args.database_url)
+
+    if args.seed is not None:
+        if not _is_local(conn) and not args.force:
+            sys.exit(f"--seed menghapus semua tabel app; host '{conn.info.host}' bukan lokal (pakai --force).")
+        seed_database(conn, args.seed)
+
+    params = sample_params(conn)
+    if params is None:
+        sys.exit("Database belum berisi data (enrollments kosong) — jalankan dengan --seed N.")
+    if not args.planner_default:
+        conn.cursor().execute("set enable_seqscan = off")
+
+    results = []
+    for name, origin, sql in QUERY_SHAPES:
+        row = {"query": name, "origin": origin, **explain(conn, sql, params, args.analyze)}
+        results.append(row)
+
+    print(f"{'query':<24} {'cost':>10} {'ms':>8}  scan")
+    for r in results:
+        scans = ", ".join(f"{s['type']} {s['table']}" + (f" ({s['index']})" if s["index"] else "") for s in r["scans"])
+        flag = "⚠️ " if r["seq_scan"] else "   "
+        ms = f"{r['ms']:.2f}" if r["ms"] is not None else "-"
+        print(f"{flag}{r['query']:<21} {r['cost']:>10.1f} {ms:>8}  {scans}")
+
+    flagged = [r for r in results if r["seq_scan"]]
+    print(f"\n{len(results)} bentuk query, {len(flagged)} dengan seq scan"
+          + (": " + ", ".join(f"{r['query']} ({'/'.join(r['seq_scan'])})" for r in flagged) if flagged else ""))
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+    sys.exit(1 if flagged else 0)
+
+
+if __name__ == "__main__":
+    main()
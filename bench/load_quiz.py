@@ -0,0 +1,274 @@
+"""
+Load test "ujian serentak": banyak sesi siswa login, buka course, buka tab
+quiz, mengisi jawaban lalu submit — bersamaan, dalam satu proses.
+
+Setiap sesi menjalankan app.py yang asli (AppTest) terhadap backend tiruan
+(BACKEND=fake) dengan latency yang bisa diatur, persis seperti banyak thread
+sesi Streamlit yang berbagi satu proses server.
+
+Contoh:
+    python bench/load_quiz.py --sessions 200 --concurrency 50 --latency-ms 30
+    python bench/load_quiz.py --sessions 400 --latency-ms 20 --jitter-ms 15 --out load.json
+
+Laporan: throughput (sesi & rerun per detik), p50/p95/p99 latency rerun per
+langkah, dan jumlah panggilan backend per sesi.
+"""
+import argparse
+import json
+import os
+import random
+import statistics
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+APP = os.path.join(ROOT, "app.py")
+COURSE_ID = 1
+_CONFIG_PATCH = None
+STEPS = ["login", "submit_login", "open_course", "open_quiz", "open_questions", "answer", "submit"]
+
+
+def _setup_runtime():
+    """
+    AppTest memasang Runtime tiruan & patch config secara global di setiap run,
+    yang bentrok kalau banyak AppTest jalan paralel. Di sini dipasang sekali
+    untuk seluruh load test, dan setiap sesi memakai runner tanpa setup global.
+    """
+    from unittest.mock import MagicMock
+
+    from streamlit.runtime import Runtime
+    from streamlit.runtime.caching.storage.dummy_cache_storage import MemoryCacheStorageManager
+    from streamlit.runtime.media_file_manager import MediaFileManager
+    from streamlit.runtime.memory_media_file_storage import MemoryMediaFileStorage
+    from streamlit.testing.v1.util import patch_config_options
+
+    runtime = MagicMock(spec=Runtime)
+    runtime.media_file_mgr = MediaFileManager(MemoryMediaFileStorage("/mock/media"))
+    runtime.cache_storage_manager = MemoryCacheStorageManager()
+    Runtime._instance = runtime
+    global _CONFIG_PATCH
+    _CONFIG_PATCH = patch_config_options({"global.appTest": True})
+    _CONFIG_PATCH.__enter__()  # referensi global: patch lepas kalau objeknya di-GC
+
+
+def _session_class():
+    from urllib import parse
+
+    from streamlit.runtime.pages_manager import PagesManager
+    from streamlit.runtime.scriptrunner.script_cache import ScriptCache
+    from streamlit.testing.v1 import AppTest
+    from streamlit.testing.v1.local_script_runner import LocalScriptRunner
+
+    # seperti server Streamlit: satu cache bytecode untuk semua sesi
+    # (compile app.py paralel di setiap runner kadang gagal)
+    script_cache = ScriptCache()
+
+    class SessionAppTest(AppTest):
+        """AppTest tanpa setup/teardown global (lihat _setup_runtime)."""
+
+        def _run(self, widget_state=None, timeout=None):
+            runner = LocalScriptRunner(
+                self._script_path,
+                self.session_state,
+                PagesManager(self._script_path, setup_watcher=False),
+                args=self.args,
+                kwargs=self.kwargs,
+            )
+            runner._script_cache = script_cache
+            self._tree = runner.run(
+                widget_state, self.query_params, timeout or self.default_timeout, self._page_hash
+            )
+            self._tree._runner = self
+            self.query_params = parse.parse_qs(runner.event_data[-1]["client_state"].query_string)
+            return self
+
+    return SessionAppTest
+
+
+class Session:
+    """Satu siswa simulasi."""
+
+    def __init__(self, app_cls, email, rng):
+        self.at = app_cls(APP, default_timeout=300)
+        self.email = email
+        self.rng = rng
+        self.timings = {}
+        self.calls = 0
+        self.error = None
+        self.submitted = False
+
+    def _step(self, name, action):
+        t0 = time.perf_counter()
+        action()
+        self.timings[name] = time.perf_counter() - t0
+        rec = self.at.session_state["_call_recorder"] if "_call_recorder" in self.at.session_state else None
+        if rec is not None:
+            self.calls += len(rec.calls)
+        if self.at.exception:
+            raise RuntimeError(f"{name}: {self.at.exception[0].value}")
+
+    def run(self, think_ms):
+        at = self.at
+        try:
+            self._step("login", at.run)
+            at.text_input[0].input(self.email)
+            at.text_input[1].input("password")
+            self._step("submit_login", lambda: at.button[0].click().run())
+            if at.session_state["page"] != "dashboard":
+                raise RuntimeError("login gagal")
+
+            # tombol "Open Course" -> halaman course
+            at.session_state["current_course"] = COURSE_ID
+            at.session_state["last_course"] = COURSE_ID
+            at.session_state["page"] = "course_detail"
+            self._step("open_course", at.run)
+            self._step("open_quiz", lambda: at.radio(key="course_section").set_value("quiz").run())
+            # soal quiz baru diambil setelah quiz dibuka (toggle "Open quiz")
+            opener = next((t for t in at.toggle if t.key and t.key.startswith("open_quiz_body_")), None)
+            if opener is None:
+                raise RuntimeError("quiz tidak ditemukan")
+            self._step("open_questions", lambda: opener.set_value(True).run())
+
+            self._think(think_ms)
+            for box in at.selectbox:
+                if box.key and box.key.startswith("ans_") and box.options:
+                    box.select(self.rng.choice(box.options))
+            for area in at.text_area:
+                if area.key and area.key.startswith("ans_"):
+                    area.input("jawaban simulasi")
+            self._step("answer", at.run)
+
+            self._think(think_ms)
+            submit = next((b for b in at.button if b.key and b.key.startswith("submit_quiz_")), None)
+            if submit is None:
+                raise RuntimeError("tombol submit tidak ditemukan")
+            self._step("submit", lambda: submit.click().run())
+            self.submitted = not any("Failed" in e.value for e in at.error)
+        except Exception as e:
+            self.error = str(e)
+        return self
+
+    def _think(self, think_ms):
+        if think_ms:
+            time.sleep(self.rng.uniform(0, think_ms) / 1000)
+
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    k = (len(values) - 1) * pct / 100
+    lo = int(k)
+    hi = min(lo + 1, len(values) - 1)
+    return values[lo] + (values[hi] - values[lo]) * (k - lo)
+
+
+def summarize(sessions, elapsed, client, attempts_before):
+    ok = [s for s in sessions if not s.error]
+    report = {
+        "sessions": len(sessions),
+        "ok": len(ok),
+        "failed": len(sessions) - len(ok),
+        "submitted": sum(1 for s in ok if s.submitted),
+        "attempts_written": len(client.tables.get("quiz_attempts", [])) - attempts_before,
+        "elapsed_s": round(elapsed, 2),
+        "sessions_per_s": round(len(ok) / elapsed, 2) if elapsed else 0,
+        "reruns_per_s": round(sum(len(s.timings) for s in ok) / elapsed, 2) if elapsed else 0,
+        "calls_per_session": {
+            "mean": round(statistics.mean(s.calls for s in ok), 1) if ok else 0,
+            "max": max((s.calls for s in ok), default=0),
+        },
+        "backend_calls_total": client.calls,
+        "latency_ms": {},
+        "errors": sorted({s.error for s in sessions if s.error})[:10],
+    }
+    for step in STEPS + ["all"]:
+        if step == "all":
+            values = [t for s in ok for t in s.timings.values()]
+        else:
+            values = [s.timings[step] for s in ok if step in s.timings]
+        report["latency_ms"][step] = {
+            f"p{p}": round(percentile(values, p) * 1000, 1) for p in (50, 95, 99)
+        }
+    return report
+
+
+def print_report(r):
+    print(f"sesi: {r['sessions']} (ok {r['ok']}, gagal {r['failed']}, submit {r['submitted']}, "
+          f"attempt tersimpan {r['attempts_written']})")
+    print(f"waktu: {r['elapsed_s']} s · {r['sessions_per_s']} sesi/s · {r['reruns_per_s']} rerun/s")
+    print(f"panggilan backend per sesi: rata-rata {r['calls_per_session']['mean']}, "
+          f"maks {r['calls_per_session']['max']} (total {r['backend_calls_total']})")
+    print(f"{'langkah':<14} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}")
+    for step, lat in r["latency_ms"].items():
+        print(f"{step:<14} {lat['p50']:>9} {lat['p95']:>9} {lat['p99']:>9}")
+    for err in r["errors"]:
+        print(f"⚠️ {err}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sessions", type=int, default=200, help="jumlah siswa simulasi")
+    parser.add_argument("--concurrency", type=int, default=50, help="sesi yang jalan bersamaan")
+    parser.add_argument("--students", type=int, default=None, help="siswa di data tiruan (default = --sessions)")
+    parser.add_argument("--latency-ms", type=float, default=20.0, help="latency tiruan per panggilan backend")
+    parser.add_argument("--jitter-ms", type=float, default=0.0, help="tambahan latency acak 0..jitter")
+    parser.add_argument("--think-ms", type=float, default=0.0, help="jeda acak antar langkah siswa")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--out", help="simpan laporan sebagai JSON")
+    args = parser.parse_args()
+
+    students = max(args.students or args.sessions, args.sessions)
+    os.environ["BACKEND"] = "fake"
+    os.environ["FAKE_STUDENTS"] = str(students)
+    os.environ.pop("FAKE_LATENCY_MS", None)  # latency diatur langsung di client (lihat latency())
+    sys.path.insert(0, ROOT)
+    import fake_backend
+
+    client = fake_backend.get_client(students=students)
+    # quiz tanpa batas percobaan supaya setiap sesi bisa submit
+    for quiz in client.tables.get("quizzes", []):
+        quiz["attempt_limit"] = 0
+
+    jitter_rng = random.Random(args.seed)
+    jitter_lock = threading.Lock()
+
+    def latency():
+        with jitter_lock:
+            extra = jitter_rng.uniform(0, args.jitter_ms) if args.jitter_ms else 0.0
+        return (args.latency_ms + extra) / 1000
+
+    _setup_runtime()
+    app_cls = _session_class()
+
+    # warm-up: import app.py sekali (cache_resource, render cache) sebelum mengukur
+    warm = app_cls(APP, default_timeout=300)
+    warm.run()
+    client.latency = latency
+
+    attempts_before = len(client.tables.get("quiz_attempts", []))
+    client.calls = 0
+    sessions = [
+        Session(app_cls, f"student{i}@example.com", random.Random(args.seed + i))
+        for i in range(1, args.sessions + 1)
+    ]
+    t0 = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        futures = [pool.submit(s.run, args.think_ms) for s in sessions]
+        for done, _ in enumerate(as_completed(futures), 1):
+            if done % max(1, args.sessions // 10) == 0:
+                print(f"  {done}/{args.sessions} sesi selesai", file=sys.stderr)
+    elapsed = time.perf_counter() - t0
+
+    report = summarize(sessions, elapsed, client, attempts_before)
+    report["config"] = vars(args)
+    print_report(report)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,773 @@
+"""
+Backend tiruan (in-process) untuk ThinkVerse LMS.
+
+Meniru subset API supabase-py yang dipakai app.py:
+- table().select().eq().neq().in_().lt().gt().order().limit().range().execute()
+- or_() dengan kondisi col.op.nilai / and(...) (pagination keyset)
+- insert / update / delete / upsert
+- rpc()
+- storage.from_().upload() / get_public_url()
+
+Dipakai untuk benchmark, load test dan demo lokal tanpa project Supabase.
+Aktifkan dari app.py dengan BACKEND=fake (lihat make_backend di app.py).
+"""
+import hashlib
+import random
+import threading
+import time
+from datetime import datetime, timedelta
+
+
+class FakeAPIError(Exception):
+    """Error ala postgrest.APIError (constraint, fungsi tidak ada, dll)."""
+
+    def __init__(self, message, code=None):
+        super().__init__(message)
+        self.message = message
+        self.code = code
+
+
+class FakeResponse:
+    def __init__(self, data, count=None):
+        self.data = data
+        self.count = count
+
+
+# relasi untuk embed "tabel(kolom)":
+# (tabel asal, tabel embed) -> (kolom di asal, kolom di embed, many?)
+RELATIONS = {
+    ("announcements", "courses"): ("course_id", "id", False),
+    ("enrollments", "courses"): ("course_id", "id", False),
+    ("enrollments", "users"): ("user_id", "id", False),
+    ("discussions", "users"): ("user_id", "id", False),
+    ("discussions", "discussion_replies"): ("id", "discussion_id", True),
+    ("discussion_replies", "users"): ("user_id", "id", False),
+    ("attendance", "users"): ("user_id", "id", False),
+    ("quiz_attempts", "users"): ("user_id", "id", False),
+    ("quiz_attempts", "quiz_answers"): ("id", "attempt_id", True),
+    ("quiz_answers", "quiz_questions"): ("question_id", "id", False),
+    ("assignment_submissions", "users"): ("user_id", "id", False),
+}
+
+# computed relationship (fungsi SQL, lihat migrations/004_module_link_targets.sql):
+# (tabel asal, nama relasi) -> (tabel tujuan, kolom di asal, kolom di tujuan, syarat baris asal)
+COMPUTED_RELATIONS = {
+    ("module_link", "quiz"): ("quizzes", "target_id", "id", {"type": "quiz"}),
+    ("module_link", "assignment"): ("assignments", "target_id", "id", {"type": "assignment"}),
+}
+
+# constraint unik yang dicek saat insert/upsert
+UNIQUE = {
+    "users": [("email",)],
+    "courses": [("access_code",)],
+    "enrollments": [("user_id", "course_id")],
+    "module_progress": [("user_id", "module_id")],
+    "attendance": [("session_id", "user_id")],
+}
+
+
+def _split_top(text):
+    """Pisahkan daftar kolom dengan koma, abaikan koma di dalam kurung."""
+    parts, depth, buf = [], 0, ""
+    for ch in text:
+        if ch == "(":
+            depth += 1
+        elif ch == ")":
+            depth -= 1
+        if ch == "," and depth == 0:
+            parts.append(buf.strip())
+            buf = ""
+        else:
+            buf += ch
+    if buf.strip():
+        parts.append(buf.strip())
+    return parts
+
+
+def _same(a, b):
+    # PostgREST mengirim filter sebagai string; DB yang meng-cast
+    return a is not None and b is not None and str(a) == str(b)
+
+
+def _cmp_key(v):
+    if v is None:
+        return (1, "")
+    if isinstance(v, (int, float)):
+        return (0, v)
+    return (0, str(v))
+
+
+# operator filter PostgREST dalam or_() / and(): nama -> test(nilai baris, nilai filter)
+_OPERATORS = {
+    "eq": lambda v, val: _same(v, val),
+    "neq": lambda v, val: v is not None and not _same(v, val),
+    "gt": lambda v, val: v is not None and _cmp_key(v) > _cmp_key(val),
+    "gte": lambda v, val: v is not None and _cmp_key(v) >= _cmp_key(val),
+    "lt": lambda v, val: v is not None and _cmp_key(v) < _cmp_key(val),
+    "lte": lambda v, val: v is not None and _cmp_key(v) <= _cmp_key(val),
+}
+
+
+def _parse_condition(text):
+    """'col.op.nilai' / 'and(...)' / 'or(...)' dari string or_() -> fungsi(baris)."""
+    text = text.strip()
+    for group, combine in (("and(", all), ("or(", any)):
+        if text.startswith(group):
+            tests = [_parse_condition(c) for c in _split_top(text[len(group):-1])]
+            return lambda row, tests=tests, combine=combine: combine(t(row) for t in tests)
+    col, op, val = text.split(".", 2)
+    if op not in _OPERATORS:
+        raise FakeAPIError(f"operator '{op}' belum didukung fake backend", code="PGRST100")
+    val = val[1:-1] if val.startswith('"') and val.endswith('"') else val
+    test = _OPERATORS[op]
+
+    def match(row):
+        v = row.get(col)
+        # filter string selalu teks; bandingkan angka sebagai angka seperti cast di DB
+        target = type(v)(val) if isinstance(v, (int, float)) and not isinstance(v, bool) else val
+        return test(v, target)
+    return match
+
+
+class FakeQuery:
+    def __init__(self, client, table):
+        self._client = client
+        self._table = table
+        self._op = "select"
+        self._columns = "*"
+        self._count = None
+        self._head = False
+        self._payload = None
+        self._on_conflict = ""
+        self._ignore_duplicates = False
+        self._filters = []
+        self._order = []
+        self._limit = None
+        self._offset = 0
+
+    # --- operasi ---
+    def select(self, *columns, count=None, head=None):
+        self._op = "select"
+        self._columns = ",".join(columns) if columns else "*"
+        self._count = count
+        self._head = bool(head)
+        return self
+
+    def insert(self, json, *, count=None, returning=None, upsert=False, default_to_null=True):
+        self._op = "upsert" if upsert else "insert"
+        self._payload = json
+        self._count = count
+        return self
+
+    def upsert(self, json, *, count=None, returning=None, ignore_duplicates=False, on_conflict="", default_to_null=True):
+        self._op = "upsert"
+        self._payload = json
+        self._count = count
+        self._on_conflict = on_conflict
+        self._ignore_duplicates = ignore_duplicates
+        return self
+
+    def update(self, json, *, count=None, returning=None):
+        self._op = "update"
+        self._payload = json
+        self._count = count
+        return self
+
+    def delete(self, *, count=None, returning=None):
+        self._op = "delete"
+        self._count = count
+        return self
+
+    # --- filter ---
+    def _add(self, col, fn):
+        self._filters.append((col, fn))
+        return self
+
+    def eq(self, col, val):
+        return self._add(col, lambda v: _same(v, val))
+
+    def neq(self, col, val):
+        return self._add(col, lambda v: v is not None and not _same(v, val))
+
+    def gt(self, col, val):
+        return self._add(col, lambda v: v is not None and _cmp_key(v) > _cmp_key(val))
+
+    def gte(self, col, val):
+        return self._add(col, lambda v: v is not None and _cmp_key(v) >= _cmp_key(val))
+
+    def lt(self, col, val):
+        return self._add(col, lambda v: v is not None and _cmp_key(v) < _cmp_key(val))
+
+    def lte(self, col, val):
+        return self._add(col, lambda v: v is not None and _cmp_key(v) <= _cmp_key(val))
+
+    def in_(self, col, values):
+        wanted = {str(x) for x in values}
+        return self._add(col, lambda v: v is not None and str(v) in wanted)
+
+    def is_(self, col, val):
+        if str(val).lower() == "null":
+            return self._add(col, lambda v: v is None)
+        return self._add(col, lambda v: str(v).lower() == str(val).lower())
+
+    def ilike(self, col, pattern):
+        needle = pattern.replace("%", "").lower()
+        return self._add(col, lambda v: v is not None and needle in str(v).lower())
+
+    def or_(self, filters, reference_table=None):
+        tests = [_parse_condition(c) for c in _split_top(filters)]
+        self._filters.append((None, lambda row: any(t(row) for t in tests)))
+        return self
+
+    # --- modifier ---
+    def order(self, col, *, desc=False, nullsfirst=None, foreign_table=None):
+        self._order.append((col, desc))
+        return self
+
+    def limit(self, size, *, foreign_table=None):
+        self._limit = size
+        return self
+
+    def range(self, start, end, foreign_table=None):
+        self._offset = start
+        self._limit = end - start + 1
+        return self
+
+    # --- eksekusi ---
+    def _match(self, row):
+        return all(fn(row) if col is None else fn(row.get(col)) for col, fn in self._filters)
+
+    def execute(self):
+        return self._client._execute(self)
+
+
+class FakeRPC:
+    def __init__(self, client, fn, params):
+        self._client = client
+        self._fn = fn
+        self._params = params or {}
+
+    def execute(self):
+        return self._client._call_rpc(self._fn, self._params)
+
+
+class FakeBucket:
+    def __init__(self, client, name):
+        self._client = client
+        self._name = name
+
+    def upload(self, path, file, file_options=None):
+        data = file if isinstance(file, (bytes, bytearray)) else file.read()
+        return self._client._storage_upload(self._name, path, bytes(data), file_options or {})
+
+    def update(self, path, file, file_options=None):
+        return self.upload(path, file, dict(file_options or {}, upsert="true"))
+
+    def download(self, path):
+        return self._client._storage_download(self._name, path)
+
+    def get_public_url(self, path, options=None):
+        return f"{self._client.url}/storage/v1/object/public/{self._name}/{path}"
+
+
+class FakeStorage:
+    def __init__(self, client):
+        self._client = client
+
+    def from_(self, bucket):
+        return FakeBucket(self._client, bucket)
+
+
+class FakeClient:
+    """
+    Pengganti supabase.Client. Semua data ada di memori proses.
+    latency: detik per panggilan (angka atau callable tanpa argumen) untuk meniru jaringan.
+    down: nama tabel (atau "*" = semua) yang sedang "mati" -> PGRST000, untuk meniru outage.
+    """
+
+    def __init__(self, url="http://fake.local", latency=0.0):
+        self.url = url
+        self.latency = latency
+        self.down = set()
+        self.tables = {}
+        self.objects = {}
+        self.calls = 0
+        self.rpcs = dict(DEFAULT_RPCS)
+        self._next_id = {}
+        self._lock = threading.RLock()
+        self.storage = FakeStorage(self)
+
+    # --- API publik ala supabase-py ---
+    def table(self, name):
+        return FakeQuery(self, name)
+
+    def from_(self, name):
+        return self.table(name)
+
+    def rpc(self, fn, params=None, count=None, head=False, get=False):
+        return FakeRPC(self, fn, params)
+
+    def register_rpc(self, name, fn):
+        """Daftarkan implementasi Python untuk fungsi SQL (dipanggil fn(client, **params))."""
+        self.rpcs[name] = fn
+
+    # --- internal ---
+    def _sleep(self):
+        delay = self.latency() if callable(self.latency) else self.latency
+        if delay:
+            time.sleep(delay)
+
+    def _rows(self, table):
+        return self.tables.setdefault(table, [])
+
+    def _new_id(self, table):
+        nxt = self._next_id.get(table)
+        if nxt is None:
+            nxt = max((r.get("id") or 0 for r in self._rows(table)), default=0) + 1
+        self._next_id[table] = nxt + 1
+        return nxt
+
+    def insert_row(self, table, row):
+        """Insert langsung (dipakai seeding & RPC), tanpa menghitung panggilan."""
+        row = dict(row)
+        self._check_unique(table, row)
+        if row.get("id") is None:
+            row["id"] = self._new_id(table)
+        self._rows(table).append(row)
+        return row
+
+    def _check_unique(self, table, row, ignore=None):
+        for cols in UNIQUE.get(table, []):
+            if any(row.get(c) is None for c in cols):
+                continue
+            for other in self._rows(table):
+                if other is ignore:
+                    continue
+                if all(_same(other.get(c), row.get(c)) for c in cols):
+                    raise FakeAPIError(f"duplicate key value violates unique constraint on {table}({', '.join(cols)})", code="23505")
+
+    def _check_down(self, name):
+        if "*" in self.down or name in self.down:
+            raise FakeAPIError("Could not connect with the database", code="PGRST000")
+
+    def _execute(self, q):
+        self._sleep()
+        self._check_down(q._table)
+        with self._lock:
+            self.calls += 1
+            if q._table not in self.tables and q._op == "select":
+                self.tables[q._table] = []
+            handler = getattr(self, f"_do_{q._op}")
+            return handler(q)
+
+    def _do_select(self, q):
+        rows = [r for r in self._rows(q._table) if q._match(r)]
+        for col, desc in reversed(q._order):
+            rows.sort(key=lambda r: _cmp_key(r.get(col)), reverse=desc)
+        count = len(rows) if q._count else None
+        if q._offset:
+            rows = rows[q._offset:]
+        if q._limit is not None:
+            rows = rows[:q._limit]
+        if q._head:
+            return FakeResponse([], count)
+        return FakeResponse([self._project(q._table, r, q._columns) for r in rows], count)
+
+    def _project(self, table, row, columns):
+        out = {}
+        for item in _split_top(columns or "*"):
+            if item == "*":
+                out.update(row)
+                continue
+            alias = None
+            if ":" in item.split("(")[0]:
+                alias, item = item.split(":", 1)
+                alias = alias.strip()
+            if "(" in item:
+                rel, inner = item.split("(", 1)
+                rel = rel.strip().split("!")[0]
+                inner = inner.rsplit(")", 1)[0]
+                out[alias or rel] = self._embed(table, row, rel, inner)
+            else:
+                col = item.strip()
+                out[alias or col] = row.get(col)
+        return out
+
+    def _embed(self, table, row, rel, inner):
+        computed = COMPUTED_RELATIONS.get((table, rel))
+        if computed is not None:
+            target, local_col, remote_col, where = computed
+            if any(row.get(k) != v for k, v in where.items()):
+                return None
+            match = next((r for r in self._rows(target) if _same(r.get(remote_col), row.get(local_col))), None)
+            return self._project(target, match, inner) if match else None
+        link = RELATIONS.get((table, rel))
+        if link is None:
+            raise FakeAPIError(f"Could not find a relationship between '{table}' and '{rel}'", code="PGRST200")
+        local_col, remote_col, many = link
+        matches = [r for r in self._rows(rel) if _same(r.get(remote_col), row.get(local_col))]
+        if inner.strip() == "count":
+            return [{"count": len(matches)}]
+        projected = [self._project(rel, r, inner) for r in matches]
+        if many:
+            return projected
+        return projected[0] if projected else None
+
+    def _payload_rows(self, q):
+        return q._payload if isinstance(q._payload, list) else [q._payload]
+
+    def _do_insert(self, q):
+        inserted = [self.insert_row(q._table, row) for row in self._payload_rows(q)]
+        return FakeResponse([dict(r) for r in inserted], len(inserted) if q._count else None)
+
+    def _do_upsert(self, q):
+        conflict = [c.strip() for c in (q._on_conflict or "id").split(",") if c.strip()]
+        if conflict != ["id"] and tuple(conflict) not in UNIQUE.get(q._table, []):
+            # seperti Postgres: on_conflict butuh unique constraint pada kolom itu
+            raise FakeAPIError(
+                "there is no unique or exclusion constraint matching the ON CONFLICT specification",
+                code="42P10",
+            )
+        out = []
+        for row in self._payload_rows(q):
+            existing = None
+            if all(row.get(c) is not None for c in conflict):
+                existing = next(
+                    (r for r in self._rows(q._table) if all(_same(r.get(c), row.get(c)) for c in conflict)),
+                    None,
+                )
+            if existing is None:
+                out.append(dict(self.insert_row(q._table, row)))
+            elif not q._ignore_duplicates:
+                existing.update(row)
+                out.append(dict(existing))
+        return FakeResponse(out, len(out) if q._count else None)
+
+    def _do_update(self, q):
+        changed = []
+        for r in self._rows(q._table):
+            if q._match(r):
+                r.update(q._payload)
+                changed.append(dict(r))
+        return FakeResponse(changed, len(changed) if q._count else None)
+
+    def _do_delete(self, q):
+        rows = self._rows(q._table)
+        removed = [r for r in rows if q._match(r)]
+        self.tables[q._table] = [r for r in rows if not q._match(r)]
+        return FakeResponse(removed, len(removed) if q._count else None)
+
+    def _call_rpc(self, fn, params):
+        self._sleep()
+        self._check_down(f"rpc:{fn}")
+        with self._lock:
+            self.calls += 1
+            impl = self.rpcs.get(fn)
+            if impl is None:
+                raise FakeAPIError(f"Could not find the function public.{fn}", code="PGRST202")
+            return FakeResponse(impl(self, **params))
+
+    def _storage_upload(self, bucket, path, data, options):
+        self._sleep()
+        with self._lock:
+            self.calls += 1
+            key = (bucket, path)
+            if key in self.objects and str(options.get("upsert", "false")).lower() != "true":
+                raise FakeAPIError("The resource already exists")
+            self.objects[key] = data
+            return {"Key": f"{bucket}/{path}"}
+
+    def _storage_download(self, bucket, path):
+        self._sleep()
+        with self._lock:
+            self.calls += 1
+            return self.objects[(bucket, path)]
+
+
+# ==========================
+# === FUNGSI RPC (padanan migrations/*.sql) ===
+# ==========================
+def _delete_where(client, table, pred):
+    rows = client._rows(table)
+    keep = [r for r in rows if not pred(r)]
+    client.tables[table] = keep
+    return len(rows) - len(keep)
+
+
+def rpc_submit_quiz_attempt(client, p_quiz_id, p_user_id, p_answers):
+    quiz = next((q for q in client._rows("quizzes") if _same(q["id"], p_quiz_id)), None)
+    if quiz is None:
+        raise FakeAPIError(f"quiz {p_quiz_id} not found", code="P0002")
+    limit = int(quiz.get("attempt_limit") or 0)
+    made = sum(1 for a in client._rows("quiz_attempts") if _same(a["quiz_id"], p_quiz_id) and _same(a["user_id"], p_user_id))
+    if limit and made >= limit:
+        return {"ok": False, "reason": "attempt_limit", "attempts_made": made, "attempt_limit": limit}
+    answers = p_answers or []
+    mcq = [a for a in answers if a.get("is_correct") is not None]
+    score = round(sum(1 for a in mcq if a["is_correct"]) * 100.0 / len(mcq), 2) if mcq else 0
+    attempt = client.insert_row("quiz_attempts", {
+        "quiz_id": p_quiz_id, "user_id": p_user_id, "student_id": p_user_id,
+        "score": score, "total": len(answers), "submitted_at": datetime.now().isoformat(),
+        "manual_score": None, "teacher_feedback": None, "attempt_number": made + 1,
+    })
+    for a in answers:
+        client.insert_row("quiz_answers", {
+            "attempt_id": attempt["id"], "question_id": a.get("question_id"),
+            "choice_id": a.get("choice_id"), "text_answer": a.get("text_answer"),
+            "is_correct": a.get("is_correct"),
+        })
+    return {"ok": True, "attempt_id": attempt["id"], "attempt_number": made + 1,
+            "score": score, "attempts_made": made + 1}
+
+
+def rpc_delete_quiz_cascade(client, p_quiz_id):
+    attempt_ids = {str(a["id"]) for a in client._rows("quiz_attempts") if _same(a["quiz_id"], p_quiz_id)}
+    question_ids = {str(q["id"]) for q in client._rows("quiz_questions") if _same(q["quiz_id"], p_quiz_id)}
+    counts = {}
+    counts["quiz_answers"] = _delete_where(client, "quiz_answers", lambda r: str(r.get("attempt_id")) in attempt_ids or str(r.get("question_id")) in question_ids)
+    counts["quiz_attempts"] = _delete_where(client, "quiz_attempts", lambda r: _same(r.get("quiz_id"), p_quiz_id))
+    counts["quiz_questions"] = _delete_where(client, "quiz_questions", lambda r: _same(r.get("quiz_id"), p_quiz_id))
+    counts["module_link"] = _delete_where(client, "module_link", lambda r: r.get("type") == "quiz" and _same(r.get("target_id"), p_quiz_id))
+    counts["quizzes"] = _delete_where(client, "quizzes", lambda r: _same(r.get("id"), p_quiz_id))
+    return counts
+
+
+def rpc_delete_discussion_cascade(client, p_discussion_id):
+    return {
+        "discussion_replies": _delete_where(client, "discussion_replies", lambda r: _same(r.get("discussion_id"), p_discussion_id)),
+        "discussions": _delete_where(client, "discussions", lambda r: _same(r.get("id"), p_discussion_id)),
+    }
+
+
+def rpc_delete_course_cascade(client, p_course_id):
+    def ids(table, col="course_id"):
+        return {str(r["id"]) for r in client._rows(table) if _same(r.get(col), p_course_id)}
+
+    quiz_ids = ids("quizzes")
+    attempt_ids = {str(a["id"]) for a in client._rows("quiz_attempts") if str(a.get("quiz_id")) in quiz_ids}
+    question_ids = {str(q["id"]) for q in client._rows("quiz_questions") if str(q.get("quiz_id")) in quiz_ids}
+    asg_ids, module_ids = ids("assignments"), ids("modules")
+    session_ids, topic_ids = ids("attendance_sessions"), ids("discussions")
+    in_course = lambda r: _same(r.get("course_id"), p_course_id)
+    counts = {}
+    counts["quiz_answers"] = _delete_where(client, "quiz_answers", lambda r: str(r.get("attempt_id")) in attempt_ids or str(r.get("question_id")) in question_ids)
+    counts["quiz_attempts"] = _delete_where(client, "quiz_attempts", lambda r: str(r.get("quiz_id")) in quiz_ids)
+    counts["quiz_questions"] = _delete_where(client, "quiz_questions", lambda r: str(r.get("quiz_id")) in quiz_ids)
+    counts["module_link"] = _delete_where(client, "module_link", in_course)
+    counts["quizzes"] = _delete_where(client, "quizzes", in_course)
+    counts["assignment_submissions"] = _delete_where(client, "assignment_submissions", lambda r: str(r.get("assignment_id")) in asg_ids)
+    counts["assignments"] = _delete_where(client, "assignments", in_course)
+    counts["module_progress"] = _delete_where(client, "module_progress", lambda r: in_course(r) or str(r.get("module_id")) in module_ids)
+    counts["modules"] = _delete_where(client, "modules", in_course)
+    counts["attendance"] = _delete_where(client, "attendance", lambda r: in_course(r) or str(r.get("session_id")) in session_ids)
+    counts["attendance_sessions"] = _delete_where(client, "attendance_sessions", in_course)
+    counts["announcements"] = _delete_where(client, "announcements", in_course)
+    counts["discussion_replies"] = _delete_where(client, "discussion_replies", lambda r: str(r.get("discussion_id")) in topic_ids)
+    counts["discussions"] = _delete_where(client, "discussions", in_course)
+    counts["enrollments"] = _delete_where(client, "enrollments", in_course)
+    counts["courses"] = _delete_where(client, "courses", lambda r: _same(r.get("id"), p_course_id))
+    return counts
+
+
+DEFAULT_RPCS = {
+    "submit_quiz_attempt": rpc_submit_quiz_attempt,
+    "delete_quiz_cascade": rpc_delete_quiz_cascade,
+    "delete_discussion_cascade": rpc_delete_discussion_cascade,
+    "delete_course_cascade": rpc_delete_course_cascade,
+}
+
+
+# ==========================
+# === SEEDING DATA SINTETIS ===
+# ==========================
+def _sha256(text):
+    return hashlib.sha256(text.encode()).hexdigest()
+
+
+DEFAULT_PASSWORD = "password"
+
+MODULE_CONTENT = """#Pendahuluan {n}
+Materi ini membahas konsep dasar bagian {n}.
+
+$$E = mc^2$$
+
+- poin pertama
+- poin kedua
+
+![Diagram {n}](https://example.com/img/{n}.png)
+
+$$F = m \\cdot a$$
+
+Penutup bagian {n}.
+"""
+
+
+def seed(client, courses=1, students=100, modules=10, quizzes=3, questions=10,
+         assignments=4, sessions=8, topics=5, replies=6, attempt_ratio=0.5, rng_seed=42):
+    """
+    Isi client dengan data sintetis.
+    Instruktur: instructor@example.com, siswa: student{i}@example.com, password: "password".
+    """
+    rng = random.Random(rng_seed)
+    now = datetime(2026, 1, 5, 8, 0, 0)
+    pw = _sha256(DEFAULT_PASSWORD)
+
+    instructor = client.insert_row("users", {
+        "name": "Instruktur Demo", "email": "instructor@example.com",
+        "password_hash": pw, "role": "instructor", "avatar_url": None,
+    })
+    student_rows = [
+        client.insert_row("users", {
+            "name": f"Siswa {i}", "email": f"student{i}@example.com",
+            "password_hash": pw, "role": "student", "avatar_url": None,
+        })
+        for i in range(1, students + 1)
+    ]
+
+    for ci in range(1, courses + 1):
+        course = client.insert_row("courses", {
+            "code": f"PHY{100 + ci}", "title": f"Fisika Dasar {ci}",
+            "description": "Kursus contoh untuk benchmark. " * 20,
+            "youtube_url": None, "reference_book": None,
+            "access_code": f"CODE{ci:02d}",
+            "instructor_id": instructor["id"], "instructor_email": instructor["email"],
+        })
+        cid = course["id"]
+        for s in student_rows:
+            client.insert_row("enrollments", {"user_id": s["id"], "course_id": cid, "role": "student"})
+
+        mod_rows = [
+            client.insert_row("modules", {
+                "course_id": cid, "title": f"Modul {m}", "order_index": m,
+                "content": MODULE_CONTENT.format(n=m), "video_url": None,
+            })
+            for m in range(1, modules + 1)
+        ]
+
+        quiz_rows = []
+        for qi in range(1, quizzes + 1):
+            quiz = client.insert_row("quizzes", {
+                "course_id": cid, "title": f"Kuis {qi}",
+                "description": f"Kuis bab {qi}.\n\n$$v = \\frac{{s}}{{t}}$$", "attempt_limit": 3,
+            })
+            qrows = []
+            for n in range(1, questions + 1):
+                if n % 5 == 0:
+                    qrows.append(client.insert_row("quiz_questions", {
+                        "quiz_id": quiz["id"], "question": f"Jelaskan konsep {n}.",
+                        "type": "short_answer", "choices": None, "correct_answer": None,
+                        "rubric": '{"max_score": 10, "note": "lengkap"}',
+                    }))
+                else:
+                    qrows.append(client.insert_row("quiz_questions", {
+                        "quiz_id": quiz["id"], "question": f"Soal nomor {n}: $$x^{n}$$",
+                        "type": "multiple_choice", "choices": "1|2|3|4|5",
+                        "correct_answer": "ABCDE"[n % 5], "rubric": None,
+                    }))
+            quiz_rows.append((quiz, qrows))
+
+        asg_rows = [
+            client.insert_row("assignments", {
+                "course_id": cid, "title": f"Tugas {a}", "description": "Kerjakan laporan praktikum.",
+                "embed_url_1": None, "embed_url_2": None,
+            })
+            for a in range(1, assignments + 1)
+        ]
+
+        for i, m in enumerate(mod_rows):
+            if i < len(quiz_rows):
+                client.insert_row("module_link", {"course_id": cid, "module_id": m["id"], "type": "quiz", "target_id": quiz_rows[i][0]["id"]})
+            if i < len(asg_rows):
+                client.insert_row("module_link", {"course_id": cid, "module_id": m["id"], "type": "assignment", "target_id": asg_rows[i]["id"]})
+
+        for si in range(sessions):
+            day = now + timedelta(days=7 * si)
+            sess = client.insert_row("attendance_sessions", {
+                "course_id": cid, "date": day.strftime("%Y-%m-%d"),
+                "start_time": day.strftime("%Y-%m-%d %H:%M:%S"),
+                "deadline": (day + timedelta(hours=2)).strftime("%Y-%m-%d %H:%M:%S"),
+                "note": f"Pertemuan {si + 1}",
+            })
+            for s in student_rows:
+                if rng.random() < 0.8:
+                    client.insert_row("attendance", {
+                        "session_id": sess["id"], "course_id": cid, "user_id": s["id"],
+                        "timestamp": (day + timedelta(minutes=rng.randint(0, 100))).strftime("%Y-%m-%d %H:%M:%S"),
+                        "status": "present",
+                    })
+
+        for s in student_rows:
+            done = rng.randint(0, len(mod_rows))
+            for m in mod_rows[:done]:
+                client.insert_row("module_progress", {
+                    "user_id": s["id"], "module_id": m["id"], "course_id": cid,
+                    "status": "completed", "updated_at": now.isoformat(),
+                })
+            for a in asg_rows:
+                if rng.random() < 0.6:
+                    client.insert_row("assignment_submissions", {
+                        "assignment_id": a["id"], "user_id": s["id"],
+                        "file_url": f"{client.url}/storage/v1/object/public/thinkverse_uploads/assignments/{s['id']}_{a['id']}.pdf",
+                        "submitted_at": str(now), "score": rng.choice([None, 70, 80, 90]),
+                    })
+            for quiz, qrows in quiz_rows:
+                if rng.random() >= attempt_ratio:
+                    continue
+                attempt = client.insert_row("quiz_attempts", {
+                    "quiz_id": quiz["id"], "user_id": s["id"], "student_id": s["id"],
+                    "score": rng.choice([40.0, 60.0, 80.0, 100.0]), "total": len(qrows),
+                    "submitted_at": (now + timedelta(minutes=rng.randint(0, 5000))).isoformat(),
+                    "manual_score": None, "teacher_feedback": None, "attempt_number": 1,
+                })
+                for qs in qrows:
+                    letter = rng.choice("ABCDE")
+                    client.insert_row("quiz_answers", {
+                        "attempt_id": attempt["id"], "question_id": qs["id"], "choice_id": None,
+                        "text_answer": letter if qs["type"] == "multiple_choice" else "Jawaban esai siswa.",
+                        "is_correct": (letter == qs["correct_answer"]) if qs["type"] == "multiple_choice" else None,
+                    })
+
+        for ai in range(3):
+            client.insert_row("announcements", {
+                "course_id": cid, "title": f"Pengumuman {ai + 1}",
+                "content": "Jangan lupa mengerjakan tugas.", "date": (now + timedelta(days=ai)).strftime("%Y-%m-%d"),
+            })
+
+        for ti in range(topics):
+            topic = client.insert_row("discussions", {
+                "course_id": cid, "user_id": instructor["id"], "title": f"Topik {ti + 1}",
+                "content": "Silakan berdiskusi di sini. " * 10,
+                "created_at": (now + timedelta(hours=ti)).isoformat(),
+            })
+            parents = []
+            for ri in range(replies):
+                author = rng.choice(student_rows) if student_rows else instructor
+                parent = rng.choice(parents) if parents and ri % 3 == 2 else None
+                reply = client.insert_row("discussion_replies", {
+                    "discussion_id": topic["id"], "user_id": author["id"],
+                    "reply": f"Komentar {ri + 1} tentang topik {ti + 1}.",
+                    "parent_id": parent["id"] if parent else None,
+                    "created_at": (now + timedelta(hours=ti, minutes=ri + 1)).isoformat(),
+                })
+                if parent is None:
+                    parents.append(reply)
+    return client
+
+
+_CLIENTS = {}
+_CLIENTS_LOCK = threading.Lock()
+
+
+def get_client(students=100, latency=None, **seed_kwargs):
+    """
+    Client tiruan per proses (di-memo per konfigurasi seed) supaya data bertahan antar rerun.
+    latency (detik per panggilan) boleh diganti tanpa seed ulang.
+    """
+    key = (students, tuple(sorted(seed_kwargs.items())))
+    with _CLIENTS_LOCK:
+        if key not in _CLIENTS:
+            _CLIENTS[key] = seed(FakeClient(), students=students, **seed_kwargs)
+        client = _CLIENTS[key]
+    if latency is not None:
+        client.latency = latency
+    return client
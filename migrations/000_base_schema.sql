@@ -0,0 +1,184 @@
+-- =====================================================
+-- 000 — Base schema
+-- Semua tabel yang dipakai app.py, untuk database baru (Postgres lokal,
+-- project Supabase kosong). Di project yang sudah berjalan file ini tidak
+-- mengubah apa pun (create table if not exists); constraint & index untuk
+-- tabel lama dipasang oleh 002 (FK cascade), 003, 005, 006 dan 007 (FK ke users).
+--
+-- Urutan file: 000 dulu, lalu 001, 002, ... (nomor = urutan apply).
+--
+-- Catatan tipe kolom:
+-- - attendance_sessions.start_time/deadline dan attendance.timestamp disimpan
+--   sebagai teks 'YYYY-MM-DD HH:MM:SS' karena app mem-parse-nya dengan
+--   strptime format itu (timestamp Postgres dikirim PostgREST dengan 'T').
+-- - quiz_questions.choices = pilihan dipisah '|', rubric = JSON dalam teks.
+-- - module_link.target_id menunjuk quizzes ATAU assignments (kolom type),
+--   jadi tanpa foreign key (lihat 004).
+-- =====================================================
+
+create table if not exists public.users (
+    id             bigint generated by default as identity primary key,
+    name           text not null,
+    email          text not null,
+    password_hash  text,
+    role           text not null default 'student',
+    avatar_url     text,
+    created_at     timestamptz not null default now(),
+    constraint users_email_key unique (email)
+);
+
+create table if not exists public.courses (
+    id                bigint generated by default as identity primary key,
+    code              text,
+    title             text not null,
+    description       text,
+    youtube_url       text,
+    reference_book    text,
+    access_code       text not null,
+    instructor_id     bigint references public.users (id) on delete set null,
+    instructor_email  text,
+    created_at        timestamptz not null default now(),
+    constraint courses_access_code_key unique (access_code)
+);
+
+create table if not exists public.enrollments (
+    id          bigint generated by default as identity primary key,
+    user_id     bigint not null references public.users (id) on delete cascade,
+    course_id   bigint not null references public.courses (id) on delete cascade,
+    role        text not null default 'student',
+    created_at  timestamptz not null default now(),
+    constraint enrollments_user_course_key unique (user_id, course_id)
+);
+
+create table if not exists public.modules (
+    id           bigint generated by default as identity primary key,
+    course_id    bigint not null references public.courses (id) on delete cascade,
+    title        text not null,
+    order_index  integer not null default 0,
+    content      text,
+    video_url    text,
+    created_at   timestamptz not null default now()
+);
+
+create table if not exists public.quizzes (
+    id             bigint generated by default as identity primary key,
+    course_id      bigint not null references public.courses (id) on delete cascade,
+    title          text not null,
+    description    text,
+    attempt_limit  integer not null default 0,
+    created_at     timestamptz not null default now()
+);
+
+create table if not exists public.quiz_questions (
+    id              bigint generated by default as identity primary key,
+    quiz_id         bigint not null references public.quizzes (id) on delete cascade,
+    question        text not null,
+    type            text not null default 'multiple_choice',
+    choices         text,
+    correct_answer  text,
+    rubric          text
+);
+
+create table if not exists public.assignments (
+    id           bigint generated by default as identity primary key,
+    course_id    bigint not null references public.courses (id) on delete cascade,
+    title        text not null,
+    description  text,
+    embed_url_1  text,
+    embed_url_2  text,
+    created_at   timestamptz not null default now()
+);
+
+create table if not exists public.module_link (
+    id         bigint generated by default as identity primary key,
+    course_id  bigint not null references public.courses (id) on delete cascade,
+    module_id  bigint not null references public.modules (id) on delete cascade,
+    type       text not null check (type in ('quiz', 'assignment')),
+    target_id  bigint not null
+);
+
+create table if not exists public.module_progress (
+    id          bigint generated by default as identity primary key,
+    user_id     bigint not null references public.users (id) on delete cascade,
+    module_id   bigint not null references public.modules (id) on delete cascade,
+    course_id   bigint not null references public.courses (id) on delete cascade,
+    status      text not null default 'in_progress',
+    updated_at  timestamptz not null default now(),
+    constraint module_progress_user_module_key unique (user_id, module_id)
+);
+
+create table if not exists public.quiz_attempts (
+    id                bigint generated by default as identity primary key,
+    quiz_id           bigint not null references public.quizzes (id) on delete cascade,
+    user_id           bigint not null references public.users (id) on delete cascade,
+    student_id        bigint,
+    score             numeric,
+    total             integer,
+    submitted_at      timestamptz not null default now(),
+    manual_score      numeric,
+    teacher_feedback  text,
+    attempt_number    integer not null default 1
+);
+
+create table if not exists public.quiz_answers (
+    id           bigint generated by default as identity primary key,
+    attempt_id   bigint not null references public.quiz_attempts (id) on delete cascade,
+    question_id  bigint references public.quiz_questions (id) on delete set null,
+    choice_id    bigint,
+    text_answer  text,
+    is_correct   boolean
+);
+
+create table if not exists public.assignment_submissions (
+    id             bigint generated by default as identity primary key,
+    assignment_id  bigint not null references public.assignments (id) on delete cascade,
+    user_id        bigint not null references public.users (id) on delete cascade,
+    file_url       text,
+    submitted_at   timestamptz not null default now(),
+    score          numeric
+);
+
+create table if not exists public.attendance_sessions (
+    id          bigint generated by default as identity primary key,
+    course_id   bigint not null references public.courses (id) on delete cascade,
+    date        date not null,
+    start_time  text,
+    deadline    text,
+    note        text
+);
+
+create table if not exists public.attendance (
+    id          bigint generated by default as identity primary key,
+    session_id  bigint not null references public.attendance_sessions (id) on delete cascade,
+    course_id   bigint not null references public.courses (id) on delete cascade,
+    user_id     bigint not null references public.users (id) on delete cascade,
+    timestamp   text,
+    status      text not null default 'present',
+    constraint attendance_session_user_key unique (session_id, user_id)
+);
+
+create table if not exists public.announcements (
+    id         bigint generated by default as identity primary key,
+    course_id  bigint not null references public.courses (id) on delete cascade,
+    title      text not null,
+    content    text,
+    date       date not null default current_date
+);
+
+create table if not exists public.discussions (
+    id          bigint generated by default as identity primary key,
+    course_id   bigint not null references public.courses (id) on delete cascade,
+    user_id     bigint references public.users (id) on delete set null,
+    title       text not null,
+    content     text,
+    created_at  timestamptz not null default now()
+);
+
+create table if not exists public.discussion_replies (
+    id             bigint generated by default as identity primary key,
+    discussion_id  bigint not null references public.discussions (id) on delete cascade,
+    user_id        bigint references public.users (id) on delete set null,
+    reply          text not null,
+    parent_id      bigint references public.discussion_replies (id) on delete cascade,
+    created_at     timestamptz not null default now()
+);
@@ -0,0 +1,94 @@
+-- =====================================================
+-- 001 — submit_quiz_attempt
+-- Simpan satu attempt quiz + semua jawabannya dalam SATU panggilan RPC.
+-- Cek batas percobaan, insert attempt, bulk insert jawaban — atomik
+-- (satu transaksi), dipanggil dari app.py lewat supabase.rpc(...).
+--
+-- p_answers: jsonb array, tiap elemen:
+--   {"question_id": 12, "choice_id": null, "text_answer": "B", "is_correct": true}
+--   is_correct = null untuk soal esai (dinilai manual).
+--
+-- Hasil (jsonb):
+--   {"ok": true,  "attempt_id": 99, "attempt_number": 2, "score": 75.0, "attempts_made": 2}
+--   {"ok": false, "reason": "attempt_limit", "attempts_made": 3, "attempt_limit": 3}
+-- =====================================================
+
+create or replace function public.submit_quiz_attempt(
+    p_quiz_id bigint,
+    p_user_id bigint,
+    p_answers jsonb
+) returns jsonb
+language plpgsql
+as $$
+declare
+    v_limit integer;
+    v_made integer;
+    v_total integer;
+    v_mcq integer;
+    v_correct integer;
+    v_score numeric;
+    v_attempt_id bigint;
+begin
+    -- serialisasi submit dari siswa yang sama untuk quiz yang sama
+    -- (tidak mengunci siswa lain yang sedang ujian)
+    perform pg_advisory_xact_lock(hashtextextended(p_quiz_id::text || ':' || p_user_id::text, 0));
+
+    select coalesce(attempt_limit, 0) into v_limit
+    from public.quizzes
+    where id = p_quiz_id;
+
+    if not found then
+        raise exception 'quiz % not found', p_quiz_id using errcode = 'P0002';
+    end if;
+
+    select count(*) into v_made
+    from public.quiz_attempts
+    where quiz_id = p_quiz_id and user_id = p_user_id;
+
+    if v_limit > 0 and v_made >= v_limit then
+        return jsonb_build_object(
+            'ok', false,
+            'reason', 'attempt_limit',
+            'attempts_made', v_made,
+            'attempt_limit', v_limit
+        );
+    end if;
+
+    v_total := jsonb_array_length(coalesce(p_answers, '[]'::jsonb));
+
+    -- skor MCQ (persen); soal esai (is_correct null) tidak dihitung
+    select count(*) filter (where a->'is_correct' is not null and a->'is_correct' <> 'null'::jsonb),
+           count(*) filter (where (a->>'is_correct')::boolean)
+      into v_mcq, v_correct
+    from jsonb_array_elements(coalesce(p_answers, '[]'::jsonb)) as a;
+
+    v_score := case when v_mcq > 0 then round(v_correct * 100.0 / v_mcq, 2) else 0 end;
+
+    insert into public.quiz_attempts (
+        quiz_id, user_id, student_id, score, total, submitted_at,
+        manual_score, teacher_feedback, attempt_number
+    ) values (
+        p_quiz_id, p_user_id, p_user_id, v_score, v_total, now(),
+        null, null, v_made + 1
+    )
+    returning id into v_attempt_id;
+
+    insert into public.quiz_answers (attempt_id, question_id, choice_id, text_answer, is_correct)
+    select v_attempt_id,
+           (a->>'question_id')::bigint,
+           (a->>'choice_id')::bigint,
+           a->>'text_answer',
+           (a->>'is_correct')::boolean
+    from jsonb_array_elements(coalesce(p_answers, '[]'::jsonb)) as a;
+
+    return jsonb_build_object(
+        'ok', true,
+        'attempt_id', v_attempt_id,
+        'attempt_number', v_made + 1,
+        'score', v_score,
+        'attempts_made', v_made + 1
+    );
+end;
+$$;
+
+grant execute on function public.submit_quiz_attempt(bigint, bigint, jsonb) to anon, authenticated;
@@ -0,0 +1,234 @@
+-- =====================================================
+-- 002 — Cascade delete
+-- 1) Foreign key ON DELETE CASCADE untuk semua tabel turunan course/quiz/topik.
+--    Baris yatim TIDAK dihapus: jumlahnya dilaporkan lewat NOTICE dan FK
+--    dipasang NOT VALID (berlaku untuk baris baru); FK divalidasi kalau tabel
+--    bersih. Bereskan baris yatim secara manual lalu jalankan ulang file ini.
+--    quiz_answers.question_id = ON DELETE SET NULL: menghapus soal tidak
+--    menghapus jawaban siswa yang sudah dinilai (riwayat nilai tetap bisa diaudit).
+-- 2) Fungsi RPC atomik yang menghapus seluruh pohon dependensi dalam satu
+--    transaksi dan mengembalikan jumlah baris yang terhapus per tabel:
+--      delete_course_cascade(p_course_id)
+--      delete_quiz_cascade(p_quiz_id)
+--      delete_discussion_cascade(p_discussion_id)
+--
+-- module_link.target_id menunjuk ke quizzes ATAU assignments (tergantung kolom
+-- type), jadi tidak bisa diberi foreign key — fungsi di bawah menghapusnya
+-- secara eksplisit.
+-- =====================================================
+
+-- ---------- helper sementara: pasang FK cascade ----------
+create or replace function pg_temp.add_cascade_fk(
+    p_table text, p_column text, p_ref_table text, p_on_delete text default 'cascade'
+) returns void
+language plpgsql
+as $$
+declare
+    v_name text := p_table || '_' || p_column || '_fkey';
+    v_orphans bigint;
+begin
+    -- baris yatim hanya dihitung; data produksi tidak dihapus oleh migrasi
+    execute format(
+        'select count(*) from public.%I t where t.%I is not null
+           and not exists (select 1 from public.%I r where r.id = t.%I)',
+        p_table, p_column, p_ref_table, p_column
+    ) into v_orphans;
+    execute format('alter table public.%I drop constraint if exists %I', p_table, v_name);
+    execute format(
+        'alter table public.%I add constraint %I foreign key (%I)
+           references public.%I (id) on delete %s not valid',
+        p_table, v_name, p_column, p_ref_table, p_on_delete
+    );
+    if v_orphans > 0 then
+        raise notice '%.%: % baris yatim (tidak ada di %), FK % belum divalidasi',
+            p_table, p_column, v_orphans, p_ref_table, v_name;
+    else
+        execute format('alter table public.%I validate constraint %I', p_table, v_name);
+    end if;
+end;
+$$;
+
+select pg_temp.add_cascade_fk('enrollments',            'course_id',     'courses');
+select pg_temp.add_cascade_fk('modules',                'course_id',     'courses');
+select pg_temp.add_cascade_fk('assignments',            'course_id',     'courses');
+select pg_temp.add_cascade_fk('quizzes',                'course_id',     'courses');
+select pg_temp.add_cascade_fk('announcements',          'course_id',     'courses');
+select pg_temp.add_cascade_fk('attendance_sessions',    'course_id',     'courses');
+select pg_temp.add_cascade_fk('discussions',            'course_id',     'courses');
+select pg_temp.add_cascade_fk('module_link',            'course_id',     'courses');
+select pg_temp.add_cascade_fk('module_link',            'module_id',     'modules');
+select pg_temp.add_cascade_fk('module_progress',        'course_id',     'courses');
+select pg_temp.add_cascade_fk('module_progress',        'module_id',     'modules');
+select pg_temp.add_cascade_fk('quiz_questions',         'quiz_id',       'quizzes');
+select pg_temp.add_cascade_fk('quiz_attempts',          'quiz_id',       'quizzes');
+select pg_temp.add_cascade_fk('quiz_answers',           'attempt_id',    'quiz_attempts');
+select pg_temp.add_cascade_fk('quiz_answers',           'question_id',   'quiz_questions', 'set null');
+select pg_temp.add_cascade_fk('assignment_submissions', 'assignment_id', 'assignments');
+select pg_temp.add_cascade_fk('attendance',             'session_id',    'attendance_sessions');
+select pg_temp.add_cascade_fk('attendance',             'course_id',     'courses');
+select pg_temp.add_cascade_fk('discussion_replies',     'discussion_id', 'discussions');
+select pg_temp.add_cascade_fk('discussion_replies',     'parent_id',     'discussion_replies');
+
+
+-- ---------- delete_quiz_cascade ----------
+create or replace function public.delete_quiz_cascade(p_quiz_id bigint)
+returns jsonb
+language plpgsql
+as $$
+declare
+    v_counts jsonb := '{}'::jsonb;
+    v_n integer;
+begin
+    delete from public.quiz_answers
+    where attempt_id in (select id from public.quiz_attempts where quiz_id = p_quiz_id)
+       or question_id in (select id from public.quiz_questions where quiz_id = p_quiz_id);
+    get diagnostics v_n = row_count;
+    v_counts := v_counts || jsonb_build_object('quiz_answers', v_n);
+
+    delete from public.quiz_attempts where quiz_id = p_quiz_id;
+    get diagnostics v_n = row_count;
+    v_counts := v_counts || jsonb_build_object('quiz_attempts', v_n);
+
+    delete from public.quiz_questions where quiz_id = p_quiz_id;
+    get diagnostics v_n = row_count;
+    v_counts := v_counts || jsonb_build_object('quiz_questions', v_n);
+
+    delete from public.module_link where type = 'quiz' and target_id = p_quiz_id;
+    get diagnostics v_n = row_count;
+    v_counts := v_counts || jsonb_build_object('module_link', v_n);
+
+    delete from public.quizzes where id = p_quiz_id;
+    get diagnostics v_n = row_count;
+    v_counts := v_counts || jsonb_build_object('quizzes', v_n);
+
+    return v_counts;
+end;
+$$;
+
+
+-- ---------- delete_discussion_cascade ----------
+create or replace function public.delete_discussion_cascade(p_discussion_id bigint)
+returns jsonb
+language plpgsql
+as $$
+declare
+    v_counts jsonb := '{}'::jsonb;
+    v_n integer;
+begin
+    delete from public.discussion_replies where discussion_id = p_discussion_id;
+    get diagnostics v_n = row_count;
+    v_counts := v_counts || jsonb_build_object('discussion_replies', v_n);
+
+    delete from public.discussions where id = p_discussion_id;
+    get diagnostics v_n = row_count;
+    v_counts := v_counts || jsonb_build_object('discussions', v_n);
+
+    return v_counts;
+end;
+$$;
+
+
+-- ---------- delete_course_cascade ----------
+create or replace function public.delete_course_cascade(p_course_id bigint)
+returns jsonb
+language plpgsql
+as $$
+declare
+    v_counts jsonb := '{}'::jsonb;
+    v_n integer;
+begin
+    -- quiz tree
+    delete from public.quiz_answers
+    where attempt_id in (
+        select a.id from public.quiz_attempts a
+        join public.quizzes q on q.id = a.quiz_id
+        where q.course_id = p_course_id
+    )
+       or question_id in (
+        select qq.id from public.quiz_questions qq
+        join public.quizzes q on q.id = qq.quiz_id
+        where q.course_id = p_course_id
+    );
+    get diagnostics v_n = row_count;
+    v_counts := v_counts || jsonb_build_object('quiz_answers', v_n);
+
+    delete from public.quiz_attempts
+    where quiz_id in (select id from public.quizzes where course_id = p_course_id);
+    get diagnostics v_n = row_count;
+    v_counts := v_counts || jsonb_build_object('quiz_attempts', v_n);
+
+    delete from public.quiz_questions
+    where quiz_id in (select id from public.quizzes where course_id = p_course_id);
+    get diagnostics v_n = row_count;
+    v_counts := v_counts || jsonb_build_object('quiz_questions', v_n);
+
+    delete from public.module_link where course_id = p_course_id;
+    get diagnostics v_n = row_count;
+    v_counts := v_counts || jsonb_build_object('module_link', v_n);
+
+    delete from public.quizzes where course_id = p_course_id;
+    get diagnostics v_n = row_count;
+    v_counts := v_counts || jsonb_build_object('quizzes', v_n);
+
+    -- assignments
+    delete from public.assignment_submissions
+    where assignment_id in (select id from public.assignments where course_id = p_course_id);
+    get diagnostics v_n = row_count;
+    v_counts := v_counts || jsonb_build_object('assignment_submissions', v_n);
+
+    delete from public.assignments where course_id = p_course_id;
+    get diagnostics v_n = row_count;
+    v_counts := v_counts || jsonb_build_object('assignments', v_n);
+
+    -- modules
+    delete from public.module_progress
+    where course_id = p_course_id
+       or module_id in (select id from public.modules where course_id = p_course_id);
+    get diagnostics v_n = row_count;
+    v_counts := v_counts || jsonb_build_object('module_progress', v_n);
+
+    delete from public.modules where course_id = p_course_id;
+    get diagnostics v_n = row_count;
+    v_counts := v_counts || jsonb_build_object('modules', v_n);
+
+    -- attendance
+    delete from public.attendance
+    where course_id = p_course_id
+       or session_id in (select id from public.attendance_sessions where course_id = p_course_id);
+    get diagnostics v_n = row_count;
+    v_counts := v_counts || jsonb_build_object('attendance', v_n);
+
+    delete from public.attendance_sessions where course_id = p_course_id;
+    get diagnostics v_n = row_count;
+    v_counts := v_counts || jsonb_build_object('attendance_sessions', v_n);
+
+    -- announcements & forum
+    delete from public.announcements where course_id = p_course_id;
+    get diagnostics v_n = row_count;
+    v_counts := v_counts || jsonb_build_object('announcements', v_n);
+
+    delete from public.discussion_replies
+    where discussion_id in (select id from public.discussions where course_id = p_course_id);
+    get diagnostics v_n = row_count;
+    v_counts := v_counts || jsonb_build_object('discussion_replies', v_n);
+
+    delete from public.discussions where course_id = p_course_id;
+    get diagnostics v_n = row_count;
+    v_counts := v_counts || jsonb_build_object('discussions', v_n);
+
+    -- enrollments & course
+    delete from public.enrollments where course_id = p_course_id;
+    get diagnostics v_n = row_count;
+    v_counts := v_counts || jsonb_build_object('enrollments', v_n);
+
+    delete from public.courses where id = p_course_id;
+    get diagnostics v_n = row_count;
+    v_counts := v_counts || jsonb_build_object('courses', v_n);
+
+    return v_counts;
+end;
+$$;
+
+grant execute on function public.delete_course_cascade(bigint) to anon, authenticated;
+grant execute on function public.delete_quiz_cascade(bigint) to anon, authenticated;
+grant execute on function public.delete_discussion_cascade(bigint) to anon, authenticated;
@@ -0,0 +1,35 @@
+-- =====================================================
+-- 003 — module_progress unik per (user_id, module_id)
+-- Progress modul ditulis lewat upsert on_conflict "user_id,module_id"
+-- (lihat save_module_progress di app.py), jadi butuh unique constraint.
+--
+-- Duplikat lama dibersihkan dulu: per (user, modul) disimpan satu baris,
+-- prioritas status 'completed', lalu updated_at terbaru, lalu id terbesar.
+-- =====================================================
+
+delete from public.module_progress mp
+using (
+    select id,
+           row_number() over (
+               partition by user_id, module_id
+               order by (status = 'completed') desc,
+                        updated_at desc nulls last,
+                        id desc
+           ) as rn
+    from public.module_progress
+) ranked
+where mp.id = ranked.id
+  and ranked.rn > 1;
+
+do $$
+begin
+    if not exists (
+        select 1 from pg_constraint
+        where conname = 'module_progress_user_module_key'
+          and conrelid = 'public.module_progress'::regclass
+    ) then
+        alter table public.module_progress
+            add constraint module_progress_user_module_key unique (user_id, module_id);
+    end if;
+end
+$$;
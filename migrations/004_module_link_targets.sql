@@ -0,0 +1,43 @@
+-- =====================================================
+-- 004 — module_link_targets
+-- module_link.target_id menunjuk ke quizzes ATAU assignments (tergantung
+-- kolom type), jadi tidak ada foreign key yang bisa dipakai PostgREST untuk
+-- embed. Dua fungsi di bawah adalah "computed relationship": PostgREST
+-- memperlakukannya sebagai relasi, sehingga app bisa mengambil link beserta
+-- quiz/assignment tujuannya dalam satu query:
+--
+--   module_link?select=*,quiz:quiz(id,title),assignment:assignment(id,title)
+--
+-- Baris dengan type lain menghasilkan null. Tanpa migrasi ini app kembali
+-- ke lookup terpisah (PGRST200).
+-- =====================================================
+
+create or replace function public.quiz(public.module_link)
+returns setof public.quizzes
+rows 1
+language sql
+stable
+as $$
+    select q.*
+    from public.quizzes q
+    where $1.type = 'quiz'
+      and q.id = $1.target_id;
+$$;
+
+create or replace function public.assignment(public.module_link)
+returns setof public.assignments
+rows 1
+language sql
+stable
+as $$
+    select a.*
+    from public.assignments a
+    where $1.type = 'assignment'
+      and a.id = $1.target_id;
+$$;
+
+grant execute on function public.quiz(public.module_link) to anon, authenticated;
+grant execute on function public.assignment(public.module_link) to anon, authenticated;
+
+-- muat ulang schema cache PostgREST supaya relasi baru langsung dikenali
+notify pgrst, 'reload schema';
@@ -0,0 +1,111 @@
+-- =====================================================
+-- 005 — Index untuk setiap filter di jalur panas app.py
+-- Setiap index di bawah mengikuti bentuk query yang benar-benar dikirim app
+-- (filter kesetaraan dulu, lalu kolom order by). Cek hasilnya dengan
+--   python bench/explain_queries.py --seed 100
+-- yang menjalankan EXPLAIN untuk setiap bentuk query dan menandai seq scan.
+--
+-- Unique constraint (kalau belum ada):
+--   users(email), courses(access_code), enrollments(user_id, course_id),
+--   attendance(session_id, user_id)
+-- Migrasi tidak menghapus data: kalau ada duplikat, dipasang index biasa +
+-- NOTICE supaya dibereskan manual, lalu file ini dijalankan ulang.
+-- app.py tetap jalan tanpa unique enrollments/attendance (write absensi
+-- kembali ke cek exists lalu insert saat upsert ditolak 42P10).
+-- =====================================================
+
+-- ---------- helper sementara: unique constraint kalau datanya mengizinkan ----------
+create or replace function pg_temp.add_unique(
+    p_table text, p_name text, p_columns text
+) returns void
+language plpgsql
+as $$
+declare
+    v_dupes bigint;
+begin
+    if exists (
+        select 1 from pg_constraint
+        where conname = p_name and conrelid = ('public.' || p_table)::regclass
+    ) then
+        return;
+    end if;
+    execute format(
+        'select count(*) from (select 1 from public.%I group by %s having count(*) > 1) d',
+        p_table, p_columns
+    ) into v_dupes;
+    if v_dupes > 0 then
+        raise notice '%: % nilai duplikat pada (%), dipasang index biasa', p_table, v_dupes, p_columns;
+        execute format('create index if not exists %I on public.%I (%s)', p_name || '_idx', p_table, p_columns);
+    else
+        execute format('alter table public.%I add constraint %I unique (%s)', p_table, p_name, p_columns);
+        -- index biasa dari run sebelumnya (saat masih ada duplikat) tidak diperlukan lagi
+        execute format('drop index if exists public.%I', p_name || '_idx');
+    end if;
+end;
+$$;
+
+select pg_temp.add_unique('users',       'users_email_key',             'email');
+select pg_temp.add_unique('courses',     'courses_access_code_key',     'access_code');
+select pg_temp.add_unique('enrollments', 'enrollments_user_course_key', 'user_id, course_id');
+select pg_temp.add_unique('attendance',  'attendance_session_user_key', 'session_id, user_id');
+
+-- ---------- index komposit per bentuk query ----------
+-- enrollments(user_id ...) dilayani unique (user_id, course_id) di atas
+create index if not exists enrollments_course_idx
+    on public.enrollments (course_id);                                  -- gradebook: siswa per course
+
+create index if not exists courses_instructor_email_idx
+    on public.courses (instructor_email);                               -- dashboard instruktur
+
+create index if not exists modules_course_order_idx
+    on public.modules (course_id, order_index);                         -- daftar modul (urut)
+
+create index if not exists module_link_course_idx
+    on public.module_link (course_id);
+
+create index if not exists module_progress_user_course_idx
+    on public.module_progress (user_id, course_id);                     -- progress siswa
+create index if not exists module_progress_course_idx
+    on public.module_progress (course_id);                              -- gradebook
+
+create index if not exists quizzes_course_idx
+    on public.quizzes (course_id);
+create index if not exists quiz_questions_quiz_idx
+    on public.quiz_questions (quiz_id, id);                             -- soal per quiz (urut id)
+
+create index if not exists quiz_attempts_quiz_user_idx
+    on public.quiz_attempts (quiz_id, user_id);                         -- batas percobaan, gradebook
+create index if not exists quiz_attempts_quiz_submitted_idx
+    on public.quiz_attempts (quiz_id, submitted_at desc);               -- daftar grading (terbaru dulu)
+
+create index if not exists quiz_answers_attempt_idx
+    on public.quiz_answers (attempt_id);
+create index if not exists quiz_answers_question_idx
+    on public.quiz_answers (question_id);                               -- cascade hapus soal
+
+create index if not exists assignments_course_idx
+    on public.assignments (course_id);
+create index if not exists assignment_submissions_assignment_user_idx
+    on public.assignment_submissions (assignment_id, user_id);
+
+create index if not exists attendance_sessions_course_idx
+    on public.attendance_sessions (course_id);
+-- attendance(session_id, user_id) dilayani unique di atas
+create index if not exists attendance_course_user_idx
+    on public.attendance (course_id, user_id);                          -- absensi siswa, gradebook
+
+create index if not exists announcements_course_date_idx
+    on public.announcements (course_id, date desc);
+
+create index if not exists discussions_course_created_idx
+    on public.discussions (course_id, created_at desc);                 -- daftar topik forum
+create index if not exists discussion_replies_discussion_created_idx
+    on public.discussion_replies (discussion_id, created_at);           -- komentar per topik
+create index if not exists discussion_replies_parent_idx
+    on public.discussion_replies (parent_id);                           -- cascade hapus komentar
+
+analyze public.users, public.courses, public.enrollments, public.modules, public.module_link,
+        public.module_progress, public.quizzes, public.quiz_questions, public.quiz_attempts,
+        public.quiz_answers, public.assignments, public.assignment_submissions,
+        public.attendance_sessions, public.attendance, public.announcements,
+        public.discussions, public.discussion_replies;
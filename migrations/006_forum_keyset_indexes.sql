@@ -0,0 +1,20 @@
+-- =====================================================
+-- 006 — Index untuk pagination keyset forum
+-- Topik dimuat per halaman dengan cursor (created_at, id) terbaru dulu,
+-- komentar per topik dengan cursor (created_at, id) terlama dulu
+-- (load_forum_topics / load_forum_replies di app.py). id ikut di index
+-- supaya "where (created_at, id) < cursor order by created_at desc, id desc
+-- limit n" cukup membaca n baris index, tanpa sort.
+-- Menggantikan index (course_id, created_at) / (discussion_id, created_at) dari 005.
+-- Jumlah komentar per topik (count per discussion_id) juga dilayani index komentar.
+-- =====================================================
+
+create index if not exists discussions_course_created_id_idx
+    on public.discussions (course_id, created_at desc, id desc);
+drop index if exists public.discussions_course_created_idx;
+
+create index if not exists discussion_replies_discussion_created_id_idx
+    on public.discussion_replies (discussion_id, created_at, id);
+drop index if exists public.discussion_replies_discussion_created_idx;
+
+analyze public.discussions, public.discussion_replies;
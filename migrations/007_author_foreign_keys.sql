@@ -0,0 +1,58 @@
+-- =====================================================
+-- 007 — Foreign key ke users untuk embed penulis
+-- app.py mengambil nama & avatar penulis dalam query yang sama lewat embed
+-- PostgREST author:users(name, avatar_url) (forum topik & komentar, matriks
+-- absensi) dan jumlah komentar per topik lewat discussion_replies(count).
+-- PostgREST hanya bisa embed lewat foreign key; tanpa FK jawabannya PGRST200
+-- dan app kembali ke lookup nama terpisah (UserNameLoader).
+--
+-- Database baru (000) sudah punya FK ini; file ini untuk project lama.
+-- FK dipasang NOT VALID (tanpa scan / lock panjang), lalu divalidasi kalau
+-- tidak ada baris yatim. Baris yatim TIDAK dihapus: jumlahnya dilaporkan
+-- lewat NOTICE, bereskan manual lalu jalankan ulang file ini.
+-- =====================================================
+
+create or replace function pg_temp.add_fk(
+    p_table text, p_column text, p_ref_table text, p_on_delete text
+) returns void
+language plpgsql
+as $$
+declare
+    v_name text := p_table || '_' || p_column || '_fkey';
+    v_orphans bigint;
+begin
+    if not exists (
+        select 1 from pg_constraint
+        where conname = v_name and conrelid = ('public.' || p_table)::regclass
+    ) then
+        execute format(
+            'alter table public.%I add constraint %I foreign key (%I)
+               references public.%I (id) on delete %s not valid',
+            p_table, v_name, p_column, p_ref_table, p_on_delete
+        );
+    end if;
+    if (select convalidated from pg_constraint
+        where conname = v_name and conrelid = ('public.' || p_table)::regclass) then
+        return;
+    end if;
+    execute format(
+        'select count(*) from public.%I t where t.%I is not null
+           and not exists (select 1 from public.%I r where r.id = t.%I)',
+        p_table, p_column, p_ref_table, p_column
+    ) into v_orphans;
+    if v_orphans > 0 then
+        raise notice '%.%: % baris yatim (tidak ada di %), FK % belum divalidasi',
+            p_table, p_column, v_orphans, p_ref_table, v_name;
+    else
+        execute format('alter table public.%I validate constraint %I', p_table, v_name);
+    end if;
+end;
+$$;
+
+select pg_temp.add_fk('discussions',        'user_id',       'users',       'set null');
+select pg_temp.add_fk('discussion_replies', 'user_id',       'users',       'set null');
+select pg_temp.add_fk('attendance',         'user_id',       'users',       'cascade');
+-- discussion_replies(count) di daftar topik; biasanya sudah dipasang oleh 002
+select pg_temp.add_fk('discussion_replies', 'discussion_id', 'discussions', 'cascade');
+
+notify pgrst, 'reload schema';